@@ -66,3 +66,4 @@ from . import vat_config_ept
 from . import vat_config_line_ept
 from . import res_partner
 from . import account_fiscal_position
+from . import connector_kpi_rollup_ept
@@ -10,8 +10,8 @@ import time
 import base64
 import logging
 from odoo import fields, models, api, _
-from odoo.addons.iap.tools import iap_tools
 from ..endpoint import DEFAULT_ENDPOINT
+from ..transport import amazon_jsonrpc
 
 _logger = logging.getLogger(__name__)
 
@@ -98,7 +98,6 @@ class AccountMove(models.Model):
             True """
         seller_obj = self.env['amazon.seller.ept']
         seller_id = args.get('seller_id', False)
-        after_req = 0.0
         if not seller_id:
             _logger.info(_("Seller Id not found in Cron Argument, Please Check Cron Configurations."))
             return False
@@ -118,12 +117,7 @@ class AccountMove(models.Model):
             for invoice_id in invoice_ids:
                 invoice = self.browse(invoice_id)
                 kwargs = invoice._prepare_amz_invoice_upload_kwargs(instance)
-                before_req = time.time()
-                diff = int(after_req - before_req)
-                if 3 > diff > 0:
-                    time.sleep(3 - diff)
-                response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
-                after_req = time.time()
+                response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
                 self.process_invoice_feed_submission_response(response, instance, invoice_id)
         return True
 
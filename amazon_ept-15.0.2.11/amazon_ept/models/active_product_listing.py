@@ -14,10 +14,10 @@ from io import StringIO
 from io import BytesIO
 import re
 from odoo import models, fields, api, _
-from odoo.addons.iap.tools import iap_tools
 from odoo.exceptions import UserError
 from odoo.tools.misc import xlsxwriter
 from ..endpoint import DEFAULT_ENDPOINT
+from ..transport import amazon_jsonrpc
 from .. reportTypes import ReportType
 
 COMMON_LOG_LINES_EPT = 'common.log.lines.ept'
@@ -139,7 +139,7 @@ class ActiveProductListingReportEpt(models.Model):
         kwargs.update({'emipro_api': 'create_marketplace_report_sp_api',
                        'report_type': self.report_type or ReportType.GET_MERCHANT_LISTINGS_DATA,
                        'marketplace_ids': marketplace_ids,})
-        response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
         if response.get('error', False):
             raise UserError(_(response.get('error', {})))
         if response.get('result', {}):
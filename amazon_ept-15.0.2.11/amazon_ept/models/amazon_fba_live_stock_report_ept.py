@@ -15,9 +15,9 @@ from io import StringIO
 import pytz
 from dateutil import parser
 from odoo import models, fields, api, _
-from odoo.addons.iap.tools import iap_tools
 from odoo.exceptions import UserError
 from ..endpoint import DEFAULT_ENDPOINT
+from ..transport import amazon_jsonrpc
 from ..reportTypes import ReportType
 FBA_LIVE_STOCK_REPORT = 'amazon.fba.live.stock.report.ept'
 
@@ -395,7 +395,7 @@ class AmazonLiveStockReportEpt(models.Model):
                        'end_date': con_end_date,
                        'report_type': ['GET_FBA_MYI_UNSUPPRESSED_INVENTORY_DATA'],
                        'marketplaceids': instances.mapped('market_place_id')})
-        response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
         if response.get('error', False):
             if self._context.get('is_auto_process', False):
                 job.write({'log_lines': [(0, 0, {'message': response.get('error', {})})]})
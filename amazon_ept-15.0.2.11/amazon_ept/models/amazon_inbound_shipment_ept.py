@@ -14,13 +14,13 @@ import logging
 from datetime import datetime
 import dateutil.parser
 from odoo import models, fields, api, _
-from odoo.addons.iap.tools import iap_tools
 from odoo.exceptions import UserError
 try:
     from _collections import defaultdict
 except ImportError:
     pass
 from ..endpoint import DEFAULT_ENDPOINT
+from ..transport import amazon_jsonrpc
 from .utils import xml2dict
 
 _logger = logging.getLogger(__name__)
@@ -467,7 +467,7 @@ class InboundShipmentEpt(models.Model):
                            'sku_qty_list': sku_qty_list,
                            'address_dict': address_dict})
 
-            response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+            response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
             if response.get('error', False):
                 self.default_inbound_shipment_response_log(response, ship_plan, job)
                 return False, job
@@ -479,7 +479,7 @@ class InboundShipmentEpt(models.Model):
                            'address_dict': address_dict,
                            'labelpreppreference': label_prep_type,
                            'cases_required': is_are_cases_required})
-            response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+            response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
             if response.get('error', False):
                 self.default_inbound_shipment_response_log(response, ship_plan, job)
                 return False, job
@@ -676,7 +676,7 @@ class InboundShipmentEpt(models.Model):
                                'sku_qty_list': sku_qty_list,
                                'address_dict': address_dict,
                                'shipment_status': shipment_status})
-                response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+                response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
                 if response.get('error', False):
                     raise UserError(_(response.get('error', {})))
             shipment.picking_ids.action_cancel()
@@ -731,7 +731,7 @@ class InboundShipmentEpt(models.Model):
                            'sku_qty_list': sku_qty_list,
                            'address_dict': address_dict,
                            'shipment_status': shipment_status})
-            response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+            response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
             if response.get('error', False):
                 raise UserError(_(response.get('error', {})))
             break
@@ -836,7 +836,7 @@ class InboundShipmentEpt(models.Model):
             kwargs.update({'emipro_api': 'amazon_submit_feeds_sp_api',
                            'feed_type': 'POST_FBA_INBOUND_CARTON_CONTENTS',
                            'marketplaceids': marketplaceids, 'data': data, })
-            response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+            response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
             if response.get('error', {}):
                 raise UserError(_(response.get('error', {})))
             results = response.get('results', {})
@@ -1050,7 +1050,7 @@ class InboundShipmentEpt(models.Model):
         instance = self.get_instance(self)
         kwargs = self.amz_prepare_inbound_shipment_kwargs_vals(instance)
         kwargs.update({'emipro_api': 'get_transport_content_sp_api', 'shipment_id': self.shipment_id,})
-        response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
         if response.get('error', False):
             raise UserError(_(response.get('error', {})))
         result = response.get('result', {})
@@ -1082,7 +1082,7 @@ class InboundShipmentEpt(models.Model):
         instance = self.get_instance(self)
         kwargs = self.amz_prepare_inbound_shipment_kwargs_vals(instance)
         kwargs.update({'emipro_api': 'estimate_transport_request_sp_api', 'shipment_id': self.shipment_id,})
-        response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
         if response.get('error', False):
             error_value = response.get('error', {})
             raise UserError(_(error_value))
@@ -1106,7 +1106,7 @@ class InboundShipmentEpt(models.Model):
             kwargs.update({'emipro_api': 'get_feed_submission_result_sp_api',
                            'feed_submission_id': self.feed_id.feed_result_id})
             try:
-                response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+                response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
                 if response.get('error', False):
                     raise UserError(_(response.get('error', {})))
                 result = response.get('result', {})
@@ -1167,7 +1167,7 @@ class InboundShipmentEpt(models.Model):
             kwargs = self.amz_prepare_inbound_shipment_kwargs_vals(instance)
             kwargs.update({'emipro_api': 'put_transport_content_sp_api',
                            'shipment_id': shipment.shipment_id, 'data': data, })
-            response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+            response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
             if response.get('error', False):
                 error_value = response.get('error', {})
                 message = '%s %s' % (error_value, shipment.name)
@@ -1260,7 +1260,7 @@ class InboundShipmentEpt(models.Model):
             kwargs = self.amz_prepare_inbound_shipment_kwargs_vals(instance)
             kwargs.update({'emipro_api': 'put_transport_content_sp_api',
                            'shipment_id': shipment.shipment_id, 'data': data})
-            response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+            response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
             self.process_small_parcel_tracking_response_result(response, pickings, shipment, model_id, job)
             if shipment.state != 'ERROR':
                 self.update_shipment_ept(shipment, pickings, back_orders, auto_called, instance, job)
@@ -1427,7 +1427,7 @@ class InboundShipmentEpt(models.Model):
                        'sku_qty_list': sku_qty_list,
                        'address_dict': address_dict,
                        'shipment_status': shipment_status})
-        response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
         if response.get('error', False):
             error_value = response.get('error', {})
             if job:
@@ -1464,7 +1464,7 @@ class InboundShipmentEpt(models.Model):
             kwargs = self.amz_prepare_inbound_shipment_kwargs_vals(instance)
             kwargs.update({'emipro_api': 'put_transport_content_sp_api',
                            'shipment_id': shipment.shipment_id, 'data': data})
-            response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+            response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
             if response.get('error', False):
                 error_value = response.get('error', {})
                 message = '%s %s' % (error_value, shipment.name)
@@ -1512,7 +1512,7 @@ class InboundShipmentEpt(models.Model):
         instance = self.get_instance(self)
         kwargs = self.amz_prepare_inbound_shipment_kwargs_vals(instance)
         kwargs.update({'emipro_api': 'confirm_transport_request_sp_api', 'shipment_id': self.shipment_id})
-        response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
         if response.get('error', False):
             error_value = response.get('error', {})
             raise UserError(_(error_value))
@@ -1541,7 +1541,7 @@ class InboundShipmentEpt(models.Model):
             self.get_transport_content()
         kwargs = self.amz_prepare_inbound_shipment_kwargs_vals(instance)
         kwargs.update({'emipro_api': 'void_transport_request_sp_api', 'shipment_id': self.shipment_id})
-        response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
         if response.get('error', False):
             error_value = response.get('error', {})
             raise UserError(_(error_value))
@@ -1618,7 +1618,7 @@ class InboundShipmentEpt(models.Model):
         for instance, shipment_ids in instance_shipment_ids.items():
             kwargs = self.amz_prepare_inbound_shipment_kwargs_vals(instance)
             kwargs.update({'emipro_api': 'check_status_by_shipment_ids', 'shipment_ids': shipment_ids})
-            response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+            response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
             if response.get('error', {}) and self._context.get('is_auto_process', False):
                 self.search_or_create_inbound_common_log_ept('import', AMZ_INBOUND_SHIPMENT_EPT,
                                                              response.get('error', {}))
@@ -1645,7 +1645,7 @@ class InboundShipmentEpt(models.Model):
             if shipment_status in ['RECEIVING', 'CLOSED']:
                 kwargs = self.amz_prepare_inbound_shipment_kwargs_vals(instance)
                 kwargs.update({'emipro_api': 'check_amazon_shipment_status_spapi', 'amazon_shipment_id': shipmentid})
-                response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+                response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
                 if response.get('error', False):
                     raise UserError(_(response.get('error', {})))
                 pickings = odoo_shipment_rec.mapped('picking_ids').filtered(lambda r: r.state in ['assigned'] and r.is_fba_wh_picking)
@@ -1963,7 +1963,7 @@ class InboundShipmentEpt(models.Model):
         kwargs = self.amz_prepare_inbound_shipment_kwargs_vals(instance)
         kwargs.update({'emipro_api': 'put_transport_content_sp_api',
                        'shipment_id': self.shipment_id, 'data': data})
-        response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
         if response.get('error', False):
             error_value = response.get('error', {})
             if not auto_called:
@@ -2026,7 +2026,7 @@ class InboundShipmentEpt(models.Model):
             kwargs = self.amz_prepare_inbound_shipment_kwargs_vals(instance)
             kwargs.update({'emipro_api': 'put_transport_content_sp_api',
                            'shipment_id': shipment.shipment_id, 'data': data})
-            response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+            response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
             if response.get('error', False):
                 error_value = response.get('error', {})
                 message = '%s %s' % (error_value, shipment.name)
@@ -2095,7 +2095,7 @@ class InboundShipmentEpt(models.Model):
         instance = self.get_instance(self)
         kwargs = self.amz_prepare_inbound_shipment_kwargs_vals(instance)
         kwargs.update({'emipro_api': 'get_bill_of_lading_sp_api', 'shipment_id': self.shipment_id})
-        response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
         if response.get('error', False):
             raise UserError(_(response.get('error', {})))
 
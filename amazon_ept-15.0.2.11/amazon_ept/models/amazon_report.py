@@ -9,9 +9,9 @@ from datetime import datetime, timedelta
 import pytz
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
-from odoo.addons.iap.tools import iap_tools
 from ..reportTypes import ReportType
 from ..endpoint import DEFAULT_ENDPOINT
+from ..transport import amazon_jsonrpc
 
 utc = pytz.utc
 
@@ -112,7 +112,7 @@ class AmazonReports(models.AbstractModel):
             start_date, end_date = self.report_start_and_end_date()
             kwargs.update({'start_date': start_date, 'end_date': end_date})
         kwargs.update({'emipro_api': emipro_api, 'report_type': report_type})
-        response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
         if response.get('error', False):
             if not self._context.get('is_auto_process', False):
                 raise UserError(_(response.get('error', {})))
@@ -132,7 +132,7 @@ class AmazonReports(models.AbstractModel):
         if self.report_id:
             kwargs = self.prepare_amazon_request_report_kwargs(self.seller_id)
             kwargs.update({'emipro_api': 'get_report_sp_api', 'report_id': self.report_id})
-            response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+            response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
             if response.get('error', False):
                 raise UserError(_(response.get('error', {})))
             if response.get('result', {}):
@@ -161,7 +161,7 @@ class AmazonReports(models.AbstractModel):
             kwargs.update({'emipro_api': emipro_api, 'reportDocumentId': self.report_document_id})
             if amz_report_type:
                 kwargs.update({'amz_report_type': amz_report_type, 'report_id': self.report_id})
-            response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+            response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
             if response.get('error', False):
                 if not self._context.get('is_auto_process', False):
                     raise UserError(_(response.get('error', {})))
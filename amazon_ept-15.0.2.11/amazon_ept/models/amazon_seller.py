@@ -9,9 +9,9 @@ import time
 from datetime import datetime, timedelta
 from odoo import SUPERUSER_ID
 from odoo import models, fields, api, _
-from odoo.addons.iap.tools import iap_tools
 from odoo.exceptions import UserError
 from ..endpoint import DEFAULT_ENDPOINT
+from ..transport import amazon_jsonrpc
 from ..endpoint import FULFILLMENT_ENDPOINT
 
 TYPE2JOURNAL = {
@@ -727,7 +727,7 @@ class AmazonSellerEpt(models.Model):
             kwargs.update({'emipro_api': 'check_amazon_shipment_status_spapi',
                            'last_updated_after': last_updated_after.isoformat(),
                            'last_updated_before': last_updated_before.isoformat()})
-            response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+            response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
             if response.get('error', False):
                 raise UserError(_(response.get('error', {})))
             items = response.get('items', {})
@@ -765,7 +765,7 @@ class AmazonSellerEpt(models.Model):
                     kwargs.update({'emipro_api': 'check_status_by_shipment_ids',
                                    'shipment_ids': ','.join(ship_id_list[max_range:max_range + 50])})
                     max_range += 50
-                    response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+                    response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
                     if response.get('error', False):
                         raise UserError(_(response.get('error', {})))
                     items = response.get('amazon_shipments', {})
@@ -876,7 +876,7 @@ class AmazonSellerEpt(models.Model):
                             'AMEN7PMS3EDWL']
         marketplace_obj = self.env['amazon.marketplace.ept']
         kwargs = self.prepare_marketplace_kwargs()
-        response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
         if response.get('error', False):
             raise UserError(_(response.get('error', {})))
         values = response.get('result', {})
@@ -1165,8 +1165,8 @@ class AmazonSellerEpt(models.Model):
         sellers.check_fba_warehouse_partner_and_country_configured()
         country_code = fba_warehouses.mapped('partner_id').mapped('country_id').mapped('code')
         kwargs = {'country_code': country_code}
-        response = iap_tools.iap_jsonrpc(FULFILLMENT_ENDPOINT, params=kwargs,
-                                         timeout=1000)
+        response = amazon_jsonrpc(FULFILLMENT_ENDPOINT, params=kwargs,
+                                  timeout=1000)
         if response.get('error'):
             raise UserError(_("Something went wrong during fetch fulfilment centers details!"))
         fulfillment_centers = response.get('fulfillment_centers', {})
@@ -1217,8 +1217,8 @@ class AmazonSellerEpt(models.Model):
                   'mws_auth_token': self.auth_token,
                   'amazon_marketplace_code': self.country_id.amazon_marketplace_code or
                                              self.country_id.code}
-        response = iap_tools.iap_jsonrpc('https://iap.odoo.emiprotechnologies.com/sp_api_authorisation',
-                                         params=kwargs, timeout=1000)
+        response = amazon_jsonrpc('https://iap.odoo.emiprotechnologies.com/sp_api_authorisation',
+                                  params=kwargs, timeout=1000)
         if response.get('error', {}) or response.get('reason', {}):
             message = response.get('error', {}) or response.get('reason', {})
             raise UserError(_(message))
@@ -1234,8 +1234,8 @@ class AmazonSellerEpt(models.Model):
             amz_marketplace_code = 'UK'
         kwargs = {'merchant_id': self.merchant_id if self.merchant_id else False,
                   'amazon_marketplace_code': amz_marketplace_code}
-        response = iap_tools.iap_jsonrpc('https://iap.odoo.emiprotechnologies.com/sp_api_re_authorisation',
-                                         params=kwargs, timeout=1000)
+        response = amazon_jsonrpc('https://iap.odoo.emiprotechnologies.com/sp_api_re_authorisation',
+                                  params=kwargs, timeout=1000)
         if response.get('error', {}):
             user_message = response.get('error', {})
         elif response.get('result', {}):
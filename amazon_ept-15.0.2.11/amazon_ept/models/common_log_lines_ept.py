@@ -34,7 +34,7 @@ class CommonLogLineEpt(models.Model):
                             'product_title': product_title,
                             'log_book_id': log_rec and log_rec.id or False,
                             'mismatch_details': mismatch}
-        log_line = self.create(transaction_vals)
+        log_line = self.create_or_buffer_log_line_ept(transaction_vals)
         return log_line
 
     def amazon_create_order_log_line(self, message, model_id, res_id, order_ref, default_code, fulfillment_by,
@@ -50,5 +50,5 @@ class CommonLogLineEpt(models.Model):
                             'fulfillment_by': fulfillment_by,
                             'log_book_id': log_rec and log_rec.id or False,
                             'mismatch_details': mismatch}
-        log_line = self.create(transaction_vals)
+        log_line = self.create_or_buffer_log_line_ept(transaction_vals)
         return log_line
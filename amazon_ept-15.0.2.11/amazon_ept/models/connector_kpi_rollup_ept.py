@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for full copyright and licensing details.
+
+"""
+Inherited class to add the Amazon orders in the connector daily KPIs
+"""
+from odoo import models
+
+
+class ConnectorKpiRollupEpt(models.Model):
+    """
+    Inherited class to add the Amazon orders, split by fulfillment, in the connector daily KPIs
+    """
+    _inherit = "connector.kpi.rollup.ept"
+
+    def _get_kpi_rollup_sources_ept(self):
+        """
+        Add the Amazon orders in the daily KPIs, the segment of an order is its fulfillment (FBA or FBM).
+        """
+        sources = super(ConnectorKpiRollupEpt, self)._get_kpi_rollup_sources_ept()
+        sources.append({"instance_model": "amazon.instance.ept",
+                        "order_field": "amz_instance_id",
+                        "refund_field": "amazon_instance_id",
+                        "segment": "coalesce(so.amz_fulfillment_by, '')",
+                        "shipped_condition": "true"})
+        return sources
@@ -10,10 +10,10 @@ import time
 from io import StringIO
 import pytz
 from odoo import models, fields, api, _
-from odoo.addons.iap.tools import iap_tools
 from odoo.exceptions import UserError
 from ..reportTypes import ReportType
 from ..endpoint import DEFAULT_ENDPOINT, DECODE_ENDPOINT
+from ..transport import amazon_jsonrpc
 
 utc = pytz.utc
 
@@ -207,7 +207,7 @@ class FbmSaleOrderReportEpt(models.Model):
         kwargs.update({'report_type': report_type,
                        'marketplace_ids': marketplace_ids,
                        'reportOptions': {'ShowSalesChannel': 'true'}})
-        response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
         if response.get('error', False):
             if not self._context.get('is_auto_process', False):
                 raise UserError(_(response.get('error', {})))
@@ -281,7 +281,7 @@ class FbmSaleOrderReportEpt(models.Model):
             sale_orders_list = ",".join(sale_orders_list)
             kwargs.update({'sale_order_list': sale_orders_list})
             #Max_request_quota = 6, restore_rate = 1req/min
-            response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+            response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
             if response.get('error', False):
                 if self._context.get('is_auto_process', False):
                     common_log_line_obj.amazon_create_order_log_line(response.get('error', {}), model_id, self.id,
@@ -922,7 +922,7 @@ class FbmSaleOrderReportEpt(models.Model):
         kwargs = {'dbuuid': dbuuid, 'report_id': self.report_id, 'report_document_id': self.report_document_id,
                   'datas': attachment_id.datas.decode(), 'amz_report_type': 'fbm_report_spapi',
                   'merchant_id': self.seller_id.merchant_id}
-        response = iap_tools.iap_jsonrpc(DECODE_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DECODE_ENDPOINT, params=kwargs, timeout=1000)
         if response.get('result', False):
             try:
                 imp_file = StringIO(base64.b64decode(response.get('result', {})).decode())
@@ -10,9 +10,9 @@ import time
 
 from .utils import xml2dict
 from odoo import models, fields, _
-from odoo.addons.iap.tools import iap_tools
 from odoo.exceptions import UserError
 from ..endpoint import DEFAULT_ENDPOINT
+from ..transport import amazon_jsonrpc
 
 _logger = logging.getLogger(__name__)
 
@@ -72,7 +72,7 @@ class FeedSubmissionHistory(models.Model):
                                              self.seller_id.country_id.code,
                   'feed_submission_id': feed_submission_id}
 
-        response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
         if response.get('error', False):
             if self._context.get('auto_process', False):
                 _logger.info(response.get('error', {}))
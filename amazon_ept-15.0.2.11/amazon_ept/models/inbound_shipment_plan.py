@@ -6,10 +6,10 @@ This will perform the amazon inbound shipment plan operations
 """
 
 from odoo import models, fields, api, _
-from odoo.addons.iap.tools import iap_tools
 from odoo.exceptions import UserError
 
 from ..endpoint import DEFAULT_ENDPOINT
+from ..transport import amazon_jsonrpc
 INBOUND_SHIPMENT_PLAN_EPT = 'inbound.shipment.plan.ept'
 COMMON_LOG_LINES_EPT = 'common.log.lines.ept'
 AMAZON_INBOUND_SHIPMENT_EPT = 'amazon.inbound.shipment.ept'
@@ -308,7 +308,7 @@ class InboundShipmentPlanEpt(models.Model):
                   'inbound_box_content_status': shipment.intended_box_contents_source,
                   }
 
-        response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
         if response.get('error', False):
             error_value = response.get('error', {})
             log_line_obj.create_log_lines(error_value, model_id, self, job)
@@ -394,7 +394,7 @@ class InboundShipmentPlanEpt(models.Model):
                            'labelpreppreference': self.label_preference,
                            'sku_qty_list': sku_qty_dict,
                            'ship_from_address': address_dict})
-            response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+            response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
             if response.get('error', False):
                 error_value = response.get('error', {})
                 if not job:
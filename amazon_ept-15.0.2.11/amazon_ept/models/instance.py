@@ -5,12 +5,12 @@ Added class to store the amazon instance details and prepare routes,
 test instance connection and process unsellable and sellable operations
 """
 import json
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 
 from odoo import models, fields, api, _
-from odoo.addons.iap.tools import iap_tools
 from odoo.exceptions import UserError
 from ..endpoint import VERIFY_ENDPOINT
+from ..transport import amazon_jsonrpc
 
 AMZ_INSTANCE_EPT = 'amazon.instance.ept'
 STOCK_LOCATION = 'stock.location'
@@ -108,16 +108,14 @@ class AmazonInstanceEpt(models.Model):
             context.update({'fulfillment_by': 'Both'})
         self.env.context = context
         for record in self:
-            #Prepare where clause for fulfillment by as per selected
-            fulfillment_by_where_clause = self.prepare_fulfillment_by_where_clause(record)
             # Prepare values for Graph
-            values = self.get_graph_data(record, fulfillment_by_where_clause)
-            data_type, comparison_value = self.get_compare_data(record, fulfillment_by_where_clause)
+            values = self.get_graph_data(record)
+            data_type, comparison_value = self.get_compare_data(record)
             # Total sales
             total_sales = round(sum([key['y'] for key in values]), 2)
             # Order count query
-            fbm_order_data = self.get_fbm_total_orders(record, fulfillment_by_where_clause)
-            fba_order_data = self.get_fba_total_orders(record, fulfillment_by_where_clause)
+            fbm_order_data = self.get_fbm_total_orders(record)
+            fba_order_data = self.get_fba_total_orders(record)
             # Product count query
             product_data = self.get_total_products(record)
             record.amazon_order_data = json.dumps({
@@ -138,52 +136,19 @@ class AmazonInstanceEpt(models.Model):
             })
 
     @staticmethod
-    def get_fba_total_orders(record, fulfillment_by_where_clause):
+    def get_fba_total_orders(record):
         """
-        Use:
-        Added on:
-        :return:
+        Use: fetch the count of FBA orders and the action to open them
+        Added on: 30th Dec.
+        :return: dict of the order count and action
         """
-        def orders_of_current_week(record, fulfillment_by_where_clause):
-            record._cr.execute("""select id from sale_order where date(date_order)
-                                >= (select date_trunc('week', date(current_date)))
-                                and amz_instance_id= {0} and state in ('sale','done') and amz_fulfillment_by = 'FBA' {1}
-                                order by date(date_order)""" .format(record.id, fulfillment_by_where_clause))
-            return record._cr.dictfetchall()
-
-        def orders_of_current_month(record, fulfillment_by_where_clause):
-            record._cr.execute("""select id from sale_order where date(date_order) >=
-                                (select date_trunc('month', date(current_date)))
-                                and amz_instance_id= {0} and state in ('sale','done') and amz_fulfillment_by = 'FBA' {1}
-                                order by date(date_order)""" .format(record.id, fulfillment_by_where_clause))
-            return record._cr.dictfetchall()
-
-        def orders_of_current_year(record, fulfillment_by_where_clause):
-            record._cr.execute("""select id from sale_order where date(date_order) >=
-                                (select date_trunc('year', date(current_date)))
-                                and amz_instance_id= {0} and state in ('sale','done') and amz_fulfillment_by = 'FBA' {1}
-                                order by date(date_order)""" .format(record.id, fulfillment_by_where_clause))
-            return record._cr.dictfetchall()
-
-        def orders_of_all_time(record, fulfillment_by_where_clause):
-            record._cr.execute(
-                """select id from sale_order where amz_instance_id = {0} and state in ('sale','done') and
-                amz_fulfillment_by = 'FBA' {1}""" .format(record.id, fulfillment_by_where_clause))
-            return record._cr.dictfetchall()
-
         order_data = {}
-        if record._context.get('sort', '') == "week":
-            result = orders_of_current_week(record, fulfillment_by_where_clause)
-        elif record._context.get('sort', '') == "month":
-            result = orders_of_current_month(record, fulfillment_by_where_clause)
-        elif record._context.get('sort', '') == "year":
-            result = orders_of_current_year(record, fulfillment_by_where_clause)
-        else:
-            result = orders_of_all_time(record, fulfillment_by_where_clause)
-        order_ids = [data.get('id', False) for data in result]
+        domain = [('amz_instance_id', '=', record.id), ('state', 'in', ['sale', 'done']),
+                  ('amz_fulfillment_by', 'in', list({'FBA'} & set(record.get_dashboard_fulfillment_by())))]
+        domain += record.get_dashboard_period_domain('date_order')
         view = record.env.ref('amazon_ept.action_amazon_fba_sales_order_ept').sudo().read()[0]
-        action = record.prepare_action(view, [('id', 'in', order_ids)])
-        order_data.update({'order_count': len(order_ids), 'order_action': action})
+        action = record.prepare_action(view, domain)
+        order_data.update({'order_count': record.env['sale.order'].search_count(domain), 'order_action': action})
         return order_data
 
     @staticmethod
@@ -205,79 +170,73 @@ class AmazonInstanceEpt(models.Model):
         return product_data
 
     @staticmethod
-    def get_compare_data(record, fulfillment_by_where_clause):
+    def get_compare_data(record):
         """
         :return: Comparison ratio of orders (weekly,monthly and yearly based on selection)
         """
         data_type = False
         total_percentage = 0.0
 
-        def get_compared_week_data(record, fulfillment_by_where_clause):
+        def get_compared_week_data(record):
             current_total = 0.0
             previous_total = 0.0
             day_of_week = date.weekday(date.today())
-            record._cr.execute("""select sum(amount_untaxed) as current_week from sale_order
-                                where date(date_order) >= (select date_trunc('week', date(current_date))) and
-                                amz_instance_id={0} and state in
-                                 ('sale','done') {1}""" .format(record.id, fulfillment_by_where_clause))
+            record._cr.execute("""select sum(amount_untaxed) as current_week from {orders}
+                                where date(date_order) >= (select date_trunc('week', date(current_date)))
+                                """ .format(orders=record.get_kpi_rollup_orders_query()))
             current_week_data = record._cr.dictfetchone()
             current_total = current_week_data.get('current_week', 0.0) if current_week_data and current_week_data.get(
                 'current_week', 0.0) else 0
             # Previous week data
-            record._cr.execute("""select sum(amount_untaxed) as previous_week from sale_order
+            record._cr.execute("""select sum(amount_untaxed) as previous_week from {orders}
                             where date(date_order) between (select date_trunc('week', current_date) - interval '7 day') 
                             and (select date_trunc('week', (select date_trunc('week', current_date) - interval '7
                             day')) + interval '{0} day')
-                            and amz_instance_id={1} and state in ('sale','done') {2}
-                            """ .format(day_of_week, record.id, fulfillment_by_where_clause))
+                            """ .format(day_of_week, orders=record.get_kpi_rollup_orders_query()))
 
             previous_week_data = record._cr.dictfetchone()
             previous_total = previous_week_data.get(
                 'previous_week', 0.0) if previous_week_data and previous_week_data.get('previous_week', 0.0) else 0
             return current_total, previous_total
 
-        def get_compared_month_data(record, fulfillment_by_where_clause):
+        def get_compared_month_data(record):
             current_total = 0.0
             previous_total = 0.0
             day_of_month = date.today().day - 1
-            record._cr.execute("""select sum(amount_untaxed) as current_month from sale_order
+            record._cr.execute("""select sum(amount_untaxed) as current_month from {orders}
                                 where date(date_order) >= (select date_trunc('month', date(current_date)))
-                                and amz_instance_id={0} and state in ('sale','done') {1}""".format(
-                                    record.id, fulfillment_by_where_clause))
+                                """.format(orders=record.get_kpi_rollup_orders_query()))
             current_data = record._cr.dictfetchone()
             current_total = current_data.get('current_month', 0.0) if current_data and current_data.get(
                 'current_month', 0.0) else 0
             # Previous week data
-            record._cr.execute("""select sum(amount_untaxed) as previous_month from sale_order where date(date_order)
+            record._cr.execute("""select sum(amount_untaxed) as previous_month from {orders} where date(date_order)
                             between (select date_trunc('month', current_date) - interval '1 month') and
                             (select date_trunc('month', (select date_trunc('month', current_date) - interval
                             '1 month')) + interval '{0} days')
-                            and amz_instance_id={1} and state in ('sale','done') {2}
-                            """ .format(day_of_month, record.id, fulfillment_by_where_clause))
+                            """ .format(day_of_month, orders=record.get_kpi_rollup_orders_query()))
             previous_data = record._cr.dictfetchone()
             previous_total = previous_data.get('previous_month', 0.0) if previous_data and previous_data.get(
                 'previous_month', 0.0) else 0
             return current_total, previous_total
 
-        def get_compared_year_data(record, fulfillment_by_where_clause):
+        def get_compared_year_data(record):
             current_total = 0.0
             previous_total = 0.0
             year_begin = date.today().replace(month=1, day=1)
             year_end = date.today()
             delta = (year_end - year_begin).days - 1
-            record._cr.execute("""select sum(amount_untaxed) as current_year from sale_order
+            record._cr.execute("""select sum(amount_untaxed) as current_year from {orders}
                                 where date(date_order) >= (select date_trunc('year', date(current_date)))
-                                and amz_instance_id={0} and state in
-                                 ('sale','done') {1}""" .format(record.id, fulfillment_by_where_clause))
+                                """ .format(orders=record.get_kpi_rollup_orders_query()))
             current_data = record._cr.dictfetchone()
             current_total = current_data.get('current_year', 0.0) if current_data and current_data.get(
                 'current_year', 0.0) else 0
             # Previous week data
-            record._cr.execute("""select sum(amount_untaxed) as previous_year from sale_order where date(date_order)
+            record._cr.execute("""select sum(amount_untaxed) as previous_year from {orders} where date(date_order)
                             between (select date_trunc('year', date(current_date) - interval '1 year')) and 
                             (select date_trunc('year', date(current_date) - interval '1 year') + interval '{0} days') 
-                            and amz_instance_id={1} and state in ('sale','done') {2}
-                            """ .format(delta, record.id, fulfillment_by_where_clause))
+                            """ .format(delta, orders=record.get_kpi_rollup_orders_query()))
 
             previous_data = record._cr.dictfetchone()
             previous_total = previous_data.get('previous_year', 0.0) if previous_data and previous_data.get(
@@ -285,11 +244,11 @@ class AmazonInstanceEpt(models.Model):
             return current_total, previous_total
 
         if record._context.get('sort', '') == 'week':
-            current_total, previous_total = get_compared_week_data(record, fulfillment_by_where_clause)
+            current_total, previous_total = get_compared_week_data(record)
         elif record._context.get('sort', '') == "month":
-            current_total, previous_total = get_compared_month_data(record, fulfillment_by_where_clause)
+            current_total, previous_total = get_compared_month_data(record)
         elif record._context.get('sort', '') == "year":
-            current_total, previous_total = get_compared_year_data(record, fulfillment_by_where_clause)
+            current_total, previous_total = get_compared_year_data(record)
         else:
             current_total, previous_total = 0.0, 0.0
         if current_total > 0.0:
@@ -302,14 +261,14 @@ class AmazonInstanceEpt(models.Model):
         return data_type, round(total_percentage, 2)
 
     @staticmethod
-    def get_graph_data(record, fulfillment_by_where_clause):
+    def get_graph_data(record):
         """
         Use: To get the details of sale orders and total amount month wise or year wise to prepare the graph
         Added on: 30th Dec, 2020
         :return: sale order date or month and sum of sale orders amount of current instance
         """
 
-        def get_current_week_date(record, fulfillment_by_where_clause):
+        def get_current_week_date(record):
             record._cr.execute("""SELECT to_char(date(d.day),'DAY'), t.amount_untaxed as sum
                                 FROM  (
                                    SELECT day
@@ -319,17 +278,16 @@ class AmazonInstanceEpt(models.Model):
                                    ) d
                                 LEFT   JOIN 
                                 (SELECT date(date_order)::date AS day, sum(amount_untaxed) as amount_untaxed
-                                   FROM   sale_order
+                                   FROM   {orders}
                                    WHERE  date(date_order) >= (select date_trunc('week', date(current_date)))
                                    AND    date(date_order) <= (select date_trunc('week', date(current_date)) 
                                    + interval '6 days')
-                                   AND amz_instance_id={0} and state in ('sale','done') {1}
                                    GROUP  BY 1
                                    ) t USING (day)
-                                ORDER  BY day""" .format(record.id, fulfillment_by_where_clause))
+                                ORDER  BY day""" .format(orders=record.get_kpi_rollup_orders_query()))
             return record._cr.dictfetchall()
 
-        def graph_of_current_month(record, fulfillment_by_where_clause):
+        def graph_of_current_month(record):
             record._cr.execute("""select EXTRACT(DAY from date(date_day)) :: integer,sum(amount_untaxed) from (
                         SELECT 
                           day::date as date_day,
@@ -340,18 +298,17 @@ class AmazonInstanceEpt(models.Model):
                         union all
                         SELECT date(date_order)::date AS date_day,
                         sum(amount_untaxed) as amount_untaxed
-                          FROM   sale_order
+                          FROM   {orders}
                         WHERE  date(date_order) >= (select date_trunc('month', date(current_date)))
                         AND date(date_order)::date <= (select date_trunc('month', date(current_date)) 
                         + '1 MONTH - 1 day')
-                        and amz_instance_id = {0} and state in ('sale','done') {1}
                         group by 1
                         )foo 
                         GROUP  BY 1
-                        ORDER  BY 1""" .format(record.id, fulfillment_by_where_clause))
+                        ORDER  BY 1""" .format(orders=record.get_kpi_rollup_orders_query()))
             return record._cr.dictfetchall()
 
-        def graph_of_current_year(record, fulfillment_by_where_clause):
+        def graph_of_current_year(record):
             record._cr.execute("""select TRIM(TO_CHAR(DATE_TRUNC('month',month),'MONTH')),sum(amount_untaxed) from
                                 (SELECT DATE_TRUNC('month',date(day)) as month,
                                   0 as amount_untaxed
@@ -361,105 +318,91 @@ class AmazonInstanceEpt(models.Model):
                                 union all
                                 SELECT DATE_TRUNC('month',date(date_order)) as month,
                                 sum(amount_untaxed) as amount_untaxed
-                                  FROM   sale_order
+                                  FROM   {orders}
                                 WHERE  date(date_order) >= (select date_trunc('year', date(current_date))) AND 
                                 date(date_order)::date <= (select date_trunc('year', date(current_date)) 
                                 + '1 YEAR - 1 day')
-                                and amz_instance_id = {0} and state in ('sale','done') {1}
                                 group by DATE_TRUNC('month',date(date_order))
                                 order by month
                                 )foo 
                                 GROUP  BY foo.month
-                                order by foo.month""" .format(record.id, fulfillment_by_where_clause))
+                                order by foo.month""" .format(orders=record.get_kpi_rollup_orders_query()))
             return record._cr.dictfetchall()
 
-        def graph_of_all_time(record, fulfillment_by_where_clause):
+        def graph_of_all_time(record):
             record._cr.execute("""select TRIM(TO_CHAR(DATE_TRUNC('month',date_order),'YYYY-MM')),sum(amount_untaxed)
-                                from sale_order where amz_instance_id = {0} and state in ('sale','done') {1}
+                                from {orders}
                                 group by DATE_TRUNC('month',date_order) 
                                 order by DATE_TRUNC('month',date_order)""" .format(
-                                    record.id, fulfillment_by_where_clause))
+                                    orders=record.get_kpi_rollup_orders_query()))
             return record._cr.dictfetchall()
 
         # Prepare values for Graph
         if record._context.get('sort', '') == 'week':
-            result = get_current_week_date(record, fulfillment_by_where_clause)
+            result = get_current_week_date(record)
         elif record._context.get('sort', '') == "month":
-            result = graph_of_current_month(record, fulfillment_by_where_clause)
+            result = graph_of_current_month(record)
         elif record._context.get('sort', '') == "year":
-            result = graph_of_current_year(record, fulfillment_by_where_clause)
+            result = graph_of_current_year(record)
         else:
-            result = graph_of_all_time(record, fulfillment_by_where_clause)
+            result = graph_of_all_time(record)
         values = [{"x": ("{}".format(data.get(list(data.keys())[0], []))),
                    "y": data.get('sum', 0.0) or 0.0} for data in result]
         return values
 
-    @staticmethod
-    def prepare_fulfillment_by_where_clause(record):
+    def get_dashboard_fulfillment_by(self):
+        """
+        Use: To get the fulfillments selected in the kanban dashboard
+        :return: list of fulfillments
+        """
+        if self._context.get('fulfillment_by') in ['FBA', 'FBM']:
+            return [self._context.get('fulfillment_by')]
+        return ['FBA', 'FBM']
+
+    def get_dashboard_period_domain(self, field_name, is_date=False):
         """
-        Use: Use for the prepare fulfillment by where cluse
-        Added on: 07th January, 2021
-        :return: where cluse string
+        Use: To prepare the domain of the dashboard period selected in the kanban (week, month, year or all time)
+        :param field_name: Date or datetime field compared with the start of the period
+        :param is_date: True when the field is a date field
+        :return: domain
         """
-        if record._context.get('fulfillment_by') == 'FBA':
-            fulfillment_whare_cluse = """AND amz_fulfillment_by = 'FBA'"""
-        elif record._context.get('fulfillment_by') == 'FBM':
-            fulfillment_whare_cluse = """AND amz_fulfillment_by = 'FBM'"""
+        today = fields.Date.today()
+        if self._context.get('sort') == "week":
+            period_start = today - timedelta(days=today.weekday())
+        elif self._context.get('sort') == "month":
+            period_start = today.replace(day=1)
+        elif self._context.get('sort') == "year":
+            period_start = today.replace(month=1, day=1)
         else:
-            fulfillment_whare_cluse = """AND amz_fulfillment_by in ('FBM', 'FBA')"""
-        return fulfillment_whare_cluse
+            return []
+        if is_date:
+            return [(field_name, '>=', fields.Date.to_string(period_start))]
+        return [(field_name, '>=', fields.Datetime.to_string(datetime.combine(period_start, datetime.min.time())))]
+
+    def get_kpi_rollup_orders_query(self):
+        """
+        Use: To get the daily KPIs of the instance, for the selected fulfillment, shaped like its confirmed sale orders
+        for the dashboard queries
+        :return: sub query with the columns date_order and amount_untaxed
+        """
+        rollup_query = self.env['connector.kpi.rollup.ept'].get_kpi_rollup_query_ept(
+            self._name, self.id, self.get_dashboard_fulfillment_by())
+        return "(select date as date_order, revenue as amount_untaxed from %s as rollup) as sale_order" % rollup_query
 
     @staticmethod
-    def get_fbm_total_orders(record, fulfillment_by_where_clause):
+    def get_fbm_total_orders(record):
         """
-        Use: fetch data of fbm orders
+        Use: fetch the count of FBM orders and the action to open them
         Added on: 30th Dec.
-        :return: list of dict
+        :return: dict of the order count and action
         """
-
-        def orders_of_current_week(record, fulfillment_by_where_clause):
-            record._cr.execute("""select id from sale_order where date(date_order)
-                                >= (select date_trunc('week', date(current_date)))
-                                and amz_instance_id= {0} and state in ('sale','done') and amz_fulfillment_by = 'FBM' {1}
-                                order by date(date_order)
-                        """  .format(record.id, fulfillment_by_where_clause))
-            return record._cr.dictfetchall()
-
-        def orders_of_current_month(record, fulfillment_by_where_clause):
-            record._cr.execute("""select id from sale_order where date(date_order) >=
-                                (select date_trunc('month', date(current_date)))
-                                and amz_instance_id= {0} and state in ('sale','done') and amz_fulfillment_by = 'FBM' {1}
-                                order by date(date_order)
-                        """ .format(record.id, fulfillment_by_where_clause))
-            return record._cr.dictfetchall()
-
-        def orders_of_current_year(record, fulfillment_by_where_clause):
-            record._cr.execute("""select id from sale_order where date(date_order) >=
-                                (select date_trunc('year', date(current_date)))
-                                and amz_instance_id= {0} and state in ('sale','done') and amz_fulfillment_by = 'FBM' {1}
-                                order by date(date_order)"""
-                               .format(record.id, fulfillment_by_where_clause))
-            return record._cr.dictfetchall()
-
-        def orders_of_all_time(record, fulfillment_by_where_clause):
-            record._cr.execute(
-                """select id from sale_order where amz_instance_id = {0} and state in ('sale','done') and 
-                amz_fulfillment_by = 'FBM' {1}""" .format(record.id, fulfillment_by_where_clause))
-            return record._cr.dictfetchall()
-
         order_data = {}
-        if record._context.get('sort', '') == "week":
-            result = orders_of_current_week(record, fulfillment_by_where_clause)
-        elif record._context.get('sort', '') == "month":
-            result = orders_of_current_month(record, fulfillment_by_where_clause)
-        elif record._context.get('sort', '') == "year":
-            result = orders_of_current_year(record, fulfillment_by_where_clause)
-        else:
-            result = orders_of_all_time(record, fulfillment_by_where_clause)
-        order_ids = [data.get('id', False) for data in result]
+        domain = [('amz_instance_id', '=', record.id), ('state', 'in', ['sale', 'done']),
+                  ('amz_fulfillment_by', 'in', list({'FBM'} & set(record.get_dashboard_fulfillment_by())))]
+        domain += record.get_dashboard_period_domain('date_order')
         view = record.env.ref('amazon_ept.action_amazon_fbm_sales_order_ept').sudo().read()[0]
-        action = record.prepare_action(view, [('id', 'in', order_ids)])
-        order_data.update({'order_count': len(order_ids), 'order_action': action})
+        action = record.prepare_action(view, domain)
+        order_data.update({'order_count': record.env['sale.order'].search_count(domain), 'order_action': action})
         return order_data
 
     @staticmethod
@@ -530,7 +473,7 @@ class AmazonInstanceEpt(models.Model):
                   'amazon_marketplace_code': self.country_id.amazon_marketplace_code or self.country_id.code,
                   'odoo_version': 'v15'
                   }
-        response = iap_tools.iap_jsonrpc(VERIFY_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(VERIFY_ENDPOINT, params=kwargs, timeout=1000)
         if response.get('result', False):
             flag = response.get('result', {})
         else:
@@ -11,10 +11,10 @@ import time
 from datetime import datetime, timedelta
 
 from odoo import models, fields, api, _
-from odoo.addons.iap.tools import iap_tools
 from odoo.exceptions import UserError
 
 from ..endpoint import DEFAULT_ENDPOINT
+from ..transport import amazon_jsonrpc
 
 PRODUCT_PRODUCT = 'product.product'
 AMAZON_PRODUCT_EPT = 'amazon.product.ept'
@@ -213,7 +213,7 @@ class AmazonProductEpt(models.Model):
         data = self.create_product_envelope(instance)
         kwargs = self.get_amazon_product_request_data_ept(instance, data, 'amazon_submit_feeds_sp_api')
         kwargs.update({'feed_type': 'POST_PRODUCT_DATA'})
-        response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
         if response.get('error', False):
             raise UserError(_(response.get('error', {})))
         results = response.get('results', {})
@@ -564,7 +564,8 @@ class AmazonProductEpt(models.Model):
 
         if not from_datetime:
             from_datetime = datetime.today() - timedelta(days=365)
-        product_ids = prod_obj.get_products_based_on_movement_date_ept(from_datetime, company)
+        channel = "amazon.instance.ept,%s" % instance.id
+        product_ids, watermark = prod_obj.get_products_changed_since_watermark_ept(channel, company, from_datetime)
         amazon_products = self.env[AMAZON_PRODUCT_EPT].search([('exported_to_amazon', '=', True),
                                                                  ('instance_id', '=', instance.id),
                                                                  ('fulfillment_by', '=', 'FBM'),
@@ -574,6 +575,7 @@ class AmazonProductEpt(models.Model):
                                                                          amazon_products.ids, warehouse_ids)
         if message_information:
             self.process_amazon_export_stock_dict_ept(instance, message_information)
+        self.env['stock.move.watermark.ept'].set_watermark_ept(channel, company, watermark)
         return True
 
     def process_export_stock_message_info_ept(self, instance, product_ids, amazon_products_ids,
@@ -609,7 +611,7 @@ class AmazonProductEpt(models.Model):
         <MessageType>Inventory</MessageType>""" + message_information + """</AmazonEnvelope>"""
         kwargs = self.get_amazon_product_request_data_ept(instance, data, 'amazon_submit_feeds_sp_api')
         kwargs.update({'feed_type': 'POST_INVENTORY_AVAILABILITY_DATA'})
-        response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
         self.process_amazon_export_stock_response_ept(instance, data, response)
         return True
 
@@ -738,7 +740,7 @@ class AmazonProductEpt(models.Model):
             </Header>""" + message_type + """""" + message_information + """</AmazonEnvelope>"""
             kwargs = self.get_amazon_product_request_data_ept(instance, data, 'amazon_submit_feeds_sp_api')
             kwargs.update({'feed_type': 'POST_PRODUCT_PRICING_DATA'})
-            response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+            response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
             if response.get('error', False):
                 raise UserError(_(response.get('error', {})))
             results = response.get('results', {})
@@ -806,7 +808,7 @@ class AmazonProductEpt(models.Model):
             ProductImage</MessageType>""" + message_information + """</AmazonEnvelope> """
             kwargs = self.get_amazon_product_request_data_ept(instance, data, 'amazon_submit_feeds_sp_api')
             kwargs.update({'feed_type': 'POST_PRODUCT_IMAGE_DATA'})
-            response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+            response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
             if response.get('error', False):
                 raise UserError(_(response.get('error', {})))
             results = response.get('results', {})
@@ -9,8 +9,8 @@ import time
 from tempfile import NamedTemporaryFile
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
-from odoo.addons.iap.tools import iap_tools
 from ..endpoint import DEFAULT_ENDPOINT
+from ..transport import amazon_jsonrpc
 
 STOCK_PICKING = 'stock.picking'
 PROCUREMENT_GROUP = 'procurement.group'
@@ -269,7 +269,7 @@ class RemovalOrder(models.Model):
         elif self.removal_disposition in ['Disposal', 'Liquidations']:
             self.with_context(ctx).disposal_order_pickings()
 
-        response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
         if response.get('error', False):
             raise UserError(_(response.get('error', {})))
         self.write({'state': 'plan_approved'})
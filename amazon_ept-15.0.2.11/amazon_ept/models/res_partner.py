@@ -3,7 +3,7 @@
 
 import itertools
 from odoo import api, models, fields
-from odoo.addons.iap.tools import iap_tools
+from ..transport import amazon_jsonrpc
 
 
 class ResPartner(models.Model):
@@ -63,7 +63,7 @@ class ResPartner(models.Model):
             }
             partner_to_skip = tuple(self.env.company.search([]).partner_id.ids)
 
-            iap_tools.iap_jsonrpc('https://iap.odoo.emiprotechnologies.com/delete_pii', params=kwargs, timeout=1000)
+            amazon_jsonrpc('https://iap.odoo.emiprotechnologies.com/delete_pii', params=kwargs, timeout=1000)
 
             partner_to_skip_query = """select partner_id, partner_invoice_id, partner_shipping_id from sale_order
                                     where amz_instance_id is not null and sale_order.create_date>=current_date-30
@@ -96,7 +96,7 @@ class ResPartner(models.Model):
             self.env.cr.execute(query)
             if self.env.cr.rowcount:
                 kwargs.update({'updated_records': 'Archived %d customers' % self.env.cr.rowcount})
-                iap_tools.iap_jsonrpc('https://iap.odoo.emiprotechnologies.com/delete_pii', params=kwargs, timeout=1000)
+                amazon_jsonrpc('https://iap.odoo.emiprotechnologies.com/delete_pii', params=kwargs, timeout=1000)
         return True
 
     @api.model
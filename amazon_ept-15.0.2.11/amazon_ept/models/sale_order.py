@@ -8,15 +8,16 @@ Inherited sale order and fields to create amazon sale orders in odoo.
 import json
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 import pytz
 from dateutil import parser
 from odoo import models, fields, api, _
-from odoo.addons.iap.tools import iap_tools
 from odoo.exceptions import UserError
 
 from ..endpoint import DEFAULT_ENDPOINT
+from ..transport import amazon_jsonrpc
 
 utc = pytz.utc
 _logger = logging.getLogger(__name__)
@@ -30,6 +31,8 @@ COMMON_LOG_BOOK_EPT = 'common.log.book.ept'
 COMMON_LOG_LINES_EPT = 'common.log.lines.ept'
 DATE_YMDHMS = "%Y-%m-%d %H:%M:%S"
 DATE_YMDTHMS = "%Y-%m-%dT%H:%M:%S"
+FBM_ORDER_ITEMS_BATCH_SIZE = 50
+FBM_ORDER_ITEMS_WORKERS = 4
 AMAZON_INSTANCE_NOT_CONFIGURED_WARNING = "There is no any instance is configured of seller"
 
 
@@ -386,7 +389,7 @@ class SaleOrder(models.Model):
             seller.fba_pending_order_last_sync_on = datetime.now().strftime(DATE_YMDHMS)
         kwargs = self.prepare_amazon_request_report_kwargs(seller, 'import_pending_orders_sp_api')
         kwargs.update({'updated_after': updated_after_date, 'marketplaceids': marketplaceids, })
-        response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
         if response.get('error', False):
             if self._context.get('is_auto_process', False):
                 log_rec = self.search_or_create_amz_log_ept('sale.order')
@@ -421,7 +424,7 @@ class SaleOrder(models.Model):
         if next_token:
             # We have create list of Dictwrapper now we create orders into system
             kwargs.update({'next_token': next_token, 'emipro_api': 'order_by_next_token_sp_api', })
-            response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+            response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
             if response.get('error', False):
                 if self._context.get('is_auto_process', False):
                     log_rec = self.search_or_create_amz_log_ept('sale.order')
@@ -536,7 +539,7 @@ class SaleOrder(models.Model):
         kwargs = self.prepare_amazon_request_report_kwargs(seller, 'check_cancel_order_in_sp_api')
         kwargs.update({'marketplaceids': marketplaceids, 'updated_after': updated_after,
                        'fulfillment_channels': fulfillment_channels})
-        response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
         if response.get('error', False):
             if self._context.get('is_auto_process', False):
                 log_rec = self.search_or_create_amz_log_ept('sale.order')
@@ -727,7 +730,7 @@ class SaleOrder(models.Model):
         kwargs = self.prepare_amazon_request_report_kwargs(seller, 'get_amazon_order_sp_api')
         kwargs.update({'amazon_order_ref': amazon_order_ref})
 
-        response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
         if response.get('error', False):
             if self._context.get('is_auto_process', False):
                 log_rec = self.search_or_create_amz_log_ept('sale.order')
@@ -867,7 +870,7 @@ class SaleOrder(models.Model):
         kwargs.update({'marketplaceids': marketplaceids, 'updated_after': updated_after_date, })
         if next_token:
             kwargs.update({'next_token': next_token})
-        response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
         if response.get('error', False):
             raise UserError(_(response.get('error', {})))
         list_of_wrapper = response.get('result', [])
@@ -985,7 +988,7 @@ class SaleOrder(models.Model):
                                              instance.country_id.code,
                   'feed_type': 'POST_ORDER_ACKNOWLEDGEMENT_DATA',
                   'data': data, }
-        response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
         if response.get('error', False):
             raise UserError(_(response.get('error', {})))
 
@@ -1353,49 +1356,83 @@ class SaleOrder(models.Model):
 
     def amz_create_sales_order(self, queue_order, log_book):
         """
-        This method create the sale orders in odoo.
+        This method create the sale orders in odoo. The queue lines are processed in batches, the order items
+        of a batch are requested concurrently by a pool of workers, the sale orders are created in the main
+        cursor.
         :param queue_order: shipped.order.data.queue.ept()
-        :param account: iap.account()
-        :param dbuuid: ir.config_parameter()
         :param log_book: common.log.book.ept()
         :return: True
         """
-        common_log_line_ept = self.env[COMMON_LOG_LINES_EPT]
-        marketplace_instance_dict = dict()
-        request_counter = 0
-        model_id = self.env[IR_MODEL]._get(SALE_ORDER).id
         seller = queue_order.amz_seller_id
         queue_lines = queue_order.shipped_order_data_queue_lines.filtered(lambda x: x.state != 'done')
+        batches = [queue_lines[index:index + FBM_ORDER_ITEMS_BATCH_SIZE]
+                   for index in range(0, len(queue_lines), FBM_ORDER_ITEMS_BATCH_SIZE)]
+        marketplace_instance_dict = dict()
+        with ThreadPoolExecutor(max_workers=FBM_ORDER_ITEMS_WORKERS) as executor:
+            order_items = self.amz_prefetch_order_items_ept(executor, seller, batches[0],
+                                                            marketplace_instance_dict) if batches else {}
+            for index, batch in enumerate(batches):
+                # The items of the next batch are requested while the orders of this batch are created.
+                next_order_items = self.amz_prefetch_order_items_ept(
+                    executor, seller, batches[index + 1], marketplace_instance_dict) \
+                    if index + 1 < len(batches) else {}
+                self.amz_create_sales_order_batch_ept(seller, batch, order_items, marketplace_instance_dict,
+                                                      log_book)
+                order_items = next_order_items
+        return True
 
+    def amz_prefetch_order_items_ept(self, executor, seller, queue_lines, marketplace_instance_dict):
+        """
+        This method submit the order item requests of the queue lines to the worker pool. The workers only send
+        the requests, the transport paces them with the rate limits of the seller. Orders which are skipped by
+        amz_check_fbm_order_vals_ept or already cancelled by the buyer in odoo are not requested.
+        :param executor: ThreadPoolExecutor
+        :param seller: amazon.seller.ept()
+        :param queue_lines: shipped.order.data.queue.line.ept()
+        :param marketplace_instance_dict: dict {marketplace: amazon.instance.ept()}
+        :return: dict {amazon order reference: future of the response}
+        """
+        order_refs = set()
+        for line in queue_lines:
+            order = json.loads(line.order_data_id)
+            message = self.amz_check_fbm_order_vals_ept(seller, order, marketplace_instance_dict)[0]
+            if not message:
+                order_refs.add(order.get('AmazonOrderId'))
+        if not order_refs:
+            return {}
+        cancelled_orders = self.search([('amz_order_reference', 'in', list(order_refs)),
+                                        ('amz_instance_id', 'in', seller.instance_ids.ids),
+                                        ('amz_fulfillment_by', '=', 'FBM'),
+                                        ('buyer_requested_cancellation', '=', True)])
+        order_refs -= set(cancelled_orders.mapped('amz_order_reference'))
+        kwargs = self.prepare_amazon_request_report_kwargs(seller, 'get_amazon_order_sp_api')
+        return {order_ref: executor.submit(amazon_jsonrpc, DEFAULT_ENDPOINT,
+                                           params=dict(kwargs, amazon_order_ref=order_ref), timeout=1000)
+                for order_ref in order_refs}
+
+    def amz_create_sales_order_batch_ept(self, seller, queue_lines, order_items, marketplace_instance_dict,
+                                         log_book):
+        """
+        This method create the sale orders of a batch of queue lines, with the order items requested by
+        amz_prefetch_order_items_ept.
+        :param seller: amazon.seller.ept()
+        :param queue_lines: shipped.order.data.queue.line.ept()
+        :param order_items: dict {amazon order reference: future of the response}
+        :param marketplace_instance_dict: dict {marketplace: amazon.instance.ept()}
+        :param log_book: common.log.book.ept()
+        :return: True
+        """
+        common_log_line_ept = self.env[COMMON_LOG_LINES_EPT]
+        model_id = self.env[IR_MODEL]._get(SALE_ORDER).id
         for line in queue_lines:
             order = json.loads(line.order_data_id)
             amazon_order_ref = order.get('AmazonOrderId', False)
-            message, instance = self.check_amazon_order_vals_ept(seller, order, marketplace_instance_dict)
+            message, instance = self.amz_check_fbm_order_vals_ept(seller, order, marketplace_instance_dict)
             if message:
                 common_log_line_ept.amazon_create_order_log_line(message, model_id, False,
                                                                  amazon_order_ref, False, 'FBM', log_book)
                 line.state = 'failed'
                 continue
-            if not order.get('PurchaseDate', ''):
-                message = 'Skipped due to Purchase Date Not found.'
-                common_log_line_ept.amazon_create_order_log_line(message, model_id, False,
-                                                                 amazon_order_ref, False, 'FBM', log_book)
-                line.state = 'failed'
-                continue
-            if not order.get('BuyerInfo', {}).get('BuyerEmail', ''):
-                message = "Skipped due to Buyer's Details Not found."
-                common_log_line_ept.amazon_create_order_log_line(message, model_id, False,
-                                                                 amazon_order_ref, False, 'FBM', log_book)
-                line.state = 'failed'
-                continue
-            fulfillment_channel = order.get('FulfillmentChannel', '')
-            if fulfillment_channel and fulfillment_channel == 'AFN' and \
-                    not hasattr(instance, 'fba_warehouse_id'):
-                message = 'Skipped because of Fulfillment Channel is AFN'
-                common_log_line_ept.amazon_create_order_log_line(message, model_id, False,
-                                                                 amazon_order_ref, False, 'FBM', log_book)
-                line.state = 'failed'
-                continue
             existing_order = self.search([('amz_order_reference', '=', amazon_order_ref),
                                           ('amz_instance_id', '=', instance.id),
                                           ('amz_fulfillment_by', '=', 'FBM')])
@@ -1405,13 +1442,12 @@ class SaleOrder(models.Model):
                 line.state = 'done'
                 continue
 
-            kwargs = self.prepare_amazon_request_report_kwargs(seller, 'get_amazon_order_sp_api')
-            kwargs.update({'amazon_order_ref': amazon_order_ref})
-            request_counter += 1
-            if request_counter >= 25:
-                request_counter = 0
-                time.sleep(5)
-            response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+            if amazon_order_ref in order_items:
+                response = order_items[amazon_order_ref].result()
+            else:
+                kwargs = self.prepare_amazon_request_report_kwargs(seller, 'get_amazon_order_sp_api')
+                kwargs.update({'amazon_order_ref': amazon_order_ref})
+                response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
             if response.get('error', False):
                 common_log_line_ept.amazon_create_order_log_line(response.get('error'), model_id, False,
                                                                  amazon_order_ref, False, 'FBM', log_book)
@@ -1435,6 +1471,27 @@ class SaleOrder(models.Model):
             self._cr.commit()
         return True
 
+    def amz_check_fbm_order_vals_ept(self, seller, order, marketplace_instance_dict):
+        """
+        This method will check the amazon vals required to create the FBM order, before its order items are
+        requested.
+        :param seller: amazon.seller.ept()
+        :param order: dict of the order
+        :param marketplace_instance_dict: dict {marketplace: amazon.instance.ept()}
+        :return: message of the skipped order or False, amazon.instance.ept()
+        """
+        message, instance = self.check_amazon_order_vals_ept(seller, order, marketplace_instance_dict)
+        if message:
+            return message, instance
+        if not order.get('PurchaseDate', ''):
+            return 'Skipped due to Purchase Date Not found.', instance
+        if not order.get('BuyerInfo', {}).get('BuyerEmail', ''):
+            return "Skipped due to Buyer's Details Not found.", instance
+        fulfillment_channel = order.get('FulfillmentChannel', '')
+        if fulfillment_channel and fulfillment_channel == 'AFN' and not hasattr(instance, 'fba_warehouse_id'):
+            return 'Skipped because of Fulfillment Channel is AFN', instance
+        return False, instance
+
     @staticmethod
     def process_existing_order_cancel_request(list_of_shipped_order_lines, existing_order, line):
         """
@@ -1466,7 +1523,7 @@ class SaleOrder(models.Model):
         """
         kwargs = self.prepare_amazon_request_report_kwargs(seller, 'order_by_next_token_sp_api')
         kwargs.update({'next_token': next_token, 'restricted_resources': ['buyerInfo', 'shippingAddress']})
-        response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
         if response.get('error', False):
             if self._context.get('is_auto_process', False):
                 log_rec = self.search_or_create_amz_log_ept('shipped.order.data.queue.ept')
@@ -1614,7 +1671,7 @@ class SaleOrder(models.Model):
         kwargs = self.prepare_amazon_request_report_kwargs(seller, 'import_amazon_orders_sp_api')
         kwargs.update({'marketplaceids': marketplaceids, 'updated_after_date': updated_after_date,
                        'fulfillment_channels': 'MFN', 'orderstatus': orderstatus})
-        response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
         if response.get('error', False):
             if self._context.get('is_auto_process', False):
                 log_rec = self.search_or_create_amz_log_ept('shipped.order.data.queue.ept')
@@ -1939,7 +1996,7 @@ class SaleOrder(models.Model):
             kwargs = self.prepare_amazon_request_report_kwargs(seller, 'amazon_submit_feeds_sp_api')
             kwargs.update({'data': data, 'marketplaceids': marketplaceids,
                            'feed_type': 'POST_ORDER_FULFILLMENT_DATA'})
-            response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+            response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
             if response.get('error', False):
                 raise UserError(_(response.get('error', {})))
             results = response.get('results', {})
@@ -2492,7 +2549,7 @@ class SaleOrder(models.Model):
                 data = order.get_data()
                 kwargs = self.prepare_amz_outbound_order_kwargs()
                 kwargs.update({'emipro_api': 'auto_create_outbound_order_sp_api', 'data': data})
-                response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+                response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
                 self.process_create_outbound_order_response(response, is_auto_process)
 
         return True
@@ -6,12 +6,13 @@ Added class to process amazon settlement report.
 """
 
 import base64
+import codecs
 import csv
 import time
 import logging
 from collections import defaultdict
 from datetime import datetime, timedelta
-from io import StringIO
+from itertools import chain, islice
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 
@@ -25,6 +26,8 @@ SALE_ORDER = 'sale.order'
 ENDING_BALANCE_DESC = 'Ending Balance Description'
 DATE_YMDHMS = "%Y-%m-%d %H:%M:%S"
 DATE_YMD = '%Y-%m-%d'
+SETTLEMENT_FILE_CHUNK_SIZE = 1 << 20
+SETTLEMENT_ORDER_BATCH_SIZE = 500
 
 _logger = logging.getLogger(__name__)
 
@@ -214,60 +217,57 @@ class SettlementReportEpt(models.Model):
         refund_names = refund_lines.mapped('payment_ref')
         refund_name_list = self.prepare_settlement_refund_name_list(refund_names)
         if order_names and refund_names:
-            imp_file = StringIO(base64.b64decode(self.attachment_id.datas).decode())
-            content = imp_file.read()
-            delimiter = ('\t', csv.Sniffer().sniff(content.splitlines()[0]).delimiter)[bool(content)]
-            settlement_reader = csv.DictReader(content.splitlines(), delimiter=delimiter)
+            settlement_reader = self.get_settlement_report_reader_ept()
             order_dict = {}
             product_dict = {}
             create_or_update_refund_dict = {}
-            for row in settlement_reader:
-                if row.get('amount-description').__contains__('MarketplaceFacilitator') or row.get(
-                        'amount-type') == 'ItemFees':
-                    continue
-                order_ref = row.get('order-id', '')
-                adjustment_id = row.get('adjustment-id', '')
-                if order_ref not in order_name_list and order_ref not in refund_name_list:
-                    continue
-                shipment_id = row.get('shipment-id', '')
-                order_item_code = row.get('order-item-code', '').lstrip('0')
-                posted_date = row.get('posted-date', '')
-                fulfillment_by = row.get('fulfillment-id', '')
-                transaction_type = row.get('transaction-type', '')
-                posted_date = self.get_amz_settlement_posted_date(posted_date)
-                order_ids = order_dict.get((order_ref, shipment_id, order_item_code))
-                if not order_ids:
-                    amz_order = self.get_settlement_report_amazon_order_ept(row)
-                    order_ids = tuple(amz_order.ids)
-                    order_dict.update({(order_ref, shipment_id, order_item_code): order_ids})
-                else:
+            for rows in iter(lambda: list(islice(settlement_reader, SETTLEMENT_ORDER_BATCH_SIZE)), []):
+                self.get_settlement_report_amazon_orders_ept(
+                    [row for row in rows if row.get('order-id', '') in order_name_list or
+                     row.get('order-id', '') in refund_name_list], order_dict)
+                for row in rows:
+                    if row.get('amount-description').__contains__('MarketplaceFacilitator') or row.get(
+                            'amount-type') == 'ItemFees':
+                        continue
+                    order_ref = row.get('order-id', '')
+                    adjustment_id = row.get('adjustment-id', '')
+                    if order_ref not in order_name_list and order_ref not in refund_name_list:
+                        continue
+                    shipment_id = row.get('shipment-id', '')
+                    order_item_code = row.get('order-item-code', '').lstrip('0')
+                    posted_date = row.get('posted-date', '')
+                    fulfillment_by = row.get('fulfillment-id', '')
+                    transaction_type = row.get('transaction-type', '')
+                    posted_date = self.get_amz_settlement_posted_date(posted_date)
+                    order_ids = order_dict.get((order_ref, shipment_id, order_item_code), ())
                     amz_order = sale_order_obj.browse(order_ids)
-                if not amz_order:
-                    continue
-                partner = partner_obj.with_context(is_amazon_partner=True)._find_accounting_partner( \
-                    amz_order.mapped('partner_id'))
-                if order_ref in order_name_list and amz_order and transaction_type == 'Order':
-                    order_line_name = self.statement_id.settlement_ref + '/' + shipment_id + '/' + order_ref
-                    order_statement_lines.filtered(
-                        lambda l, order_line_name=order_line_name: l.payment_ref == order_line_name and not
-                        l.sale_order_id).write(\
-                        {'sale_order_id': amz_order.ids[0], 'partner_id': partner.id if partner else False})
-                elif order_ref in refund_name_list and amz_order and transaction_type == 'Refund':
-                    product_id = product_dict.get(row.get('sku', ''))
-                    if not product_id:
-                        amazon_product = amazon_product_obj.search([('seller_sku', '=', row.get('sku', '')),
-                                                                    ('instance_id', '=', self.instance_id.id)], limit=1)
-                        product_id = amazon_product.product_id.id
-                        product_dict.update({row.get('sku', ''): amazon_product.product_id.id})
-
-                    key = (order_ref, order_ids, posted_date, fulfillment_by, partner.id, adjustment_id)
-                    create_or_update_refund_dict = self.get_settlement_refund_dict_ept(row, key, product_id,
-                                                                                       create_or_update_refund_dict)
-                    adjustment_id = (adjustment_id + '/') if adjustment_id else ''
-                    ref_name = 'Refund_' + adjustment_id + order_ref
-                    refund_lines.filtered(
-                        lambda l, ref_name=ref_name: l.payment_ref == ref_name and not l.sale_order_id).write( \
-                        {'sale_order_id': amz_order.ids[0], 'partner_id': partner.id if partner else False})
+                    if not amz_order:
+                        continue
+                    partner = partner_obj.with_context(is_amazon_partner=True)._find_accounting_partner( \
+                        amz_order.mapped('partner_id'))
+                    if order_ref in order_name_list and amz_order and transaction_type == 'Order':
+                        order_line_name = self.statement_id.settlement_ref + '/' + shipment_id + '/' + order_ref
+                        order_statement_lines.filtered(
+                            lambda l, order_line_name=order_line_name: l.payment_ref == order_line_name and not
+                            l.sale_order_id).write(\
+                            {'sale_order_id': amz_order.ids[0], 'partner_id': partner.id if partner else False})
+                    elif order_ref in refund_name_list and amz_order and transaction_type == 'Refund':
+                        product_id = product_dict.get(row.get('sku', ''))
+                        if not product_id:
+                            amazon_product = amazon_product_obj.search(
+                                [('seller_sku', '=', row.get('sku', '')), ('instance_id', '=', self.instance_id.id)],
+                                limit=1)
+                            product_id = amazon_product.product_id.id
+                            product_dict.update({row.get('sku', ''): amazon_product.product_id.id})
+
+                        key = (order_ref, order_ids, posted_date, fulfillment_by, partner.id, adjustment_id)
+                        create_or_update_refund_dict = self.get_settlement_refund_dict_ept(
+                            row, key, product_id, create_or_update_refund_dict)
+                        adjustment_id = (adjustment_id + '/') if adjustment_id else ''
+                        ref_name = 'Refund_' + adjustment_id + order_ref
+                        refund_lines.filtered(
+                            lambda l, ref_name=ref_name: l.payment_ref == ref_name and not l.sale_order_id).write( \
+                            {'sale_order_id': amz_order.ids[0], 'partner_id': partner.id if partner else False})
 
             if create_or_update_refund_dict:
                 self.create_refund_invoices(create_or_update_refund_dict, self.statement_id)
@@ -767,10 +767,7 @@ class SettlementReportEpt(models.Model):
             ir_cron_obj.with_context(**{'raise_warning': True}).find_running_schedulers( \
                 'ir_cron_auto_process_settlement_report_seller_', self.seller_id.id)
         self.check_instance_configuration_and_attachment_file()
-        imp_file = StringIO(base64.b64decode(self.attachment_id.datas).decode())
-        content = imp_file.read()
-        delimiter = ('\t', csv.Sniffer().sniff(content.splitlines()[0]).delimiter)[bool(content)]
-        settlement_reader = csv.DictReader(content.splitlines(), delimiter=delimiter)
+        settlement_reader = self.get_settlement_report_reader_ept()
         journal = self.instance_id.settlement_report_journal_id
         seller = self.seller_id
         bank_statement = False
@@ -779,74 +776,79 @@ class SettlementReportEpt(models.Model):
         order_list_item_fees = {}
         refund_list_item_price = {}
         create_or_update_refund_dict = {}
+        sale_order_obj = self.env[SALE_ORDER]
         amazon_product_obj = self.env['amazon.product.ept']
         partner_obj = self.env['res.partner']
         amazon_other_transaction_list = {}
         product_dict = {}
         order_dict = {}
 
-        for row in settlement_reader:
-            settlement_id = row.get('settlement-id', False)
-            if not bank_statement:
-                bank_statement = self.create_settlement_report_bank_statement(row, journal, settlement_id)
+        for rows in iter(lambda: list(islice(settlement_reader, SETTLEMENT_ORDER_BATCH_SIZE)), []):
+            self.get_settlement_report_amazon_orders_ept(rows, order_dict)
+            for row in rows:
+                settlement_id = row.get('settlement-id', False)
                 if not bank_statement:
-                    break
-            if not row.get('transaction-type', ''):
-                continue
-            order_ref = row.get('order-id', '')
-            shipment_id = row.get('shipment-id', '')
-            order_item_code = row.get('order-item-code', '').lstrip('0')
-            posted_date = row.get('posted-date', '')
-            fulfillment_by = row.get('fulfillment-id', '')
-            adjustment_id = row.get('adjustment-id', '')
-            posted_date = self.get_amz_settlement_posted_date(posted_date)
-            amount = float(row.get('amount', 0.0).replace(',', '.'))
-            if row.get('transaction-type', '') in ['Order', 'Refund']:
-                if row.get('amount-description', '').__contains__('MarketplaceFacilitator') or \
-                        row.get('amount-description', '').__contains__('LowValueGoods') or \
-                        row.get('amount-type', '') == 'ItemFees':
-                    order_list_item_fees = self.prepare_order_list_item_fees_ept( \
-                        row, settlement_id, amount, posted_date, order_list_item_fees)
+                    bank_statement = self.create_settlement_report_bank_statement(row, journal, settlement_id)
+                    if not bank_statement:
+                        break
+                if not row.get('transaction-type', ''):
                     continue
-                amz_order = self.get_settlement_report_amazon_order_ept(row)
-                order_ids = order_dict.get((order_ref, shipment_id, order_item_code))
-                if not order_ids:
-                    order_ids = tuple(amz_order.ids)
-                    order_dict.update({(order_ref, shipment_id, order_item_code): order_ids})
-
-                partner = partner_obj.with_context(is_amazon_partner=True)._find_accounting_partner(
-                    amz_order.mapped('partner_id'))
-
-                if row.get('transaction-type', '') == 'Order':
-                    key = (order_ref, order_ids, posted_date, fulfillment_by, partner.id, shipment_id)
-                    order_list_item_price = self.get_amazon_order_list_item_price(key, amount, order_list_item_price)
-
-                elif row.get('transaction-type', '') == 'Refund':
-                    product_id = product_dict.get(row.get('sku', ''))
-                    if not product_id:
-                        amazon_product = amazon_product_obj.search([('seller_sku', '=', row.get('sku', '')),
-                                                                    ('instance_id', '=', self.instance_id.id)], limit=1)
-                        product_id = amazon_product.product_id.id
-                        product_dict.update({row.get('sku', ''): amazon_product.product_id.id})
-                    key = (order_ref, order_ids, posted_date, fulfillment_by, partner.id, adjustment_id)
-                    if not refund_list_item_price.get(key, 0.0):
-                        refund_list_item_price.update({key: amount})
-                    else:
-                        existing_amount = refund_list_item_price.get(key, 0.0)
-                        refund_list_item_price.update({key: existing_amount + amount})
+                order_ref = row.get('order-id', '')
+                shipment_id = row.get('shipment-id', '')
+                order_item_code = row.get('order-item-code', '').lstrip('0')
+                posted_date = row.get('posted-date', '')
+                fulfillment_by = row.get('fulfillment-id', '')
+                adjustment_id = row.get('adjustment-id', '')
+                posted_date = self.get_amz_settlement_posted_date(posted_date)
+                amount = float(row.get('amount', 0.0).replace(',', '.'))
+                if row.get('transaction-type', '') in ['Order', 'Refund']:
+                    if row.get('amount-description', '').__contains__('MarketplaceFacilitator') or \
+                            row.get('amount-description', '').__contains__('LowValueGoods') or \
+                            row.get('amount-type', '') == 'ItemFees':
+                        order_list_item_fees = self.prepare_order_list_item_fees_ept( \
+                            row, settlement_id, amount, posted_date, order_list_item_fees)
+                        continue
+                    order_ids = order_dict.get((order_ref, shipment_id, order_item_code), ())
+                    amz_order = sale_order_obj.browse(order_ids)
 
-                    create_or_update_refund_dict = self.get_settlement_refund_dict_ept(row, key,
-                                                                                       product_id,
-                                                                                       create_or_update_refund_dict)
-            else:
-                if row.get('amount-type') in ['other-transaction', 'FBA Inventory Reimbursement']:
-                    key = (row.get('amount-type', ''), posted_date, row.get('amount-description', ''), settlement_id)
-                elif row.get('transaction-type') in ['Order_Retrocharge']:
-                    key = (row.get('transaction-type'), posted_date, order_ref, settlement_id)
+                    partner = partner_obj.with_context(is_amazon_partner=True)._find_accounting_partner(
+                        amz_order.mapped('partner_id'))
+
+                    if row.get('transaction-type', '') == 'Order':
+                        key = (order_ref, order_ids, posted_date, fulfillment_by, partner.id, shipment_id)
+                        order_list_item_price = self.get_amazon_order_list_item_price(key, amount,
+                                                                                      order_list_item_price)
+
+                    elif row.get('transaction-type', '') == 'Refund':
+                        product_id = product_dict.get(row.get('sku', ''))
+                        if not product_id:
+                            amazon_product = amazon_product_obj.search(
+                                [('seller_sku', '=', row.get('sku', '')), ('instance_id', '=', self.instance_id.id)],
+                                limit=1)
+                            product_id = amazon_product.product_id.id
+                            product_dict.update({row.get('sku', ''): amazon_product.product_id.id})
+                        key = (order_ref, order_ids, posted_date, fulfillment_by, partner.id, adjustment_id)
+                        if not refund_list_item_price.get(key, 0.0):
+                            refund_list_item_price.update({key: amount})
+                        else:
+                            existing_amount = refund_list_item_price.get(key, 0.0)
+                            refund_list_item_price.update({key: existing_amount + amount})
+
+                        create_or_update_refund_dict = self.get_settlement_refund_dict_ept(row, key,
+                                                                                           product_id,
+                                                                                           create_or_update_refund_dict)
                 else:
-                    key = (row.get('amount-type', ''), posted_date, '', settlement_id)
-                existing_amount = amazon_other_transaction_list.get(key, 0.0)
-                amazon_other_transaction_list.update({key: existing_amount + amount})
+                    if row.get('amount-type') in ['other-transaction', 'FBA Inventory Reimbursement']:
+                        key = (row.get('amount-type', ''), posted_date, row.get('amount-description', ''),
+                               settlement_id)
+                    elif row.get('transaction-type') in ['Order_Retrocharge']:
+                        key = (row.get('transaction-type'), posted_date, order_ref, settlement_id)
+                    else:
+                        key = (row.get('amount-type', ''), posted_date, '', settlement_id)
+                    existing_amount = amazon_other_transaction_list.get(key, 0.0)
+                    amazon_other_transaction_list.update({key: existing_amount + amount})
+            if not bank_statement:
+                break
 
         if bank_statement:
             self.make_amazon_fee_entry(bank_statement, order_list_item_fees)
@@ -866,6 +868,140 @@ class SettlementReportEpt(models.Model):
             self.write({'statement_id': bank_statement.id, 'state': 'imported'})
         return True
 
+    def get_settlement_report_reader_ept(self):
+        """
+        This method will prepare a csv reader on the settlement report attachment. The rows are read lazily
+        from the attachment, so the memory used does not depend on the size of the report.
+        :return: csv.DictReader
+        """
+        lines = self.iter_settlement_report_lines_ept()
+        first_line = next(lines, '')
+        delimiter = csv.Sniffer().sniff(first_line.rstrip('\r\n')).delimiter if first_line else '\t'
+        return csv.DictReader(chain([first_line], lines), delimiter=delimiter)
+
+    def iter_settlement_report_lines_ept(self):
+        """
+        This method will yield the lines of the settlement report attachment. The file is read from the
+        filestore, or base64 decoded from the database, in chunks of SETTLEMENT_FILE_CHUNK_SIZE bytes.
+        :return: generator of str
+        """
+        attachment = self.attachment_id.sudo()
+        if attachment.store_fname:
+            chunks = self.read_settlement_file_chunks_ept(attachment._full_path(attachment.store_fname))
+        else:
+            datas = attachment.datas or b''
+            chunks = (base64.b64decode(datas[index:index + SETTLEMENT_FILE_CHUNK_SIZE])
+                      for index in range(0, len(datas), SETTLEMENT_FILE_CHUNK_SIZE))
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        pending = ''
+        for chunk in chunks:
+            lines = (pending + decoder.decode(chunk)).splitlines(True)
+            pending = lines.pop() if lines and not lines[-1].endswith(('\n', '\r')) else ''
+            yield from lines
+        pending += decoder.decode(b'', final=True)
+        if pending:
+            yield pending
+
+    @staticmethod
+    def read_settlement_file_chunks_ept(path):
+        """
+        This method will yield the content of a file in chunks of SETTLEMENT_FILE_CHUNK_SIZE bytes.
+        :param path: path of the file
+        :return: generator of bytes
+        """
+        with open(path, 'rb') as settlement_file:
+            yield from iter(lambda: settlement_file.read(SETTLEMENT_FILE_CHUNK_SIZE), b'')
+
+    def get_settlement_report_amazon_orders_ept(self, rows, order_dict):
+        """
+        This method will get the amazon orders of the order and refund rows of a batch of the settlement
+        report with one search per fulfillment, in place of get_settlement_report_amazon_order_ept per row.
+        :param rows: list of settlement report rows
+        :param order_dict: {(order ref, shipment id, order item code): tuple of sale order ids}, updated with
+        the keys of the rows which are not in it yet
+        :return: order_dict
+        """
+        mfn_keys = set()
+        afn_keys = {}
+        for row in rows:
+            if row.get('transaction-type', '') not in ['Order', 'Refund']:
+                continue
+            key = (row.get('order-id', ''), row.get('shipment-id', ''), row.get('order-item-code', '').lstrip('0'))
+            if key in order_dict:
+                continue
+            order_dict[key] = ()
+            if row.get('fulfillment-id', '') == 'MFN':
+                mfn_keys.add(key)
+            else:
+                afn_keys.setdefault(key, row.get('sku', ''))
+        if mfn_keys:
+            self.get_settlement_report_fbm_orders_ept(mfn_keys, order_dict)
+        if afn_keys:
+            self.get_settlement_report_fba_orders_ept(afn_keys, order_dict)
+        return order_dict
+
+    def get_settlement_report_fbm_orders_ept(self, keys, order_dict):
+        """
+        This method will search the FBM orders of the settlement report keys.
+        :param keys: set of (order ref, shipment id, order item code)
+        :param order_dict: {(order ref, shipment id, order item code): tuple of sale order ids}
+        :return: order_dict
+        """
+        orders = self.env[SALE_ORDER].search([('amz_order_reference', 'in', list({key[0] for key in keys})),
+                                              ('amz_instance_id', '=', self.instance_id.id),
+                                              ('amz_fulfillment_by', '=', 'FBM'),
+                                              ('state', '!=', 'cancel')])
+        order_ids = defaultdict(list)
+        for order in orders:
+            order_ids[order.amz_order_reference].append(order.id)
+        for key in keys:
+            order_dict[key] = tuple(order_ids.get(key[0], []))
+        return order_dict
+
+    def get_settlement_report_fba_orders_ept(self, keys, order_dict):
+        """
+        This method will search the FBA orders of the settlement report keys through their done stock moves,
+        matched on the order item, or on the product of the sku when the order item is not found.
+        :param keys: {(order ref, shipment id, order item code): sku}
+        :param order_dict: {(order ref, shipment id, order item code): tuple of sale order ids}
+        :return: order_dict
+        """
+        stock_move_obj = self.env['stock.move']
+        domain = [('amazon_instance_id', '=', self.instance_id.id),
+                  ('amazon_order_reference', 'in', list({key[0] for key in keys})),
+                  ('state', '=', 'done')]
+        moves_by_item = defaultdict(list)
+        for move in stock_move_obj.search(domain + [('amazon_order_item_id', 'in', list({key[2] for key in keys}))]):
+            moves_by_item[(move.amazon_order_reference, move.amazon_order_item_id)].append(move)
+        unmatched_keys = {}
+        for key, sku in keys.items():
+            order_ref, shipment_id, order_item_code = key
+            moves = [move for move in moves_by_item.get((order_ref, order_item_code), [])
+                     if not shipment_id or move.amazon_shipment_id == shipment_id]
+            if moves:
+                order_dict[key] = tuple(stock_move_obj.browse([move.id for move in moves]).mapped(
+                    'sale_line_id').mapped('order_id').ids)
+            else:
+                unmatched_keys[key] = sku
+
+        skus = list({sku for sku in unmatched_keys.values() if sku})
+        if not skus:
+            return order_dict
+        product_by_sku = {}
+        for amazon_product in self.env['amazon.product.ept'].search([('seller_sku', 'in', skus),
+                                                                     ('instance_id', '=', self.instance_id.id)]):
+            product_by_sku.setdefault(amazon_product.seller_sku, amazon_product.product_id.id)
+        moves_by_product = defaultdict(list)
+        for move in stock_move_obj.search(domain + [('product_id', 'in', list(set(product_by_sku.values())))]):
+            moves_by_product[(move.amazon_order_reference, move.product_id.id)].append(move)
+        for key, sku in unmatched_keys.items():
+            order_ref, shipment_id, order_item_code = key
+            move = next((move for move in moves_by_product.get((order_ref, product_by_sku.get(sku)), [])
+                         if not shipment_id or move.amazon_shipment_id == shipment_id), False)
+            if move:
+                order_dict[key] = tuple(move.sale_line_id.order_id.ids)
+        return order_dict
+
     def get_settlement_report_amazon_order_ept(self, row):
         """
         Added by twinkalc on 28 sep, 2020,
@@ -5,16 +5,18 @@ import time
 from datetime import datetime, timedelta
 import base64
 import csv
+import logging
 from io import StringIO
 import pytz
 from dateutil import parser
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
-from odoo.addons.iap.tools import iap_tools
 from ..endpoint import DEFAULT_ENDPOINT, DECODE_ENDPOINT
+from ..transport import amazon_jsonrpc
 from ..reportTypes import ReportType
 
 utc = pytz.utc
+_logger = logging.getLogger(__name__)
 DATE_YMDHMS = "%Y-%m-%d %H:%M:%S"
 DATE_YMDTHMS = "%Y-%m-%dT%H:%M:%S"
 STOCK_MOVE = 'stock.move'
@@ -28,6 +30,7 @@ COMMON_LOG_LINES_EPT = 'common.log.lines.ept'
 RES_PARTNER = 'res.partner'
 IR_MODEL = 'ir.model'
 VIEW_MODE = 'tree,form'
+SHIPMENT_REPORT_CHUNK_SIZE = 500
 
 
 class ShippingReportRequestHistory(models.Model):
@@ -121,6 +124,10 @@ class ShippingReportRequestHistory(models.Model):
     is_fulfillment_center = fields.Boolean(default=False,
                                            help="if missing fulfillment center get then set as True")
     mismatch_details = fields.Boolean(compute="_compute_total_logs", help="true if mismatch details found")
+    last_processed_order_ref = fields.Char(string="Processed Up To Order", copy=False, readonly=True,
+                                           help="Orders of the report are processed in chunks sorted by order "
+                                                "reference, orders up to this reference are already processed and "
+                                                "are skipped when the report processing is resumed.")
 
     def unlink(self):
         """
@@ -267,7 +274,7 @@ class ShippingReportRequestHistory(models.Model):
         if not self.attachment_id:
             raise UserError(_("There is no any report are attached with this record."))
 
-    def check_amz_instance_and_shipment(self, row, instance, order_dict, log_rec):
+    def check_amz_instance_and_shipment(self, row, instance, order_dict, log_rec, shipment_moves=None):
         stock_move_obj = self.env[STOCK_MOVE]
         common_log_line_obj = self.env[COMMON_LOG_LINES_EPT]
         model_id = self.env[IR_MODEL]._get(AMZ_SHIPPING_REPORT_REQUEST_HISTORY).id
@@ -290,12 +297,15 @@ class ShippingReportRequestHistory(models.Model):
                         row.get('shipment-item-id', False))
         if order_dict.get(where_clause):
             return True, order_dict
-        move_found = stock_move_obj.search(
-            [('amazon_shipment_id', '=', row.get('shipment-id', False)),
-             ('amazon_instance_id', '=', instance.id),
-             ('amazon_order_reference', '=', row.get('amazon-order-id', False)),
-             ('amazon_order_item_id', '=', row.get('amazon-order-item-id', False).lstrip('0')),
-             ('amazon_shipment_item_id', '=', row.get('shipment-item-id', False))])
+        if shipment_moves is not None:
+            move_found = shipment_moves.get(where_clause, stock_move_obj)
+        else:
+            move_found = stock_move_obj.search(
+                [('amazon_shipment_id', '=', row.get('shipment-id', False)),
+                 ('amazon_instance_id', '=', instance.id),
+                 ('amazon_order_reference', '=', row.get('amazon-order-id', False)),
+                 ('amazon_order_item_id', '=', row.get('amazon-order-item-id', False).lstrip('0')),
+                 ('amazon_shipment_item_id', '=', row.get('shipment-item-id', False))])
         if move_found:
             process_invoice = True
             for move in move_found.filtered(lambda x: x.state not in ('done', 'cancel')):
@@ -318,7 +328,8 @@ class ShippingReportRequestHistory(models.Model):
             return True, order_dict
         return False, order_dict
 
-    def get_amazon_fulfillment_center_warehouse(self, instance, row, fulfillment_warehouse, skip_orders, log_rec):
+    def get_amazon_fulfillment_center_warehouse(self, instance, row, fulfillment_warehouse, skip_orders, log_rec,
+                                                fulfillment_centers=None):
         fulfillment_id = row.get('fulfillment-center-id', False)
         model_id = self.env[IR_MODEL]._get(AMZ_SHIPPING_REPORT_REQUEST_HISTORY).id
         common_log_line_obj = self.env[COMMON_LOG_LINES_EPT]
@@ -327,9 +338,10 @@ class ShippingReportRequestHistory(models.Model):
             # find fulfillment center warehouse for import order
             is_fulfillment_center = self.seller_id.is_fulfilment_center_configured
             fulfillment_center, fn_warehouse = self.with_context(
-                is_fulfillment_center=is_fulfillment_center).get_warehouse(fulfillment_id, instance)
+                is_fulfillment_center=is_fulfillment_center).get_warehouse(fulfillment_id, instance,
+                                                                           fulfillment_centers)
             if not fn_warehouse:
-                skip_orders.append(row.get('amazon-order-id', False))
+                skip_orders.add(row.get('amazon-order-id', False))
                 message = 'Skipped Amazon order %s because Amazon Fulfillment Center not found in Odoo' % (
                     row.get('amazon-order-id', False))
                 common_log_line_obj.amazon_create_order_log_line(
@@ -357,18 +369,98 @@ class ShippingReportRequestHistory(models.Model):
             else:
                 self.complete_outbound_orders(outbound_orders_dict, log_rec)
         if order_details_dict_list:
-            if self.seller_id.is_european_region:
-                self.request_and_process_b2b_order_response_ept(order_details_dict_list, sale_order_list, log_rec)
-            else:
-                self.process_fba_shipment_orders(order_details_dict_list, {}, log_rec, sale_order_list)
+            self.process_amazon_shipment_order_chunks_ept(order_details_dict_list, sale_order_list, log_rec)
         is_partially_processed_report = stock_move_obj.search_count([
             ('amz_shipment_report_id', '=', self.id), ('state', 'not in', ('done', 'cancel'))])
         report_state = 'partially_processed' if is_partially_processed_report else 'processed'
-        self.write({'state': report_state})
+        self.write({'state': report_state, 'last_processed_order_ref': False})
         if log_rec and not log_rec.log_lines:
             log_rec.unlink()
         return True
 
+    def process_amazon_shipment_order_chunks_ept(self, order_details_dict_list, sale_order_list, log_rec):
+        """
+        Process the FBA orders of the report in chunks of SHIPMENT_REPORT_CHUNK_SIZE orders sorted by order
+        reference. The last order reference of a chunk is saved on the report and committed with the orders of the
+        chunk, so a run killed by the cron time limit resumes after the last committed chunk.
+        :param order_details_dict_list: dict {order ref: list of order lines}
+        :param sale_order_list: order references to process
+        :param log_rec: common log obj
+        :return: True
+        """
+        order_refs = sorted(order_ref for order_ref in set(sale_order_list)
+                            if not self.last_processed_order_ref or order_ref > self.last_processed_order_ref)
+        if self.last_processed_order_ref:
+            _logger.info("Resuming shipment report %s after order %s, %s orders left.", self.name,
+                         self.last_processed_order_ref, len(order_refs))
+        for index in range(0, len(order_refs), SHIPMENT_REPORT_CHUNK_SIZE):
+            chunk_order_refs = order_refs[index:index + SHIPMENT_REPORT_CHUNK_SIZE]
+            if self.seller_id.is_european_region:
+                self.request_and_process_b2b_order_response_ept(order_details_dict_list, chunk_order_refs, log_rec)
+            else:
+                self.process_fba_shipment_orders(order_details_dict_list, {}, log_rec, chunk_order_refs)
+            self.write({'last_processed_order_ref': chunk_order_refs[-1]})
+            self._cr.commit()
+        return True
+
+    def prepare_shipment_report_instances_ept(self, rows, instances):
+        """
+        Find the instances of all the rows of the shipment report, with one search of the outbound orders
+        of the Non-Amazon rows.
+        :param rows: list of report rows
+        :param instances: dict of instances, updated with the sales channels and outbound orders of the rows
+        :return: dict of instances
+        """
+        sale_order_obj = self.env[SALE_ORDER]
+        marketplace_obj = self.env['amazon.marketplace.ept']
+        merchant_order_refs = {row.get('merchant-order-id', '') for row in rows
+                               if row.get('sales-channel', '') == "Non-Amazon"}
+        if merchant_order_refs:
+            outbound_orders = {order_ref: sale_order_obj for order_ref in merchant_order_refs}
+            for order in sale_order_obj.search([("amz_order_reference", "in", list(merchant_order_refs)),
+                                                ("amz_is_outbound_order", "=", True)]):
+                outbound_orders[order.amz_order_reference] |= order
+            instances.update({("Non-Amazon", order_ref): orders.amz_fulfillment_instance_id
+                              for order_ref, orders in outbound_orders.items()})
+        for sales_channel in {row.get('sales-channel', '') for row in rows} - {"Non-Amazon"}:
+            if sales_channel not in instances:
+                instances.update({sales_channel: marketplace_obj.find_instance(self.seller_id, sales_channel)})
+        return instances
+
+    def get_shipment_report_stock_moves_ept(self, rows, instances):
+        """
+        Find the stock moves already imported for the rows of the shipment report, with one search.
+        :param rows: list of report rows
+        :param instances: dict of instances, see prepare_shipment_report_instances_ept
+        :return: dict {(shipment id, instance id, order ref, order item id, shipment item id): stock.move()}
+        """
+        stock_move_obj = self.env[STOCK_MOVE]
+        order_refs = {row.get('amazon-order-id', False) for row in rows} - {False, ''}
+        instance_ids = {instance_id for instance in instances.values() if instance for instance_id in instance.ids}
+        if not order_refs or not instance_ids:
+            return {}
+        move_ids = {}
+        for move in stock_move_obj.search([('amazon_order_reference', 'in', list(order_refs)),
+                                           ('amazon_instance_id', 'in', list(instance_ids))]):
+            key = (move.amazon_shipment_id, move.amazon_instance_id.id, move.amazon_order_reference,
+                   move.amazon_order_item_id, move.amazon_shipment_item_id)
+            move_ids.setdefault(key, []).append(move.id)
+        return {key: stock_move_obj.browse(ids) for key, ids in move_ids.items()}
+
+    def get_shipment_report_fulfillment_centers_ept(self, rows):
+        """
+        Find the fulfillment centers of the rows of the shipment report, with one search.
+        :param rows: list of report rows
+        :return: dict {center code: amazon.fulfillment.center()}
+        """
+        fulfillment_centers = {}
+        center_codes = {row.get('fulfillment-center-id', False) for row in rows} - {False, ''}
+        if center_codes:
+            for fulfillment_center in self.env['amazon.fulfillment.center'].search(
+                    [('center_code', 'in', list(center_codes)), ('seller_id', '=', self.seller_id.id)]):
+                fulfillment_centers.setdefault(fulfillment_center.center_code, fulfillment_center)
+        return fulfillment_centers
+
     def process_shipment_file(self):
         """
         Process Amazon Shipment File from attachment,
@@ -384,7 +476,7 @@ class ShippingReportRequestHistory(models.Model):
         order_details_dict_list = {}
         outbound_orders_dict = {}
         fulfillment_warehouse = {}
-        skip_orders = []
+        skip_orders = set()
         b2b_order_list = []
 
         log_rec = self.amz_search_or_create_logs_ept('')
@@ -392,26 +484,36 @@ class ShippingReportRequestHistory(models.Model):
             imp_file = StringIO(base64.decodebytes(self.attachment_id.datas).decode())
         else:
             imp_file = self.decode_amazon_encrypted_attachments_data(self.attachment_id, log_rec)
-        reader = csv.DictReader(imp_file, delimiter='\t')
-
-        for row in reader:
-            instance = self.get_instance_shipment_report_ept(row, instances)
-            is_exist, order_dict = self.check_amz_instance_and_shipment(row, instance, order_dict, log_rec)
-            if is_exist:
-                continue
-            row.update({'instance_id': instance.id})
-            if row.get('amazon-order-id', False) not in skip_orders:
-                is_skip, fc_values = self.get_amazon_fulfillment_center_warehouse(instance, row, fulfillment_warehouse,
-                                                                                  skip_orders, log_rec)
-                if is_skip:
+        rows = list(csv.DictReader(imp_file, delimiter='\t'))
+
+        # Resolve the instances, already imported moves and fulfillment centers of all the rows at once.
+        self.prepare_shipment_report_instances_ept(rows, instances)
+        shipment_moves = self.get_shipment_report_stock_moves_ept(rows, instances)
+        fulfillment_centers = self.get_shipment_report_fulfillment_centers_ept(rows)
+        b2b_orders = set()
+        with self.env['common.log.lines.ept'].buffer_log_lines_ept():
+            for row in rows:
+                instance = self.get_instance_shipment_report_ept(row, instances)
+                is_exist, order_dict = self.check_amz_instance_and_shipment(row, instance, order_dict, log_rec,
+                                                                            shipment_moves)
+                if is_exist:
                     continue
-                row.update(fc_values)
-            if row.get('merchant-order-id', False):
-                outbound_orders_dict = self.prepare_amazon_sale_order_line_values(row, outbound_orders_dict)
-            else:
-                order_details_dict_list = self.prepare_amazon_sale_order_line_values(row, order_details_dict_list)
-                if row.get('amazon-order-id', False) and row.get('amazon-order-id', False) not in b2b_order_list:
-                    b2b_order_list.append(row.get('amazon-order-id', False))
+                row.update({'instance_id': instance.id})
+                if row.get('amazon-order-id', False) not in skip_orders:
+                    is_skip, fc_values = self.get_amazon_fulfillment_center_warehouse(instance, row,
+                                                                                      fulfillment_warehouse,
+                                                                                      skip_orders, log_rec,
+                                                                                      fulfillment_centers)
+                    if is_skip:
+                        continue
+                    row.update(fc_values)
+                if row.get('merchant-order-id', False):
+                    outbound_orders_dict = self.prepare_amazon_sale_order_line_values(row, outbound_orders_dict)
+                else:
+                    order_details_dict_list = self.prepare_amazon_sale_order_line_values(row, order_details_dict_list)
+                    if row.get('amazon-order-id', False) and row.get('amazon-order-id', False) not in b2b_orders:
+                        b2b_orders.add(row.get('amazon-order-id', False))
+                        b2b_order_list.append(row.get('amazon-order-id', False))
         self.process_amazon_shipment_orders(outbound_orders_dict, order_details_dict_list, b2b_order_list, log_rec)
         return True
 
@@ -912,11 +1014,10 @@ class ShippingReportRequestHistory(models.Model):
         kwargs.update({'emipro_api': 'get_amazon_orders_sp_api'})
         for x in range(0, len(b2b_order_list), 50):
             sale_orders_list = b2b_order_list[x:x + 50]
-            sale_orders_list = ",".join(sale_orders_list)
             amz_b2b_order_dict = {}
-            kwargs.update({'sale_order_list': sale_orders_list})
+            kwargs.update({'sale_order_list': ",".join(sale_orders_list)})
 
-            response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+            response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
             result = response.get('result', {}) if isinstance(response.get('result', {}), list) else [
                 response.get('result', {})]
 
@@ -1154,9 +1255,12 @@ class ShippingReportRequestHistory(models.Model):
         sale_order_obj = self.env[SALE_ORDER]
         marketplace_obj = self.env['amazon.marketplace.ept']
         if row.get('sales-channel', '') == "Non-Amazon":
-            order = sale_order_obj.search([("amz_order_reference", "=", row.get('merchant-order-id', "")),
-                                           ("amz_is_outbound_order", "=", True)])
-            instance = order.amz_fulfillment_instance_id
+            key = ("Non-Amazon", row.get('merchant-order-id', ""))
+            if key not in instances:
+                order = sale_order_obj.search([("amz_order_reference", "=", row.get('merchant-order-id', "")),
+                                               ("amz_is_outbound_order", "=", True)])
+                instances.update({key: order.amz_fulfillment_instance_id})
+            instance = instances.get(key)
         elif row.get('sales-channel', '') not in instances:
             instance = marketplace_obj.find_instance(self.seller_id, row.get('sales-channel', ''))
             instances.update({row.get('sales-channel', ''): instance})
@@ -1616,7 +1720,8 @@ class ShippingReportRequestHistory(models.Model):
         stock_location_obj = self.env['stock.location']
         pending_orders_dict = {}
         partner_dict = {}
-        product_details = {}
+        sale_orders_list = set(sale_orders_list)
+        product_details = self.get_shipment_report_products_ept(order_details_dict_list, sale_orders_list)
         commit_flag = 1
         country_dict = {}
         state_dict = {}
@@ -1657,6 +1762,39 @@ class ShippingReportRequestHistory(models.Model):
             commit_flag += 1
         return True
 
+    def get_shipment_report_products_ept(self, order_details_dict_list, sale_orders_list):
+        """
+        Find the odoo products of the FBA order lines of the shipment report, with one search of the amazon
+        products in place of search_amazon_product per sku. Lines whose amazon product is not found are left to
+        prepare_amazon_products.
+        :param order_details_dict_list: dict {order ref: list of order lines}
+        :param sale_orders_list: order references to process
+        :return: dict {(seller sku, instance id): product.product()}
+        """
+        amazon_product_obj = self.env['amazon.product.ept']
+        sku_instances = {(row.get('sku', ''), row.get('instance_id', False))
+                         for order_ref, lines in order_details_dict_list.items() if order_ref in sale_orders_list
+                         for row in lines}
+        if not sku_instances:
+            return {}
+        amazon_products = {}
+        for amazon_product in amazon_product_obj.search(
+                ['|', ('active', '=', False), ('active', '=', True),
+                 ('seller_sku', 'in', list({sku.strip() for sku, instance_id in sku_instances})),
+                 ('instance_id', 'in', list({instance_id for sku, instance_id in sku_instances})),
+                 ('fulfillment_by', '=', 'FBA')]):
+            amazon_products.setdefault((amazon_product.seller_sku, amazon_product.instance_id.id), amazon_product)
+        product_dict = {}
+        for sku, instance_id in sku_instances:
+            amazon_product = amazon_products.get((sku.strip(), instance_id))
+            if amazon_product:
+                product_dict.update({(sku, instance_id): amazon_product.product_id})
+        inactive_products = self.env['product.product'].union(*product_dict.values()).filtered(
+            lambda product: not product.active)
+        if inactive_products:
+            inactive_products.write({'active': True})
+        return product_dict
+
     def amazon_fba_shipment_report_workflow(self, amz_order_list, job):
         """
         The function is used for create Invoices and Process Stock Move done.
@@ -1845,18 +1983,22 @@ class ShippingReportRequestHistory(models.Model):
         partner_dict, partner = self.search_or_create_amz_partner(row, instance, ship_vals, partner_dict)
         return {'invoice_partner': partner.id, 'shipping_partner': partner.id}, country_dict, state_dict
 
-    def get_warehouse(self, fulfillment_center_id, instance):
+    def get_warehouse(self, fulfillment_center_id, instance, fulfillment_centers=None):
         """
         Get Amazon fulfillment center and FBA warehouse id from current instance
         @author: Keyur Kanani
         :param fulfillment_center_id:
         :param instance: amazon.instance.ept()
+        :param fulfillment_centers: dict {center code: amazon.fulfillment.center()} already searched
         :return: fulfillment_center, warehouse
         """
         fulfillment_center_obj = self.env['amazon.fulfillment.center']
-        fulfillment_center = fulfillment_center_obj.search( \
-            [('center_code', '=', fulfillment_center_id),
-             ('seller_id', '=', instance.seller_id.id)], limit=1)
+        if fulfillment_centers is not None:
+            fulfillment_center = fulfillment_centers.get(fulfillment_center_id, fulfillment_center_obj)
+        else:
+            fulfillment_center = fulfillment_center_obj.search( \
+                [('center_code', '=', fulfillment_center_id),
+                 ('seller_id', '=', instance.seller_id.id)], limit=1)
         if self._context.get('is_fulfillment_center', False) and not fulfillment_center:
             warehouse = False
         else:
@@ -2111,7 +2253,7 @@ class ShippingReportRequestHistory(models.Model):
                        'report_type': [report_type],
                        'start_date': start_date,
                        'end_date': end_date})
-        response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
         if not response.get('error', False):
             list_of_wrapper = response.get('result', [])
         else:
@@ -2204,7 +2346,7 @@ class ShippingReportRequestHistory(models.Model):
                   'report_document_id': self.report_document_id, 'amz_report_type': 'shipment_report_spapi',
                   'merchant_id': self.seller_id.merchant_id}
         imp_file = []
-        response = iap_tools.iap_jsonrpc(DECODE_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DECODE_ENDPOINT, params=kwargs, timeout=1000)
         if response.get('result', False):
             try:
                 imp_file = StringIO(base64.b64decode(response.get('result', {})).decode())
@@ -13,8 +13,8 @@ import logging
 from datetime import datetime, timedelta
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
-from odoo.addons.iap.tools import iap_tools
 from ..endpoint import DECODE_ENDPOINT
+from ..transport import amazon_jsonrpc
 
 _logger = logging.getLogger("Amazon")
 AMZ_SELLER_EPT = 'amazon.seller.ept'
@@ -500,7 +500,7 @@ class VcsTaxReport(models.Model):
         req = {'dbuuid': dbuuid, 'report_id': self.report_id, 'report_document_id': self.report_document_id,
                'datas': attachment_id.datas.decode(), 'amz_report_type': 'vcs_tax_report_spapi',
                'merchant_id': self.seller_id.merchant_id}
-        response = iap_tools.iap_jsonrpc(DECODE_ENDPOINT, params=req, timeout=1000)
+        response = amazon_jsonrpc(DECODE_ENDPOINT, params=req, timeout=1000)
         if response.get('result', False):
             try:
                 imp_file = StringIO(base64.b64decode(response.get('result')).decode())
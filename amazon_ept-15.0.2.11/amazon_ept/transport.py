@@ -0,0 +1,221 @@
+"""
+Transport of the requests sent to the IAP server for the amazon operations.
+Keeps a keep-alive session per thread, throttles every operation of a seller with a token bucket sized on the
+SP-API rate limits, retries throttled and transient failures with an exponential backoff and records the latency
+of every operation.
+"""
+import logging
+import random
+import threading
+import time
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from odoo import exceptions, _
+from odoo.addons.iap.tools.iap_tools import InsufficientCreditError
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 1000
+CONNECT_TIMEOUT = 30
+MAX_RETRIES = 4
+BACKOFF_FACTOR = 2
+MAX_BACKOFF = 60
+# Only failures of requests which did not reach amazon are retried, other requests may not be idempotent. A
+# connection error is retried only when the connection could not be opened, a connection dropped while reading
+# the response may come after the request reached the IAP server.
+RETRY_STATUS_CODES = (429, 503)
+THROTTLING_ERRORS = ('QuotaExceeded', 'TooManyRequests', 'RequestThrottled')
+
+# (requests per second, burst) of the SP-API operation called for an emipro_api, operations which are not listed
+# here are not throttled by the transport.
+RATE_LIMITS = {
+    'get_amazon_orders_sp_api': (0.0167, 20),
+    'import_pending_orders_sp_api': (0.0167, 20),
+    'order_by_next_token_sp_api': (0.0167, 20),
+    'get_amazon_order_sp_api': (0.5, 30),
+    'create_report_sp_api': (0.0167, 15),
+    'create_report_without_date_sp_api': (0.0167, 15),
+    'create_marketplace_report_sp_api': (0.0167, 15),
+    'get_report_sp_api': (2.0, 15),
+    'get_reports_sp_api': (0.0222, 10),
+    'get_report_document_sp_api': (0.0167, 15),
+    'amazon_submit_feeds_sp_api': (0.0083, 15),
+    'get_feed_submission_result_sp_api': (2.0, 15),
+    'auto_create_outbound_order_sp_api': (2.0, 30),
+    'update_fulfillment_sp_api': (2.0, 30),
+    'cancel_fulfillment_sp_api': (2.0, 30),
+    'amazon_upload_vat_invoices_sp_api': (0.3333, 1),
+}
+
+
+class TokenBucket(object):
+    """ Token bucket refilled with rate tokens per second up to burst tokens. """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """ Take a token, waiting until one is available.
+            @return: Seconds waited.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class OperationStats(object):
+    """ Number of calls, errors and latency of the requests of an operation. """
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def add(self, elapsed, failed):
+        self.count += 1
+        self.errors += 1 if failed else 0
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+
+    def as_dict(self):
+        return {'count': self.count, 'errors': self.errors, 'max_time': self.max_time,
+                'avg_time': self.total_time / self.count if self.count else 0.0}
+
+
+_local = threading.local()
+_buckets = {}
+_stats = {}
+_lock = threading.Lock()
+
+
+def get_session():
+    """ Return the keep-alive session of the current thread. """
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = _local.session = requests.Session()
+        session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=4))
+    return session
+
+
+def get_token_bucket(seller_key, operation):
+    """ Return the token bucket of an operation of a seller, None when the operation is not throttled. """
+    if operation not in RATE_LIMITS:
+        return None
+    key = (seller_key, operation)
+    with _lock:
+        if key not in _buckets:
+            _buckets[key] = TokenBucket(*RATE_LIMITS[operation])
+        return _buckets[key]
+
+
+def record_latency(operation, elapsed, failed=False):
+    with _lock:
+        _stats.setdefault(operation, OperationStats()).add(elapsed, failed)
+
+
+def get_operation_stats():
+    """ Return the number of calls, errors and the latency of every operation sent by this process. """
+    with _lock:
+        return {operation: stats.as_dict() for operation, stats in _stats.items()}
+
+
+def is_throttled(result):
+    error = isinstance(result, dict) and result.get('error')
+    return bool(error) and any(name in str(error) for name in THROTTLING_ERRORS)
+
+
+def is_not_sent(error):
+    """ Whether a failed request surely did not reach the IAP server, so it can be sent again. """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.exceptions.ConnectionError) or not error.args:
+        return False
+    reason = getattr(error.args[0], 'reason', error.args[0])
+    return isinstance(reason, NewConnectionError)
+
+
+def get_backoff(attempt):
+    return min(MAX_BACKOFF, BACKOFF_FACTOR ** attempt) + random.uniform(0, 1)
+
+
+def amazon_jsonrpc(url, method='call', params=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Send a json-rpc request to the IAP server, drop-in replacement of iap_tools.iap_jsonrpc for the amazon
+    operations.
+    :param url: IAP endpoint
+    :param params: request parameters, the merchant_id and emipro_api keys select the token bucket
+    :param timeout: read timeout in seconds
+    :return: result of the request
+    """
+    params = params or {}
+    operation = params.get('emipro_api') or url.rsplit('/', 1)[-1]
+    bucket = get_token_bucket(params.get('merchant_id'), operation)
+    payload = {'jsonrpc': '2.0', 'method': method, 'params': params, 'id': uuid.uuid4().hex}
+    for attempt in range(MAX_RETRIES + 1):
+        if bucket:
+            bucket.acquire()
+        start = time.time()
+        try:
+            response = get_session().post(url, json=payload, timeout=(CONNECT_TIMEOUT, timeout))
+            if response.status_code in RETRY_STATUS_CODES and attempt < MAX_RETRIES:
+                raise requests.exceptions.HTTPError(response=response)
+            response.raise_for_status()
+            response = response.json()
+        except (ValueError, requests.exceptions.ConnectionError, requests.exceptions.MissingSchema,
+                requests.exceptions.Timeout, requests.exceptions.HTTPError) as error:
+            record_latency(operation, time.time() - start, failed=True)
+            retry = attempt < MAX_RETRIES and (
+                is_not_sent(error) or
+                isinstance(error, requests.exceptions.HTTPError) and error.response is not None and
+                error.response.status_code in RETRY_STATUS_CODES)
+            if retry:
+                backoff = get_backoff(attempt)
+                _logger.warning("Amazon request %s failed (%s), retrying in %.1f seconds.", operation, error, backoff)
+                time.sleep(backoff)
+                continue
+            raise exceptions.AccessError(
+                _('The url that this service requested returned an error. Please contact the author of the app. '
+                  'The url it tried to contact was %s', url))
+        elapsed = time.time() - start
+        if 'error' in response:
+            record_latency(operation, elapsed, failed=True)
+            name = response['error']['data'].get('name').rpartition('.')[-1]
+            message = response['error']['data'].get('message')
+            if name == 'InsufficientCreditError':
+                error_class = InsufficientCreditError
+            elif name == 'AccessError':
+                error_class = exceptions.AccessError
+            elif name == 'UserError':
+                error_class = exceptions.UserError
+            else:
+                raise exceptions.AccessError(
+                    _('The url that this service requested returned an error. Please contact the author of the app. '
+                      'The url it tried to contact was %s', url))
+            error = error_class(message)
+            error.data = response['error']['data']
+            raise error
+        result = response.get('result')
+        throttled = is_throttled(result)
+        record_latency(operation, elapsed, failed=throttled)
+        _logger.info("Amazon request %s done in %.2f seconds.", operation, elapsed)
+        if throttled and attempt < MAX_RETRIES:
+            backoff = get_backoff(attempt)
+            _logger.warning("Amazon request %s is throttled, retrying in %.1f seconds.", operation, backoff)
+            time.sleep(backoff)
+            continue
+        return result
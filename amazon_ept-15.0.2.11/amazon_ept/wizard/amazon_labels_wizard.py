@@ -13,9 +13,9 @@ import requests
 import urllib.request
 import logging
 from odoo import models, fields, _
-from odoo.addons.iap.tools import iap_tools
 from odoo.exceptions import UserError
 from ..endpoint import DEFAULT_ENDPOINT
+from ..transport import amazon_jsonrpc
 
 _logger = logging.getLogger(__name__)
 AMAZON_INBOUND_SHIPMENT_EPT = 'amazon.inbound.shipment.ept'
@@ -81,7 +81,7 @@ class AmazonShipmentLabelWizard(models.TransientModel):
             'label_type': label_type,
             'box_no': box_no
         }
-        response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
         return response
 
     @staticmethod
@@ -7,9 +7,9 @@ create and update fulfillment.
 
 import logging
 from odoo import models, fields, api, _
-from odoo.addons.iap.tools import iap_tools
 from odoo.exceptions import UserError
 from ..endpoint import DEFAULT_ENDPOINT
+from ..transport import amazon_jsonrpc
 
 _logger = logging.getLogger(__name__)
 AMZ_INSTANCE_EPT = 'amazon.instance.ept'
@@ -179,7 +179,7 @@ class AmazonOutboundOrderWizard(models.TransientModel):
                 data = order.get_data()
                 kwargs = order.prepare_amz_outbound_order_kwargs()
                 kwargs.update({'emipro_api': 'update_fulfillment_sp_api', 'data': data})
-                response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+                response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
                 if response.get('error', False):
                     raise UserError(_(response.get('error', {})))
                 self._cr.commit()
@@ -205,7 +205,7 @@ class AmazonOutboundOrderWizard(models.TransientModel):
                 # action_cancel_v13 is incomplete in MWS
                 kwargs = order.prepare_amz_outbound_order_kwargs()
                 kwargs.update({'emipro_api': 'cancel_fulfillment_sp_api', 'order_name': order.name})
-                response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+                response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
                 if response.get('error', False):
                     raise UserError(_(response.get('error', {})))
                 order.is_amazon_canceled = True
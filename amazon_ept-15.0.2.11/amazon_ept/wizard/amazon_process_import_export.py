@@ -16,9 +16,9 @@ from io import StringIO
 import os
 import logging
 from odoo import models, fields, api, _
-from odoo.addons.iap.tools import iap_tools
 from odoo.exceptions import UserError, ValidationError
 from ..endpoint import DEFAULT_ENDPOINT
+from ..transport import amazon_jsonrpc
 from .. reportTypes import ReportType
 
 _logger = logging.getLogger(__name__)
@@ -920,7 +920,7 @@ class AmazonProcessImportExport(models.TransientModel):
         marketplace_ids = tuple(map(lambda x: x.market_place_id, instances))
         kwargs.update({'report_type': [report_types], 'start_date': start_date, 'end_date': end_date,
                        "marketplaceids": marketplace_ids})
-        response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
         if response.get('error', False):
             raise UserError(_(response.get('error', {})))
         list_of_wrapper = response.get('result', {})
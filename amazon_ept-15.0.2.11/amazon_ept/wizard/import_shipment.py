@@ -6,8 +6,8 @@ Added class  and methods to request for inbound shipment and process inbound shi
 
 from odoo import models, fields, _
 from odoo.exceptions import UserError
-from odoo.addons.iap.tools import iap_tools
 from ..endpoint import DEFAULT_ENDPOINT
+from ..transport import amazon_jsonrpc
 from dateutil import parser
 
 
@@ -65,7 +65,7 @@ class AmazonInboundImportShipmentWizard(models.TransientModel):
 
         kwargs = self.amz_prepare_inbound_kwargs_vals(instance)
         kwargs.update({'emipro_api': 'check_amazon_shipment_status_spapi', 'amazon_shipment_id': shipment_id})
-        response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+        response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
         if response.get('error', False):
             raise UserError(_(response.get('error', {})))
         items = response.get('items', {})
@@ -132,7 +132,7 @@ class AmazonInboundImportShipmentWizard(models.TransientModel):
         for shipment_id in shipment_ids:
             kwargs = self.amz_prepare_inbound_kwargs_vals(instance)
             kwargs.update({'emipro_api': 'check_status_by_shipment_ids', 'shipment_ids': [shipment_id]})
-            response = iap_tools.iap_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
+            response = amazon_jsonrpc(DEFAULT_ENDPOINT, params=kwargs, timeout=1000)
             if response.get('error', False):
                 raise UserError(_(response.get('error', {})))
             amazon_shipments = response.get('amazon_shipments', {})
@@ -9,9 +9,9 @@ import requests
 from datetime import datetime
 from odoo import SUPERUSER_ID
 from odoo import models, fields, api, _
-from odoo.addons.iap.tools import iap_tools
 from odoo.exceptions import UserError
 from odoo.http import request
+from ..transport import amazon_jsonrpc
 
 AMAZON_SELLER_EPT = 'amazon.seller.ept'
 AMAZON_INSTANCE_EPT = 'amazon.instance.ept'
@@ -644,8 +644,8 @@ class AmazonConfigSettings(models.TransientModel):
         :return str: IAP Account token
         """
         kwargs = {'database_uid': database_uid}
-        response = iap_tools.iap_jsonrpc('https://iap.odoo.emiprotechnologies.com/get_amz_iap_token', params=kwargs,
-                                         timeout=1000)
+        response = amazon_jsonrpc('https://iap.odoo.emiprotechnologies.com/get_amz_iap_token', params=kwargs,
+                                  timeout=1000)
         if response.get('error', False):
             raise UserError(_(response.get('error', False)))
         return response.get('amz_iap_token', '')
@@ -6,10 +6,10 @@ Added class to config the Amazon seller details
 """
 
 from odoo import models, fields, api, _
-from odoo.addons.iap.tools import iap_tools
 from odoo.exceptions import UserError
 
 from ..endpoint import REGISTER_ENDPOINT, VERIFY_ENDPOINT
+from ..transport import amazon_jsonrpc
 
 
 class AmazonSellerConfig(models.TransientModel):
@@ -123,12 +123,12 @@ class AmazonSellerConfig(models.TransientModel):
         account = iap_account_obj.search([('service_name', '=', 'amazon_ept')])
         if account:
             kwargs = self.prepare_marketplace_kwargs(account)
-            response = iap_tools.iap_jsonrpc(VERIFY_ENDPOINT, params=kwargs, timeout=1000)
+            response = amazon_jsonrpc(VERIFY_ENDPOINT, params=kwargs, timeout=1000)
         else:
             account = iap_account_obj.create({'service_name': 'amazon_ept'})
             account._cr.commit()
             kwargs = self.prepare_marketplace_kwargs(account)
-            response = iap_tools.iap_jsonrpc(REGISTER_ENDPOINT, params=kwargs, timeout=1000)
+            response = amazon_jsonrpc(REGISTER_ENDPOINT, params=kwargs, timeout=1000)
 
         if response.get('error', {}):
             raise UserError(_(response.get('error', {})))
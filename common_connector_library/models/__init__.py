@@ -6,6 +6,9 @@ from . import sale_order
 from . import sale_order_line
 from . import product_product
 from . import stock_quant
+from . import stock_move
+from . import stock_move_watermark_ept
+from . import connector_kpi_rollup_ept
 from . import stock_quant_package
 from . import stock_picking
 from . import product_pricelist
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 # See LICENSE file for full copyright and licensing details.
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
 
 
 class CommonLogBookEpt(models.Model):
@@ -27,6 +27,11 @@ class CommonLogBookEpt(models.Model):
     file_name = fields.Char()
     sale_order_id = fields.Many2one(comodel_name='sale.order', string='Sale Order')
 
+    def init(self):
+        """ Index used to purge the old records, see data.queue.mixin.ept. """
+        super(CommonLogBookEpt, self).init()
+        tools.create_index(self._cr, "%s_create_date_index" % self._table, self._table, ["create_date"])
+
     @api.model
     def create(self, vals):
         """ To generate a sequence for a common logbook.
@@ -68,4 +73,4 @@ class CommonLogBookEpt(models.Model):
 
     def _get_model_id(self, model_name):
         model_id = self.env['ir.model']
-        return model_id.search([('model', '=', model_name)])
+        return model_id.browse(model_id._get_id(model_name))
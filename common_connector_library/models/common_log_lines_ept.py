@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
 # See LICENSE file for full copyright and licensing details.
+from contextlib import contextmanager
+
 from odoo import models, fields, api
 
+LOG_LINE_BUFFER = "common.log.lines.ept.buffer"
+
 
 class CommonLogLineEpt(models.Model):
     _name = "common.log.lines.ept"
@@ -27,10 +31,7 @@ class CommonLogLineEpt(models.Model):
             @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 23 September 2021 .
             Task_id: 178058
         """
-        model = self.env['ir.model'].search([('model', '=', model_name)])
-        if model:
-            return model.id
-        return False
+        return self.env['ir.model']._get_id(model_name) or False
 
     def create_log_lines(self, message, model_id, res_id, log_book_id, default_code='', order_ref='', product_id=False):
         """ Used to create a log lines.
@@ -53,7 +54,7 @@ class CommonLogLineEpt(models.Model):
                 'order_ref': order_ref,
                 'product_id': product_id
                 }
-        log_line = self.create(vals)
+        log_line = self.create_or_buffer_log_line_ept(vals)
         return log_line
 
     def create_common_log_line_ept(self, **kwargs):
@@ -64,4 +65,118 @@ class CommonLogLineEpt(models.Model):
         if kwargs.get('model_name'):
             model_id = self.log_book_id._get_model_id(kwargs.get('model_name'))
             values.update({'model_id': model_id.id})
-        return self.create(values)
+        return self.create_or_buffer_log_line_ept(values)
+
+    @contextmanager
+    def buffer_log_lines_ept(self):
+        """ Log lines created inside this context are collected in memory and created with a single multi-row
+            create when the context is left, before every commit of the cursor or when flush_log_lines_ept is
+            called. While buffering, the create methods return an empty recordset.
+            Usage: with self.env['common.log.lines.ept'].buffer_log_lines_ept(): ...
+        """
+        buffer = self._get_log_line_buffer_ept(create=True)
+        buffer["depth"] += 1
+        failed = False
+        try:
+            yield self
+        except Exception:
+            failed = True
+            raise
+        finally:
+            # A commit inside the context replaces the buffer, so fetch it again.
+            buffer = self._get_log_line_buffer_ept()
+            if buffer:
+                buffer["depth"] -= 1
+                if not buffer["depth"] and not failed:
+                    self.flush_log_lines_ept()
+
+    def _get_log_line_buffer_ept(self, create=False):
+        """ Return the log line buffer of the current transaction. The buffer is kept in the precommit data of the
+            cursor, so the lines still waiting in it are created right before the transaction is committed.
+            @param create: Create the buffer when the transaction has none yet.
+            @return: Dictionary with the buffering depth, the list of log line values and the values of the
+            de-duplicated log lines by key.
+        """
+        precommit = self.env.cr.precommit
+        if create and LOG_LINE_BUFFER not in precommit.data:
+            precommit.data[LOG_LINE_BUFFER] = {"depth": 0, "vals": [], "unique": {}}
+            precommit.add(self._flush_log_lines_before_commit_ept)
+        return precommit.data.get(LOG_LINE_BUFFER)
+
+    def _flush_log_lines_before_commit_ept(self):
+        """ Precommit hook, creates the buffered log lines. The cursor drops its precommit data once committed,
+            so the buffer is set up again for the contexts which are still open.
+        """
+        buffer = self._get_log_line_buffer_ept()
+        if not buffer:
+            return
+        self.flush_log_lines_ept()
+        self.flush()
+        depth = buffer["depth"]
+        if depth:
+            self.env.cr.postcommit.add(lambda: self._restore_log_line_buffer_ept(depth))
+
+    def _restore_log_line_buffer_ept(self, depth):
+        self._get_log_line_buffer_ept(create=True)["depth"] = depth
+
+    def create_or_buffer_log_line_ept(self, vals, unique_fields=None, update_fields=None):
+        """ Create the log line or keep its values in the buffer when one is active.
+            @param vals: Values of the log line.
+            @param unique_fields: Fields identifying the log line. When a log line with the same values exists, or
+            is waiting in the buffer, it is updated with the update_fields in place of creating a new one. While
+            buffering, the existing log lines are searched once for all the buffered lines when they are flushed.
+            @param update_fields: Fields written on the existing log line.
+            @return: Record of log line, empty while buffering.
+        """
+        buffer = self._get_log_line_buffer_ept()
+        update_vals = {field: vals.get(field) for field in update_fields or []}
+        if buffer and buffer["depth"]:
+            if unique_fields:
+                key = (tuple(unique_fields), tuple(vals.get(field) for field in unique_fields))
+                if key in buffer["unique"]:
+                    buffer["unique"][key][0].update(update_vals)
+                    return self.browse()
+                buffer["unique"][key] = (vals, update_vals)
+            buffer["vals"].append(vals)
+            return self.browse()
+        if unique_fields:
+            log_line = self.search([(field, "=", vals.get(field)) for field in unique_fields])
+            if log_line:
+                log_line.write(update_vals)
+                return log_line
+        return self.create(vals)
+
+    def flush_log_lines_ept(self):
+        """ Create all the buffered log lines at once. The buffered lines which already exist, see unique_fields
+            of create_or_buffer_log_line_ept, are updated instead.
+            @return: Records of the created log lines.
+        """
+        buffer = self._get_log_line_buffer_ept()
+        if not buffer or not buffer["vals"]:
+            return self.browse()
+        vals_list, buffer["vals"] = buffer["vals"], []
+        unique_vals, buffer["unique"] = buffer["unique"], {}
+        updated = self._update_existing_log_lines_ept(unique_vals)
+        return self.create([vals for vals in vals_list if id(vals) not in updated])
+
+    def _update_existing_log_lines_ept(self, unique_vals):
+        """ Update the existing log lines of the buffered de-duplicated lines, with one search per set of unique
+            fields.
+            @param unique_vals: Dictionary of (unique fields, values) and (log line values, values to update).
+            @return: Set of the id() of the log line values which are updated and must not be created.
+        """
+        keys_by_fields = {}
+        for unique_fields, values in unique_vals:
+            keys_by_fields.setdefault(unique_fields, []).append(values)
+        updated = set()
+        for unique_fields, values_list in keys_by_fields.items():
+            domain = [(field, "in", list({values[index] for values in values_list}))
+                      for index, field in enumerate(unique_fields)]
+            for log_line in self.search(domain):
+                key = (unique_fields, tuple(log_line[field].id if isinstance(log_line[field], models.BaseModel)
+                                            else log_line[field] for field in unique_fields))
+                if key in unique_vals:
+                    vals, update_vals = unique_vals[key]
+                    log_line.write(update_vals)
+                    updated.add(id(vals))
+        return updated
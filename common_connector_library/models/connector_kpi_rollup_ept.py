@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for full copyright and licensing details.
+import logging
+from datetime import timedelta
+
+from odoo import models, fields, tools
+
+_logger = logging.getLogger("Common Connector Library")
+
+KPI_ROLLUP_WATERMARK_CHANNEL = "connector.kpi.rollup.ept,%s"
+KPI_ROLLUP_WATERMARK_OVERLAP = timedelta(minutes=10)
+KPI_ROLLUP_FULL_REFRESH_CHANNEL = "connector.kpi.rollup.ept.full,%s"
+KPI_ROLLUP_FULL_REFRESH_INTERVAL = timedelta(days=1)
+KPI_ROLLUP_FIELDS = ["order_count", "revenue", "cancel_count", "shipped_count", "refund_count"]
+
+
+class ConnectorKpiRollupEpt(models.Model):
+    _name = "connector.kpi.rollup.ept"
+    _description = "Connector Daily KPI"
+    _order = "date desc"
+
+    instance_model = fields.Char(required=True, index=True, help="Model of the instance, like shopify.instance.ept.")
+    instance_id = fields.Integer(required=True, index=True)
+    segment = fields.Char(required=True, default="", help="Segment of the orders, like the Amazon fulfillment.")
+    company_id = fields.Many2one("res.company", index=True, ondelete="cascade")
+    date = fields.Date(required=True, index=True)
+    order_count = fields.Integer(help="Number of confirmed orders of the day.")
+    revenue = fields.Float(help="Untaxed amount of the confirmed orders of the day.")
+    cancel_count = fields.Integer(help="Number of cancelled orders of the day.")
+    shipped_count = fields.Integer(help="Number of deliveries to customers done on the day.")
+    refund_count = fields.Integer(help="Number of refunds of the day.")
+
+    _sql_constraints = [("instance_segment_date_unique",
+                         "unique(instance_model, instance_id, segment, company_id, date)",
+                         "Daily KPI must be unique per instance, segment, company and date.")]
+
+    def init(self):
+        """ The rollup refresh looks for the records written since its last run. """
+        tools.create_index(self._cr, "sale_order_write_date_index", "sale_order", ["write_date"])
+        tools.create_index(self._cr, "stock_picking_write_date_index", "stock_picking", ["write_date"])
+        tools.create_index(self._cr, "account_move_write_date_index", "account_move", ["write_date"])
+
+    def _get_kpi_rollup_sources_ept(self):
+        """ This method is need to override in all connector to add the orders of their instances in the rollup.
+            @return: List of dictionaries with keys
+                instance_model: Model of the instance.
+                order_field: Column of sale_order (alias so) referencing the instance.
+                refund_field: Column of account_move (alias am) referencing the instance.
+                segment: SQL expression on sale_order (alias so) splitting the orders, like the Amazon fulfillment.
+                shipped_condition: SQL condition on stock_picking (alias sp) counting a delivery as shipped.
+        """
+        return []
+
+    def refresh_kpi_rollup_ept(self):
+        """ Cron method, used to refresh the daily KPIs of every connector. Only the days having orders, deliveries
+            or refunds written since the previous run are computed again. The day a record is moved away from, by
+            a change of its date or its deletion, is not known any more, so it keeps its old counts until all the
+            days are computed again, which happens at the first run and once every
+            KPI_ROLLUP_FULL_REFRESH_INTERVAL.
+        """
+        watermark_obj = self.env["stock.move.watermark.ept"].sudo()
+        for source in self._get_kpi_rollup_sources_ept():
+            channel = KPI_ROLLUP_WATERMARK_CHANNEL % source["instance_model"]
+            full_refresh_channel = KPI_ROLLUP_FULL_REFRESH_CHANNEL % source["instance_model"]
+            self._cr.execute("select now() at time zone 'UTC'")
+            refresh_time = self._cr.fetchone()[0]
+            watermark = watermark_obj.get_watermark_ept(channel, self.env.company)
+            last_full_refresh = watermark_obj.get_watermark_ept(full_refresh_channel, self.env.company)
+            if watermark and last_full_refresh and refresh_time - last_full_refresh < KPI_ROLLUP_FULL_REFRESH_INTERVAL:
+                days = self.get_kpi_rollup_changed_days_ept(source, watermark - KPI_ROLLUP_WATERMARK_OVERLAP)
+                if days:
+                    self.compute_kpi_rollup_ept(source, days)
+            else:
+                self.compute_kpi_rollup_ept(source)
+                watermark_obj.set_watermark_ept(full_refresh_channel, self.env.company, refresh_time)
+            watermark_obj.set_watermark_ept(channel, self.env.company, refresh_time)
+            self._cr.commit()
+        return True
+
+    def get_kpi_rollup_changed_days_ept(self, source, since):
+        """ This method is used to find the instance days affected by the records written since a time, only the
+            current day of a written record is known.
+            @param source: Dictionary of the connector, see _get_kpi_rollup_sources_ept.
+            @param since: Datetime from which the written records are searched.
+            @return: List of (instance id, date) tuples.
+        """
+        query = """select so.{order_field}, date(so.date_order) from sale_order so
+                   where so.{order_field} is not null and so.write_date >= %(since)s
+                   union
+                   select so.{order_field}, date(sp.date_done) from stock_picking sp
+                   join sale_order so on so.procurement_group_id = sp.group_id
+                   where so.{order_field} is not null and sp.date_done is not null and sp.write_date >= %(since)s
+                   union
+                   select am.{refund_field}, am.invoice_date from account_move am
+                   where am.move_type = 'out_refund' and am.{refund_field} is not null
+                   and am.invoice_date is not null and am.write_date >= %(since)s""".format(**source)
+        self._cr.execute(query, {"since": since})
+        return self._cr.fetchall()
+
+    def compute_kpi_rollup_ept(self, source, days=None):
+        """ This method is used to compute the daily KPIs of a connector and replace the stored rows.
+            @param source: Dictionary of the connector, see _get_kpi_rollup_sources_ept.
+            @param days: List of (instance id, date) tuples to compute, all the days when not given.
+        """
+        params = {"instance_model": source["instance_model"]}
+        day_filter = ""
+        if days:
+            params.update({"instance_ids": [day[0] for day in days], "days": [day[1] for day in days],
+                           "min_day": min(day[1] for day in days)})
+            day_filter = "and ({instance}, {day}) in (select * from unnest(%(instance_ids)s::int[], " \
+                         "%(days)s::date[])) and {datetime} >= %(min_day)s"
+        rollup = {}
+
+        self._cr.execute("""select so.{order_field}, {segment}, so.company_id, date(so.date_order),
+                                count(*) filter (where so.state in ('sale', 'done')),
+                                coalesce(sum(so.amount_untaxed) filter (where so.state in ('sale', 'done')), 0),
+                                count(*) filter (where so.state = 'cancel')
+                            from sale_order so
+                            where so.{order_field} is not null {day_filter}
+                            group by 1, 2, 3, 4""".format(
+            day_filter=day_filter.format(instance="so.%s" % source["order_field"], day="date(so.date_order)",
+                                         datetime="so.date_order"), **source), params)
+        for instance_id, segment, company_id, date, order_count, revenue, cancel_count in self._cr.fetchall():
+            values = rollup.setdefault((instance_id, segment or "", company_id, date),
+                                       dict.fromkeys(KPI_ROLLUP_FIELDS, 0))
+            values.update({"order_count": order_count, "revenue": revenue, "cancel_count": cancel_count})
+
+        self._cr.execute("""select so.{order_field}, {segment}, sp.company_id, date(sp.date_done),
+                                count(*) filter (where {shipped_condition})
+                            from stock_picking sp
+                            join sale_order so on so.procurement_group_id = sp.group_id
+                            join stock_location sl on sl.id = sp.location_dest_id and sl.usage = 'customer'
+                            where sp.state != 'cancel' and sp.date_done is not null and so.{order_field} is not null
+                            {day_filter}
+                            group by 1, 2, 3, 4""".format(
+            day_filter=day_filter.format(instance="so.%s" % source["order_field"], day="date(sp.date_done)",
+                                         datetime="sp.date_done"), **source), params)
+        for instance_id, segment, company_id, date, shipped_count in self._cr.fetchall():
+            values = rollup.setdefault((instance_id, segment or "", company_id, date),
+                                       dict.fromkeys(KPI_ROLLUP_FIELDS, 0))
+            values.update({"shipped_count": shipped_count})
+
+        self._cr.execute("""select am.{refund_field}, am.company_id, am.invoice_date, count(*)
+                            from account_move am
+                            where am.move_type = 'out_refund' and am.{refund_field} is not null
+                            and am.invoice_date is not null {day_filter}
+                            group by 1, 2, 3""".format(
+            day_filter=day_filter.format(instance="am.%s" % source["refund_field"], day="am.invoice_date",
+                                         datetime="am.invoice_date"), **source), params)
+        for instance_id, company_id, date, refund_count in self._cr.fetchall():
+            values = rollup.setdefault((instance_id, "", company_id, date), dict.fromkeys(KPI_ROLLUP_FIELDS, 0))
+            values.update({"refund_count": refund_count})
+
+        if days:
+            self._cr.execute("""delete from connector_kpi_rollup_ept where instance_model = %(instance_model)s
+                                and (instance_id, date) in (select * from unnest(%(instance_ids)s::int[],
+                                                                                 %(days)s::date[]))""", params)
+        else:
+            self._cr.execute("delete from connector_kpi_rollup_ept where instance_model = %(instance_model)s", params)
+        if rollup:
+            values = [(source["instance_model"], instance_id, segment, company_id, date) +
+                      tuple(kpis[field] for field in KPI_ROLLUP_FIELDS) + (self.env.uid, self.env.uid)
+                      for (instance_id, segment, company_id, date), kpis in rollup.items()]
+            self._cr.execute("""insert into connector_kpi_rollup_ept
+                                (instance_model, instance_id, segment, company_id, date, %s, create_uid, write_uid,
+                                 create_date, write_date)
+                                select v.*, now() at time zone 'UTC', now() at time zone 'UTC'
+                                from (values %s) as v""" % (", ".join(KPI_ROLLUP_FIELDS),
+                                                            ",".join(["%s"] * len(values))), values)
+        self.invalidate_cache()
+        _logger.info("Computed %s daily KPIs of %s.", len(rollup), source["instance_model"])
+        return True
+
+    def get_kpi_rollup_query_ept(self, instance_model, instance_id, segments=None, company=None):
+        """ This method is used to get a sub query on the daily KPIs of an instance, to be used in place of the
+            sale orders of the instance in the dashboard queries.
+            @param instance_model: Model of the instance.
+            @param instance_id: Id of the instance.
+            @param segments: List of segments to include, all the segments when not given.
+            @param company: Record of company to include, all the companies when not given.
+            @return: Sub query with the columns date, revenue and the KPI counts.
+        """
+        query = self._cr.mogrify("""(select date, revenue, %s from connector_kpi_rollup_ept
+                                     where instance_model = %%s and instance_id = %%s""" % (
+            ", ".join(field for field in KPI_ROLLUP_FIELDS if field != "revenue")),
+                                 (instance_model, instance_id)).decode()
+        if segments:
+            query += self._cr.mogrify(" and segment in %s", (tuple(segments),)).decode()
+        if company:
+            query += self._cr.mogrify(" and company_id = %s", (company.id,)).decode()
+        return query + ")"
+
+    def get_kpi_rollup_values_ept(self, instance_model, instance_id, date_from=None, date_to=None, segments=None,
+                                  company=None):
+        """ This method is used to sum the daily KPIs of an instance.
+            @param date_from: First day included.
+            @param date_to: Day from which the KPIs are excluded.
+            @return: Dictionary of the KPI fields and their total.
+        """
+        query = "select %s from %s as rollup where true" % (
+            ", ".join("coalesce(sum(%s), 0)" % field for field in KPI_ROLLUP_FIELDS),
+            self.get_kpi_rollup_query_ept(instance_model, instance_id, segments, company))
+        params = []
+        if date_from:
+            query += " and date >= %s"
+            params.append(date_from)
+        if date_to:
+            query += " and date < %s"
+            params.append(date_to)
+        self._cr.execute(query, params)
+        return dict(zip(KPI_ROLLUP_FIELDS, self._cr.fetchone()))
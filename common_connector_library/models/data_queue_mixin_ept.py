@@ -1,6 +1,14 @@
 # -*- coding: utf-8 -*-
 # See LICENSE file for full copyright and licensing details.
-from odoo import models
+import logging
+from datetime import datetime, time, timedelta
+
+from odoo import models, fields
+
+_logger = logging.getLogger("Common Connector Library")
+
+DATA_QUEUE_RETENTION_DAYS = 7
+DATA_QUEUE_PURGE_CHUNK_SIZE = 1000
 
 
 class DataQueueMixinEpt(models.AbstractModel):
@@ -9,6 +17,9 @@ class DataQueueMixinEpt(models.AbstractModel):
 
     def delete_data_queue_ept(self, queue_detail=[], is_delete_queue=False):
         """  Uses to delete unused data of queues and log book. logbook deletes which created before 7 days ago.
+            The retention can be changed per table with the system parameter
+            common_connector_library.retention_days.<table name>, or for all the tables with
+            common_connector_library.retention_days.
             @param queue_detail: list of queue records, like product, order queue [['product_queue',
             'order_queue']]
             @param is_delete_queue: Identification to delete queue
@@ -23,8 +34,49 @@ class DataQueueMixinEpt(models.AbstractModel):
                     if is_delete_queue:
                         self._cr.execute("""delete from %s """ % str(tbl_name))
                         continue
-                    self._cr.execute(
-                        """delete from %s where cast(create_date as Date) <= current_date - %d""" % (str(tbl_name), 7))
+                    self.purge_data_queue_table_ept(tbl_name, self.get_data_queue_retention_days_ept(tbl_name))
             except Exception as error:
+                _logger.exception("Deleting the old data of the connector queues failed.")
                 return error
         return True
+
+    def get_data_queue_retention_days_ept(self, tbl_name):
+        """ Used to get the number of days the records of a queue or log table are kept.
+            @param tbl_name: Name of the table.
+            @return: Number of days.
+        """
+        ir_config_parameter_obj = self.env['ir.config_parameter'].sudo()
+        retention_days = ir_config_parameter_obj.get_param(
+            'common_connector_library.retention_days.%s' % tbl_name) or ir_config_parameter_obj.get_param(
+            'common_connector_library.retention_days')
+        try:
+            return max(int(retention_days), 1) if retention_days else DATA_QUEUE_RETENTION_DAYS
+        except ValueError:
+            _logger.warning("Invalid retention days '%s' for table %s.", retention_days, tbl_name)
+            return DATA_QUEUE_RETENTION_DAYS
+
+    def purge_data_queue_table_ept(self, tbl_name, retention_days, chunk_size=DATA_QUEUE_PURGE_CHUNK_SIZE):
+        """ Used to delete the records of a queue or log table which are older than the retention days.
+            Records are deleted in id ranges of chunk_size and each chunk is committed, so the locks on the table
+            are short and the import crons are not blocked. Rows locked by a running process are skipped and
+            deleted by the next run. The create_date index of the table is created by the init() of its model.
+            @param tbl_name: Name of the table.
+            @param retention_days: Records created on or before today - retention_days are deleted.
+            @param chunk_size: Number of ids deleted per transaction.
+            @return: Number of deleted records.
+        """
+        cutoff = datetime.combine(fields.Date.context_today(self) - timedelta(days=retention_days - 1), time.min)
+        self._cr.execute("""select min(id), max(id) from %s where create_date < %%s""" % tbl_name, (cutoff,))
+        min_id, max_id = self._cr.fetchone()
+        if not min_id:
+            return 0
+        deleted = 0
+        for start_id in range(min_id, max_id + 1, chunk_size):
+            self._cr.execute("""delete from %s where id in (
+                                    select id from %s where id >= %%s and id < %%s and create_date < %%s
+                                    for update skip locked)""" % (tbl_name, tbl_name),
+                             (start_id, start_id + chunk_size, cutoff))
+            deleted += self._cr.rowcount
+            self._cr.commit()
+        _logger.info("Deleted %s records of %s created before %s.", deleted, tbl_name, cutoff)
+        return deleted
@@ -2,7 +2,7 @@
 import pytz
 
 from odoo import fields, models, tools, _
-from datetime import datetime
+from datetime import datetime, timedelta
 from odoo.exceptions import AccessError
 from dateutil.relativedelta import relativedelta
 from odoo.tools.date_utils import start_of, end_of
@@ -49,6 +49,36 @@ class Digest(models.Model):
         """
         return True
 
+    def _get_kpi_rollup_instance_ept(self):
+        """
+        This method is need to override in connector to read the KPIs of its instance from the daily KPIs.
+        @return: Tuple of instance model and instance id, False to compute the KPIs from the orders.
+        """
+        return False
+
+    def _use_kpi_rollup_ept(self):
+        """
+        This method is used to know if the KPIs of the period can be read from the daily KPIs. The daily KPIs
+        have a day granularity, so periods of one day or less, like the daily digest, are computed from the orders.
+        @return: True if the daily KPIs are used.
+        """
+        if not self._get_kpi_rollup_instance_ept():
+            return False
+        start, end, company = self._get_kpi_compute_parameters()
+        return fields.Datetime.to_datetime(end) - fields.Datetime.to_datetime(start) > timedelta(days=1)
+
+    def _get_kpi_rollup_values_ept(self):
+        """
+        This method is used to sum the daily KPIs of the digest instance and company over the days of the KPI
+        period, from the day of the period start to the day of the period end included.
+        @return: Dictionary of the daily KPI fields and their total.
+        """
+        instance_model, instance_id = self._get_kpi_rollup_instance_ept()
+        start, end, company = self._get_kpi_compute_parameters()
+        return self.env['connector.kpi.rollup.ept'].get_kpi_rollup_values_ept(
+            instance_model, instance_id, fields.Date.to_date(start), fields.Date.to_date(end) + timedelta(days=1),
+            company=company)
+
     def _prepare_query_domain(self, domain, table_ref):
         """
         This method is used to prepared dynamic domain based on query string and query table reference.
@@ -88,6 +118,9 @@ class Digest(models.Model):
         @return: total number of connector's sale orders ids and action for sale orders of current instance.
         """
         for record in self:
+            if record._use_kpi_rollup_ept():
+                record.kpi_orders_value = record._get_kpi_rollup_values_ept()['order_count']
+                continue
             start, end, company = record._get_kpi_compute_parameters()
             domain = self._prepare_query_domain(domain, 'so.')
             query = f"""select count(*) from sale_order so where so.company_id ={company.id} 
@@ -104,6 +137,9 @@ class Digest(models.Model):
         @return: total number of connector's sale orders ids and action for sale orders of current instance.
         """
         for record in self:
+            if record._use_kpi_rollup_ept():
+                record.kpi_shipped_orders_value = record._get_kpi_rollup_values_ept()['shipped_count']
+                continue
             start, end, company = record._get_kpi_compute_parameters()
             domain = self._prepare_query_domain(domain, 'sp.')
             query = f"""select count(*) from stock_picking sp
@@ -140,6 +176,9 @@ class Digest(models.Model):
         @return: total number of connector's sale orders ids and action for sale orders of current instance.
         """
         for record in self:
+            if record._use_kpi_rollup_ept():
+                record.kpi_cancel_orders_value = record._get_kpi_rollup_values_ept()['cancel_count']
+                continue
             start, end, company = record._get_kpi_compute_parameters()
             domain = self._prepare_query_domain(domain, 'so.')
             query = f"""select count(*) from sale_order so where so.company_id ={company.id}
@@ -155,6 +194,10 @@ class Digest(models.Model):
         @return: total number of connector's sale orders ids and action for sale orders of current instance.
         """
         for record in self:
+            if record._use_kpi_rollup_ept():
+                rollup_values = record._get_kpi_rollup_values_ept()
+                record.kpi_avg_order_value_value = rollup_values['revenue'] / (rollup_values['order_count'] or 1)
+                continue
             start, end, company = record._get_kpi_compute_parameters()
             domain = self._prepare_query_domain(domain, 'so.')
             query = f"""select sum(amount_untaxed) from sale_order so
@@ -175,6 +218,9 @@ class Digest(models.Model):
         @return: total number of connector's sale orders ids and action for sale orders of current instance.
         """
         for record in self:
+            if record._use_kpi_rollup_ept():
+                record.kpi_refund_orders_value = record._get_kpi_rollup_values_ept()['refund_count']
+                continue
             start, end, company = record._get_kpi_compute_parameters()
             domain = self._prepare_query_domain(domain, 'am.')
             query = f"""select count(*) from account_move am
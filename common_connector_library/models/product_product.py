@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
 # See LICENSE file for full copyright and licensing details.
-from datetime import datetime
+from datetime import datetime, timedelta
 from odoo.exceptions import UserError
+from odoo.tools.float_utils import float_is_zero, float_round
 from odoo import models, fields, api, _
 
+# Stock moves committed by transactions which started before the previous export are caught by this overlap.
+STOCK_MOVE_WATERMARK_OVERLAP = timedelta(minutes=10)
+
 
 class ProductProduct(models.Model):
     _inherit = "product.product"
@@ -96,6 +100,36 @@ class ProductProduct(models.Model):
 
         return list(set(product_ids))
 
+    def get_products_changed_since_watermark_ept(self, channel, company, from_datetime):
+        """ This method is used to get the products of which stock moves are written since the last stock export of a
+            channel. Kit products are added when their components moved.
+            @param channel: Name of the channel, like shopify.instance.ept,1.
+            @param company: Company
+            @param from_datetime: Date used when the channel has not exported any stock yet.
+            @return: List of product ids and the watermark to store with set_watermark_ept of
+            stock.move.watermark.ept once the stock is exported.
+        """
+        watermark = self.env['stock.move.watermark.ept'].get_watermark_ept(channel, company)
+        from_datetime = watermark - STOCK_MOVE_WATERMARK_OVERLAP if watermark else from_datetime
+        self._cr.execute("""select now() at time zone 'UTC'""")
+        new_watermark = self._cr.fetchone()[0]
+
+        # Draft moves do not change the stock, every other state change like reservation or cancellation does.
+        qry = """select distinct product_id from stock_move
+                 where company_id = %s and write_date >= %s and state != 'draft'"""
+        self._cr.execute(qry, (company.id, from_datetime))
+        product_ids = [result[0] for result in self._cr.fetchall()]
+
+        if product_ids and self.search_installed_module_ept('mrp'):
+            mrp_qry = """select distinct p.id from product_product as p
+                         inner join mrp_bom as mb on mb.product_tmpl_id = p.product_tmpl_id
+                         inner join mrp_bom_line as ml on ml.bom_id = mb.id
+                         where ml.product_id = any(%s)"""
+            self._cr.execute(mrp_qry, (product_ids,))
+            product_ids += [result[0] for result in self._cr.fetchall()]
+
+        return list(set(product_ids)), new_watermark
+
     def search_installed_module_ept(self, module_name):
         """ This method is used to check the module is install or not.
             @param module_name: Name of Module
@@ -122,20 +156,6 @@ class ProductProduct(models.Model):
         result = self._cr.dictfetchall()
         return result
 
-    def prepare_location_and_product_ids(self, warehouse, product_list):
-        """
-        This method prepares location and product ids from warehouse and list of product id.
-        @param warehouse: Record of Warehouse
-        @param product_list: Ids of Product.
-        @return: Ids of locations and products in string.
-        @author: Maulik Barad on Date 21-Oct-2020.
-        Migration done by Haresh Mori on September 2021
-        """
-        locations = self.env['stock.location'].search([('location_id', 'child_of', warehouse.lot_stock_id.ids)])
-        location_ids = ','.join(str(e) for e in locations.ids)
-        product_ids = ','.join(str(e) for e in product_list)
-        return location_ids, product_ids
-
     def check_for_bom_products(self, product_ids):
         """
         This method checks if any product is BoM, then get stock for them.
@@ -146,67 +166,187 @@ class ProductProduct(models.Model):
         """
         bom_product_ids = []
         mrp_module = self.search_installed_module_ept('mrp')
-        if mrp_module:
-            qry = ("""select p.id as product_id from product_product as p
+        if mrp_module and product_ids:
+            qry = """select distinct p.id as product_id from product_product as p
                         inner join mrp_bom as mb on mb.product_tmpl_id=p.product_tmpl_id
-                        and p.id in (%s)""" % product_ids)
-            self._cr.execute(qry)
-            bom_product_ids = self._cr.dictfetchall()
-            bom_product_ids = [product_id.get('product_id') for product_id in bom_product_ids]
+                        where p.id = any(%s)"""
+            self._cr.execute(qry, (list(product_ids),))
+            bom_product_ids = [product_id.get('product_id') for product_id in self._cr.dictfetchall()]
 
         return bom_product_ids
 
-    def prepare_free_qty_query(self, location_ids, simple_product_list_ids):
+    def prepare_stock_qty_query(self):
         """
-        This method prepares query for fetching the free qty.
-        @param location_ids:Ids of Locations.
-        @param simple_product_list_ids: Ids of products which are not BoM.
+        This method prepares the query which fetches the on hand, free and forecasted qty of products for groups of
+        warehouses. The stock locations of a group are the stock locations of its warehouses and their children, a
+        location is counted once even when it is in the tree of two warehouses of the group.
+        The query takes the parameters group_indexes, warehouse_ids and product_ids as arrays.
         @return: Prepared query in string.
-        @author: Maulik Barad on Date 21-Oct-2020.
-        Migration done by Haresh Mori on September 2021
         """
-        query = """select pp.id as product_id,
-                COALESCE(sum(sq.quantity)-sum(sq.reserved_quantity),0) as stock
-                from product_product pp
-                left join stock_quant sq on pp.id = sq.product_id and sq.location_id in (%s)
-                where pp.id in (%s) group by pp.id;""" % (location_ids, simple_product_list_ids)
+        query = """with warehouse_location as (
+                    select distinct warehouse_group.group_index, location.id as location_id
+                    from unnest(%(group_indexes)s::int[], %(warehouse_ids)s::int[])
+                        as warehouse_group(group_index, warehouse_id)
+                    inner join stock_warehouse sw on sw.id = warehouse_group.warehouse_id
+                    inner join stock_location stock_location on stock_location.id = sw.lot_stock_id
+                    inner join stock_location location
+                        on location.parent_path like stock_location.parent_path || '%%'
+                    where location.active),
+                quant as (
+                    select wl.group_index, sq.product_id, sum(sq.quantity) as quantity,
+                        sum(sq.reserved_quantity) as reserved_quantity
+                    from stock_quant sq
+                    inner join warehouse_location wl on wl.location_id = sq.location_id
+                    where sq.product_id = any(%(product_ids)s)
+                    group by wl.group_index, sq.product_id),
+                incoming as (
+                    select wl.group_index, sm.product_id, sum(sm.product_qty) as quantity
+                    from stock_move sm
+                    inner join warehouse_location wl on wl.location_id = sm.location_dest_id
+                    where sm.state = 'assigned' and sm.product_id = any(%(product_ids)s)
+                    group by wl.group_index, sm.product_id)
+                select coalesce(quant.group_index, incoming.group_index) as group_index,
+                    coalesce(quant.product_id, incoming.product_id) as product_id,
+                    coalesce(quant.quantity, 0) as qty_available,
+                    coalesce(quant.quantity, 0) - coalesce(quant.reserved_quantity, 0) as free_qty,
+                    coalesce(quant.quantity, 0) - coalesce(quant.reserved_quantity, 0)
+                        + coalesce(incoming.quantity, 0) as virtual_available
+                from quant
+                full outer join incoming on incoming.group_index = quant.group_index
+                    and incoming.product_id = quant.product_id"""
         return query
 
-    def prepare_onhand_qty_query(self, location_ids, simple_product_list_ids):
+    def get_kit_components_ept(self, product_ids):
         """
-        This method prepares query for fetching the On hand qty.
-        @param location_ids:Ids of Locations.
-        @param simple_product_list_ids: Ids of products which are not BoM.
-        @return: Prepared query in string.
-        @author: Hardik Dhankecha on Date 10-March-2022.
+        This method finds the kit products and explodes their phantom BoMs, nested kits included. The BoMs of all the
+        products of a level are searched at once.
+        @param product_ids: Ids of Product.
+        @return: Dictionary of kit product id and a tuple of its BoM quantity and a list of (component id, component
+        quantity for the BoM quantity) tuples. Only storable components are in the list.
         """
-        query = """select pp.id as product_id,
-                COALESCE(sum(sq.quantity),0) as stock
-                from product_product pp
-                left join stock_quant sq on pp.id = sq.product_id and sq.location_id in (%s)
-                where pp.id in (%s) group by pp.id;""" % (location_ids, simple_product_list_ids)
-        return query
+        if not product_ids or not self.search_installed_module_ept('mrp'):
+            return {}
+        bom_obj = self.env['mrp.bom']
+        kit_boms = {}
+        products = self.browse(product_ids)
+        while products:
+            boms = bom_obj._bom_find(products, bom_type='phantom')
+            for product in products:
+                kit_boms[product.id] = boms[product]
+            found_boms = bom_obj.union(*boms.values()) if boms else bom_obj
+            products = self.browse(list(set(found_boms.bom_line_ids.product_id.ids) - set(kit_boms)))
 
-    def prepare_forecasted_qty_query(self, location_ids, simple_product_list_ids):
+        kit_components = {}
+        for product in self.browse(product_ids):
+            bom = kit_boms.get(product.id)
+            if not bom:
+                continue
+            components = []
+            for bom_line, line_qty in self.explode_kit_bom_ept(product, bom, 1, kit_boms):
+                component = bom_line.product_id
+                if component.type != 'product' or float_is_zero(line_qty,
+                                                                 precision_rounding=bom_line.product_uom_id.rounding):
+                    continue
+                qty_per_kit = bom_line.product_uom_id._compute_quantity(line_qty, component.uom_id, round=False,
+                                                                        raise_if_failure=False)
+                if qty_per_kit:
+                    components.append((component.id, qty_per_kit))
+            kit_components[product.id] = (bom.product_qty, components)
+        return kit_components
+
+    def explode_kit_bom_ept(self, product, bom, quantity, kit_boms):
         """
-        This method prepares query for fetching the forecasted qty.
-        @param location_ids:Ids of Locations.
-        @param simple_product_list_ids: Ids of products which are not BoM.
-        @return: Prepared query in string.
-        @author: Maulik Barad on Date 21-Oct-2020.
-        Migration done by Haresh Mori on September 2021
+        This method explodes a phantom BoM the way mrp.bom explode does, with the BoMs already found.
+        @param product: Record of the product of the BoM.
+        @param bom: Record of the phantom BoM.
+        @param quantity: Quantity of the BoM to explode.
+        @param kit_boms: Dictionary of product id and its phantom BoM.
+        @return: List of (BoM line, quantity in the line UoM) tuples of the components.
         """
-        query = ("""select product_id,sum(stock) as stock from (select pp.id as product_id,
-                COALESCE(sum(sq.quantity)-sum(sq.reserved_quantity),0) as stock
-                from product_product pp
-                left join stock_quant sq on pp.id = sq.product_id and sq.location_id in (%s)
-                where pp.id in (%s) group by pp.id
-                union all
-                select product_id as product_id, sum(product_qty) as stock from stock_move
-                where state in ('assigned') and product_id in (%s) and location_dest_id in (%s)
-                group by product_id) as test group by test.product_id""" % (location_ids, simple_product_list_ids,
-                                                                            simple_product_list_ids, location_ids))
-        return query
+        lines = []
+        for bom_line in bom.bom_line_ids:
+            if bom_line._skip_bom_line(product):
+                continue
+            line_qty = quantity * bom_line.product_qty
+            sub_bom = kit_boms.get(bom_line.product_id.id)
+            if sub_bom:
+                sub_bom_qty = bom_line.product_uom_id._compute_quantity(line_qty / sub_bom.product_qty,
+                                                                        sub_bom.product_uom_id)
+                lines += self.explode_kit_bom_ept(bom_line.product_id, sub_bom, sub_bom_qty, kit_boms)
+            else:
+                lines.append((bom_line, float_round(line_qty, precision_rounding=bom_line.product_uom_id.rounding,
+                                                    rounding_method='UP')))
+        return lines
+
+    def get_kit_stock_qty_ept(self, kit_components, component_stock):
+        """
+        This method computes the quantities of the kits from the quantities of their components, a kit has the
+        quantity of its scarcest component.
+        @param kit_components: Dictionary of kits as returned by get_kit_components_ept.
+        @param component_stock: Dictionary of component id and a dictionary of its quantities.
+        @return: Dictionary of kit product id and a dictionary of its qty_available, free_qty and virtual_available.
+        """
+        kit_stock = {}
+        for kit_id, (bom_qty, components) in kit_components.items():
+            ratios = {"qty_available": [], "free_qty": [], "incoming_qty": []}
+            for component_id, qty_per_kit in components:
+                stock = component_stock[component_id]
+                ratios["qty_available"].append(stock["qty_available"] / qty_per_kit)
+                ratios["free_qty"].append(stock["free_qty"] / qty_per_kit)
+                ratios["incoming_qty"].append((stock["virtual_available"] - stock["free_qty"]) / qty_per_kit)
+            quantities = {field: min(field_ratios) * bom_qty // 1 if field_ratios else 0.0
+                          for field, field_ratios in ratios.items()}
+            kit_stock[kit_id] = {"qty_available": quantities["qty_available"], "free_qty": quantities["free_qty"],
+                                 "virtual_available": quantities["free_qty"] + quantities["incoming_qty"]}
+        return kit_stock
+
+    def get_stock_qty_by_warehouses_ept(self, warehouse_groups, product_list):
+        """ This method is used to get on hand, free to use and forecast quantity of products for several groups of
+            warehouses at once. Stock of the simple products and of the kit components is fetched by one query for
+            all the groups, then the kit quantities are computed from their components.
+            @param warehouse_groups: List of warehouse records, the stock of a group is the sum of its warehouses.
+            @param product_list: List of product ids
+            @return: List of dictionaries in the order of warehouse_groups, with a product and a dictionary of its
+            qty_available, free_qty and virtual_available.
+        """
+        empty_stock = {"qty_available": 0.0, "free_qty": 0.0, "virtual_available": 0.0}
+        product_list = list(set(product_list))
+        if not product_list or not warehouse_groups:
+            return [{product_id: dict(empty_stock) for product_id in product_list} for _ in warehouse_groups]
+
+        kit_components = self.get_kit_components_ept(product_list)
+        stock_product_ids = set(product_list) - set(kit_components)
+        for _bom_qty, components in kit_components.values():
+            stock_product_ids.update(component_id for component_id, _qty_per_kit in components)
+        group_stock = [{product_id: dict(empty_stock) for product_id in stock_product_ids} for _ in warehouse_groups]
+
+        if stock_product_ids:
+            group_indexes = []
+            warehouse_ids = []
+            for group_index, warehouses in enumerate(warehouse_groups):
+                group_indexes += [group_index] * len(warehouses)
+                warehouse_ids += warehouses.ids
+            self._cr.execute(self.prepare_stock_qty_query(), {"group_indexes": group_indexes,
+                                                              "warehouse_ids": warehouse_ids,
+                                                              "product_ids": list(stock_product_ids)})
+            for result in self._cr.dictfetchall():
+                group_stock[result.pop("group_index")][result.pop("product_id")] = result
+
+        result = []
+        for stock in group_stock:
+            stock.update(self.get_kit_stock_qty_ept(kit_components, stock))
+            result.append({product_id: stock[product_id] for product_id in product_list})
+        return result
+
+    def get_stock_qty_ept(self, warehouse, product_list, stock_field):
+        """ This method is used to get one kind of quantity based on warehouse and products.
+            @param warehouse: Records of warehouse
+            @param product_list: List of product ids
+            @param stock_field: qty_available, free_qty or virtual_available.
+            @return: Dictionary with a product and its quantity.
+        """
+        stock = self.get_stock_qty_by_warehouses_ept([warehouse], product_list)[0]
+        return {product_id: quantities[stock_field] for product_id, quantities in stock.items()}
 
     def get_free_qty_ept(self, warehouse, product_list):
         """ This method is used to get free to use quantity based on warehouse and products.
@@ -216,25 +356,7 @@ class ProductProduct(models.Model):
             @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 21 September 2021 .
             Task_id: 178058
         """
-        qty_on_hand = {}
-        location_ids, product_ids = self.prepare_location_and_product_ids(warehouse, product_list)
-
-        bom_product_ids = self.check_for_bom_products(product_ids)
-        if bom_product_ids:
-            bom_products = self.with_context(warehouse=warehouse.ids).browse(bom_product_ids)
-            for product in bom_products:
-                actual_stock = getattr(product, 'free_qty')
-                qty_on_hand.update({product.id: actual_stock})
-
-        simple_product_list = list(set(product_list) - set(bom_product_ids))
-        simple_product_list_ids = ','.join(str(e) for e in simple_product_list)
-        if simple_product_list_ids:
-            qry = self.prepare_free_qty_query(location_ids, simple_product_list_ids)
-            self._cr.execute(qry)
-            result = self._cr.dictfetchall()
-            for i in result:
-                qty_on_hand.update({i.get('product_id'): i.get('stock')})
-        return qty_on_hand
+        return self.get_stock_qty_ept(warehouse, product_list, "free_qty")
 
     def get_forecasted_qty_ept(self, warehouse, product_list):
         """ This method is used to get forecast quantity based on warehouse and products.
@@ -244,25 +366,7 @@ class ProductProduct(models.Model):
             @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 21 September 2021 .
             Task_id: 178058
         """
-        forcasted_qty = {}
-        location_ids, product_ids = self.prepare_location_and_product_ids(warehouse, product_list)
-
-        bom_product_ids = self.check_for_bom_products(product_ids)
-        if bom_product_ids:
-            bom_products = self.with_context(warehouse=warehouse.ids).browse(bom_product_ids)
-            for product in bom_products:
-                actual_stock = getattr(product, 'free_qty') + getattr(product, 'incoming_qty')
-                forcasted_qty.update({product.id: actual_stock})
-
-        simple_product_list = list(set(product_list) - set(bom_product_ids))
-        simple_product_list_ids = ','.join(str(e) for e in simple_product_list)
-        if simple_product_list_ids:
-            qry = self.prepare_forecasted_qty_query(location_ids, simple_product_list_ids)
-            self._cr.execute(qry)
-            result = self._cr.dictfetchall()
-            for i in result:
-                forcasted_qty.update({i.get('product_id'): i.get('stock')})
-        return forcasted_qty
+        return self.get_stock_qty_ept(warehouse, product_list, "virtual_available")
 
     def get_onhand_qty_ept(self, warehouse, product_list):
         """
@@ -272,22 +376,4 @@ class ProductProduct(models.Model):
         :param product_list:list of product_ids (Not browsable records)
         :return: On hand Quantity
         """
-        forcasted_qty = {}
-        location_ids, product_ids = self.prepare_location_and_product_ids(warehouse, product_list)
-
-        bom_product_ids = self.check_for_bom_products(product_ids)
-        if bom_product_ids:
-            bom_products = self.with_context(warehouse=warehouse.ids).browse(bom_product_ids)
-            for product in bom_products:
-                actual_stock = getattr(product, 'qty_available')
-                forcasted_qty.update({product.id:actual_stock})
-
-        simple_product_list = list(set(product_list) - set(bom_product_ids))
-        simple_product_list_ids = ','.join(str(e) for e in simple_product_list)
-        if simple_product_list_ids:
-            qry = self.prepare_onhand_qty_query(location_ids, simple_product_list_ids)
-            self._cr.execute(qry)
-            result = self._cr.dictfetchall()
-            for i in result:
-                forcasted_qty.update({i.get('product_id'):i.get('stock')})
-        return forcasted_qty
+        return self.get_stock_qty_ept(warehouse, product_list, "qty_available")
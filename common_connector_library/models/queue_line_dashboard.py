@@ -1,6 +1,11 @@
 # -*- coding: utf-8 -*-
 # See LICENSE file for full copyright and licensing details.
-from odoo import models
+from datetime import datetime, time, timedelta
+
+from odoo import models, fields
+
+DASHBOARD_DURATIONS = ['all', 'today', 'yesterday']
+DASHBOARD_STATES = ['draft', 'done', 'failed', 'cancel']
 
 
 class QueueLineDashboard(models.AbstractModel):
@@ -13,36 +18,62 @@ class QueueLineDashboard(models.AbstractModel):
     def get_data(self, **kwargs):
         """
         This method is use to prepare data for the queue line dashboard.
+        The counts of all the tiles are computed by one grouped query, the tiles only carry the domain of their
+        queue lines, which are searched by the list view when the tile is clicked.
         @param table: Table name of queue line like order_data_queue_line_ept
         @return dashboard_data: It will return the list of data like
-        [{'state': {'duration': [len of record, [queue_line_ids]]}},]
+        [{'state': {'duration': [count of records, domain of queue lines]}},]
         """
         table = kwargs.get('table', '').replace('.', '_')
+        counts = dict()
+        qry, params = self._prepare_query(table)
+        self._cr.execute(qry, params)
+        for state, duration, count in self._cr.fetchall():
+            counts[(duration, state)] = count
         data = dict()
-        for duration in ['all', 'today', 'yesterday']:
-            count, all_ids = 0, list()
-            for state in ['draft', 'done', 'failed', 'cancel']:
-                key = f"{duration}_{state}"
-                line_ids = self._prepare_query(duration, state, table)
-                count += len(line_ids)
-                all_ids += line_ids
-                data.update({key: [len(line_ids), line_ids]})
-            data.update({duration: [count, all_ids]})
+        for duration in DASHBOARD_DURATIONS:
+            total = 0
+            for state in DASHBOARD_STATES:
+                if duration == 'all':
+                    count = sum(counts.get((line_duration, state), 0) for line_duration in [None, 'today', 'yesterday'])
+                else:
+                    count = counts.get((duration, state), 0)
+                total += count
+                data.update({f"{duration}_{state}": [count, self._prepare_domain(duration, state, table)]})
+            data.update({duration: [total, self._prepare_domain(duration, DASHBOARD_STATES, table)]})
         data.update({'model': kwargs.get('table')})
         return data
 
-    def _prepare_query(self, duration, state, table):
+    def _prepare_query(self, table):
+        """
+        Prepare the query counting the queue lines by state and by creation day.
+        @return: Tuple of the query and its parameters.
+        """
         qry = f"""
-        SELECT 
-            id 
-            FROM {table} 
-            WHERE 
-                state = '{state}'
+        SELECT
+            state,
+            CASE WHEN create_date >= CURRENT_DATE THEN 'today'
+                WHEN create_date >= CURRENT_DATE - INTERVAL '1' DAY THEN 'yesterday'
+            END AS duration,
+            count(*)
+            FROM {table}
+            WHERE
+                state IN %s
+            GROUP BY 1, 2
+        """
+        return qry, (tuple(DASHBOARD_STATES),)
+
+    def _prepare_domain(self, duration, state, table):
+        """
+        Prepare the domain of the queue lines shown when a tile of the dashboard is clicked.
+        @param state: State or list of states of the queue lines.
+        @return: Domain.
         """
+        domain = [('state', 'in' if isinstance(state, list) else '=', state)]
+        today = datetime.combine(fields.Date.today(), time.min)
         if duration == 'today':
-            qry += " AND create_date >= CURRENT_DATE"
+            domain.append(('create_date', '>=', fields.Datetime.to_string(today)))
         elif duration == 'yesterday':
-            qry += " AND create_date BETWEEN CURRENT_DATE - INTERVAL '1' DAY AND CURRENT_DATE"
-        self._cr.execute(qry)
-        line_ids = self._cr.dictfetchall()
-        return [line_id.get('id') for line_id in line_ids]
+            domain += [('create_date', '>=', fields.Datetime.to_string(today - timedelta(days=1))),
+                       ('create_date', '<', fields.Datetime.to_string(today))]
+        return domain
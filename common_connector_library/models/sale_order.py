@@ -173,14 +173,141 @@ class SaleOrder(models.Model):
             if work_flow_process_record.validate_order:
                 order.validate_order_ept()
 
-            order_lines = order.mapped('order_line').filtered(lambda l: l.product_id.invoice_policy == 'order')
-            if not order_lines.filtered(lambda l: l.product_id.type == 'product') and len(
-                order.order_line) != len(order_lines.filtered(lambda l: l.product_id.type in ['service', 'consu'])):
+            if not order.check_invoice_policy_ept():
                 continue
 
             order.validate_and_paid_invoices_ept(work_flow_process_record)
         return True
 
+    def process_orders_and_invoices_in_batch_ept(self, batch_size=100):
+        """
+        This method does the same as process_orders_and_invoices_ept for many orders. The orders of a workflow are
+        confirmed, invoiced, posted and paid together by batches. When a batch fails, its orders are processed one by
+        one, so only the failing orders stay unprocessed.
+        :param batch_size: Number of orders processed together.
+        """
+        orders = self.filtered(lambda order: order.invoice_status != 'invoiced')
+        log_book = self.env['common.log.book.ept'].browse(self._context.get('log_book_id'))
+        for work_flow_process_record in orders.auto_workflow_process_id:
+            workflow_orders = orders.filtered(lambda order: order.auto_workflow_process_id == work_flow_process_record)
+            for start in range(0, len(workflow_orders), batch_size):
+                batch_orders = workflow_orders[start:start + batch_size]
+                try:
+                    with self.env.cr.savepoint():
+                        batch_orders.process_workflow_batch_ept(work_flow_process_record)
+                except Exception as error:
+                    message = "Auto workflow %s failed for the orders %s, they are processed one by one. Error: %s" \
+                              % (work_flow_process_record.name, ", ".join(batch_orders.mapped('name')), error)
+                    _logger.exception(message)
+                    log_book = self.log_workflow_failure_ept(message, log_book)
+                    batch_orders.with_context(log_book_id=log_book.id).process_orders_one_by_one_ept()
+        return True
+
+    def process_orders_one_by_one_ept(self):
+        """
+        This method processes the auto workflow of every order in its own savepoint.
+        """
+        log_book = self.env['common.log.book.ept'].browse(self._context.get('log_book_id'))
+        for order in self:
+            try:
+                with self.env.cr.savepoint():
+                    order.process_orders_and_invoices_ept()
+            except Exception as error:
+                message = "Auto workflow failed for order %s. Error: %s" % (order.name, error)
+                _logger.exception(message)
+                log_book = order.log_workflow_failure_ept(message, log_book, order.name)
+        return True
+
+    def log_workflow_failure_ept(self, message, log_book, order_ref=False):
+        """
+        This method logs a failure of the auto workflow in the log book, which is created when there is none.
+        :param message: Message of the failure.
+        :param log_book: common.log.book.ept(), can be empty.
+        :param order_ref: Name of the failed order.
+        :return: Record of the log book.
+        """
+        if not log_book:
+            log_book = log_book.create_common_log_book_ept(type='import', model_name='sale.order')
+        self.env['common.log.lines.ept'].create({'message': message,
+                                                 'order_ref': order_ref,
+                                                 'log_book_id': log_book.id})
+        return log_book
+
+    def process_workflow_batch_ept(self, work_flow_process_record):
+        """
+        This method confirms the orders of one workflow as a recordset, creates their invoices with one call, posts
+        them together and registers their payments.
+        :param work_flow_process_record: Auto workflow of the orders.
+        """
+        if work_flow_process_record.validate_order:
+            draft_orders = self.filtered(lambda order: order.state in ('draft', 'sent'))
+            if draft_orders:
+                # Odoo changes date_order to the current date while confirming, it is written back per date.
+                orders_by_date = {}
+                for order in draft_orders:
+                    orders_by_date.setdefault(order.date_order, self.browse())
+                    orders_by_date[order.date_order] |= order
+                self.env['product.product'].invalidate_cache(fnames=['display_name'])
+                draft_orders.action_confirm()
+                for date_order, orders in orders_by_date.items():
+                    orders.write({'date_order': date_order})
+
+        if not work_flow_process_record.create_invoice:
+            return True
+        orders = self.filtered(lambda order: order.check_invoice_policy_ept() and
+                               not order.check_fiscal_lock_date_ept(work_flow_process_record))
+        if not orders:
+            return True
+        invoices = orders._create_invoices(grouped=True)
+        invoices.action_post()
+
+        if work_flow_process_record.register_payment:
+            payment_data = []
+            for order in orders:
+                order_invoices = invoices.filtered(lambda invoice: order in invoice.line_ids.sale_line_ids.order_id)
+                payment_data += order.prepare_invoice_payments_ept(order_invoices)
+            self.create_and_reconcile_payments_ept(payment_data)
+        return True
+
+    def check_invoice_policy_ept(self):
+        """
+        This method checks that the order has lines to invoice at the order time.
+        :return: True if the invoice can be created by the auto workflow.
+        """
+        self.ensure_one()
+        order_lines = self.mapped('order_line').filtered(lambda l: l.product_id.invoice_policy == 'order')
+        if not order_lines.filtered(lambda l: l.product_id.type == 'product') and len(
+                self.order_line) != len(order_lines.filtered(lambda l: l.product_id.type in ['service', 'consu'])):
+            return False
+        return True
+
+    def check_fiscal_lock_date_ept(self, work_flow_process_record):
+        """
+        This method checks the lock date when the invoice takes the order date and logs it in the log book passed
+        in the context.
+        :param work_flow_process_record: Auto workflow of the order.
+        :return: True if the invoice can not be created because of the lock date.
+        """
+        self.ensure_one()
+        if not work_flow_process_record.invoice_date_is_order_date:
+            return False
+        fiscalyear_lock_date = self.company_id._get_user_fiscal_lock_date()
+        if self.date_order.date() > fiscalyear_lock_date:
+            return False
+        log_book_id = self._context.get('log_book_id')
+        if log_book_id:
+            message = "You cannot create invoice for order (%s) " \
+                      "prior to and inclusive of the lock date %s. " \
+                      "So, order is created but invoice is not created." % (self.name, format_date(
+                self.env, fiscalyear_lock_date))
+            self.env['common.log.lines.ept'].create({
+                'message': message,
+                'order_ref': self.name,
+                'log_book_id': log_book_id
+            })
+            _logger.info(message)
+        return True
+
     def validate_and_paid_invoices_ept(self, work_flow_process_record):
         """
         This method will create invoices, validate it and register payment it, according to the configuration in
@@ -191,25 +318,8 @@ class SaleOrder(models.Model):
         """
         self.ensure_one()
         if work_flow_process_record.create_invoice:
-            if work_flow_process_record.invoice_date_is_order_date:
-                fiscalyear_lock_date = self.company_id._get_user_fiscal_lock_date()
-                if self.date_order.date() <= fiscalyear_lock_date:
-                    log_book_id = self._context.get('log_book_id')
-                    if log_book_id:
-                        message = "You cannot create invoice for order (%s) " \
-                                  "prior to and inclusive of the lock date %s. " \
-                                  "So, order is created but invoice is not created." % (self.name, format_date(
-                            self.env, fiscalyear_lock_date))
-                        self.env['common.log.lines.ept'].create({
-                            'message': message,
-                            'order_ref': self.name,
-                            'log_book_id': log_book_id
-                        })
-                        _logger.info(message)
-                    return True
-            ctx = self._context.copy()
-            if work_flow_process_record.sale_journal_id:
-                ctx.update({'journal_ept': work_flow_process_record.sale_journal_id})
+            if self.check_fiscal_lock_date_ept(work_flow_process_record):
+                return True
             invoices = self._create_invoices()
             self.validate_invoice_ept(invoices)
             if work_flow_process_record.register_payment:
@@ -234,13 +344,32 @@ class SaleOrder(models.Model):
         Migration done by Haresh Mori on September 2021
         """
         self.ensure_one()
-        account_payment_obj = self.env['account.payment']
+        return self.create_and_reconcile_payments_ept(self.prepare_invoice_payments_ept(invoices))
+
+    def prepare_invoice_payments_ept(self, invoices):
+        """
+        This method prepares the payments of the invoices of the order based on auto workflow method.
+        @param invoices: Recordset of Invoice.
+        @return: List of (payment vals, invoice) tuples.
+        """
+        self.ensure_one()
+        payment_data = []
         for invoice in invoices:
             if invoice.amount_residual:
-                vals = invoice.prepare_payment_dict(self.auto_workflow_process_id)
-                payment_id = account_payment_obj.create(vals)
-                payment_id.action_post()
-                self.reconcile_payment_ept(payment_id, invoice)
+                payment_data.append((invoice.prepare_payment_dict(self.auto_workflow_process_id), invoice))
+        return payment_data
+
+    def create_and_reconcile_payments_ept(self, payment_data):
+        """
+        This method creates and posts the payments together, then reconciles every payment with its invoice.
+        @param payment_data: List of (payment vals, invoice) tuples.
+        """
+        if not payment_data:
+            return True
+        payments = self.env['account.payment'].create([vals for vals, _invoice in payment_data])
+        payments.action_post()
+        for payment, (_vals, invoice) in zip(payments, payment_data):
+            self.reconcile_payment_ept(payment, invoice)
         return True
 
     def reconcile_payment_ept(self, payment_id, invoice):
@@ -263,25 +392,39 @@ class SaleOrder(models.Model):
 
     def auto_shipped_order_ept(self, customers_location, is_mrp_installed=False):
         """
-        This method is used to create a stock move of shipped orders.
+        This method is used to create a stock move of shipped orders. The moves of all the orders are created
+        together and done by a few recordset operations.
         :param customers_location: It is customer location object.
         :param is_mrp_installed: It is a boolean for mrp installed or not.
         Migration done by Haresh Mori on September 2021
         """
-        order_lines = self.order_line.filtered(lambda l: l.product_id.type != 'service')
-        vendor_location = self.env['stock.location'].search(['|', ('company_id', '=', self.company_id.id),
-                                                             ('company_id', '=', False), ('usage', '=', 'supplier')],
-                                                            limit=1)
-        for order_line in order_lines:
-            bom_lines = []
-            if is_mrp_installed:
-                bom_lines = self.check_for_bom_product(order_line.product_id)
-            for bom_line in bom_lines:
-                self.create_and_done_stock_move_ept(order_line, customers_location, bom_line=bom_line)
-            if not bom_lines and order_line.product_id.is_drop_ship_product:
-                self.create_and_done_stock_move_ept(order_line, customers_location, vendor_location=vendor_location)
-            elif not bom_lines or not is_mrp_installed:
-                self.create_and_done_stock_move_ept(order_line, customers_location)
+        vendor_locations = {}
+        bom_lines_by_product = {}
+        move_data = []
+        for order in self:
+            company = order.company_id
+            if company not in vendor_locations:
+                vendor_locations[company] = self.env['stock.location'].search(
+                    ['|', ('company_id', '=', company.id), ('company_id', '=', False), ('usage', '=', 'supplier')],
+                    limit=1)
+            vendor_location = vendor_locations[company]
+            order_lines = order.order_line.filtered(lambda l: l.product_id.type != 'service')
+            for order_line in order_lines:
+                bom_lines = []
+                if is_mrp_installed:
+                    if (order_line.product_id, company) not in bom_lines_by_product:
+                        bom_lines_by_product[(order_line.product_id, company)] = order.check_for_bom_product(
+                            order_line.product_id)
+                    bom_lines = bom_lines_by_product[(order_line.product_id, company)]
+                for bom_line in bom_lines:
+                    move_data += order.prepare_shipped_order_move_ept(order_line, customers_location,
+                                                                      bom_line=bom_line)
+                if not bom_lines and order_line.product_id.is_drop_ship_product:
+                    move_data += order.prepare_shipped_order_move_ept(order_line, customers_location,
+                                                                      vendor_location=vendor_location)
+                elif not bom_lines or not is_mrp_installed:
+                    move_data += order.prepare_shipped_order_move_ept(order_line, customers_location)
+        self.done_shipped_order_moves_ept(move_data)
         return True
 
     def check_for_bom_product(self, product):
@@ -314,6 +457,17 @@ class SaleOrder(models.Model):
         @param order_line: Record of sale order line.
         Migration done by Haresh Mori on September 2021
         """
+        move_data = self.prepare_shipped_order_move_ept(order_line, customers_location, bom_line, vendor_location)
+        self.done_shipped_order_moves_ept(move_data)
+        return True
+
+    def prepare_shipped_order_move_ept(self, order_line, customers_location, bom_line=False, vendor_location=False):
+        """
+        This method prepares the stock move of an order line of a shipped order.
+        @param customers_location: Customer type location.
+        @param order_line: Record of sale order line.
+        @return: List with a (stock move vals, done quantity) tuple, empty when there is nothing to move.
+        """
         if bom_line:
             product = bom_line[0].product_id
             product_qty = bom_line[1].get('qty', 0) * order_line.product_uom_qty
@@ -326,10 +480,21 @@ class SaleOrder(models.Model):
         if product and product_qty and product_uom:
             vals = self.prepare_val_for_stock_move_ept(product, product_qty, product_uom, vendor_location,
                                                        customers_location, order_line, bom_line)
-            stock_move = self.env['stock.move'].create(vals)
-            stock_move._action_assign()
+            return [(vals, product_qty)]
+        return []
+
+    def done_shipped_order_moves_ept(self, move_data):
+        """
+        This method creates the stock moves together, then assigns and dones them as a recordset.
+        @param move_data: List of (stock move vals, done quantity) tuples.
+        """
+        if not move_data:
+            return True
+        stock_moves = self.env['stock.move'].create([vals for vals, _product_qty in move_data])
+        stock_moves._action_assign()
+        for stock_move, (_vals, product_qty) in zip(stock_moves, move_data):
             stock_move._set_quantity_done(product_qty)
-            stock_move._action_done()
+        stock_moves._action_done()
         return True
 
     def prepare_val_for_stock_move_ept(self, product, product_qty, product_uom, vendor_location, customers_location,
@@ -85,7 +85,7 @@ class SaleWorkflowProcess(models.Model):
         else:
             orders = sale_order_obj.search([('auto_workflow_process_id', 'in', work_flow_process_records.ids),
                                             ('id', 'in', order_ids)])
-        orders.process_orders_and_invoices_ept()
+        orders.process_orders_and_invoices_in_batch_ept()
 
         return True
 
@@ -104,9 +104,8 @@ class SaleWorkflowProcess(models.Model):
 
         shipped_orders = orders.filtered(lambda x: x.order_line)
 
-        for order in shipped_orders:
-            order.state = 'sale'
-            order.auto_shipped_order_ept(customer_location, mrp_module)
+        shipped_orders.write({'state': 'sale'})
+        shipped_orders.auto_shipped_order_ept(customer_location, mrp_module)
 
         shipped_orders.validate_and_paid_invoices_ept(self)
         return True
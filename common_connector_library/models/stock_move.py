@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for full copyright and licensing details.
+from odoo import models, tools
+
+
+class StockMove(models.Model):
+    _inherit = "stock.move"
+
+    def init(self):
+        """ Indexes used to find the products moved since the last stock export of a channel. """
+        super(StockMove, self).init()
+        tools.create_index(self._cr, "stock_move_company_write_date_ept_index", self._table,
+                           ["company_id", "write_date"])
+        tools.create_index(self._cr, "stock_move_company_date_state_ept_index", self._table,
+                           ["company_id", "date", "state"])
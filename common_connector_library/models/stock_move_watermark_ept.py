@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for full copyright and licensing details.
+from odoo import models, fields
+
+
+class StockMoveWatermarkEpt(models.Model):
+    _name = "stock.move.watermark.ept"
+    _description = "Change Watermark"
+
+    name = fields.Char(required=True, help="Channel which processes the changed records, like shopify.instance.ept,1 "
+                                           "for a stock export or connector.kpi.rollup.ept,1 for the KPI rollup.")
+    company_id = fields.Many2one("res.company", required=True, ondelete="cascade")
+    last_write_date = fields.Datetime(help="Records written after this time are not processed by the channel yet.")
+
+    _sql_constraints = [("channel_company_unique", "unique(name, company_id)",
+                         "Change watermark must be unique per channel and company.")]
+
+    def get_watermark_ept(self, channel, company):
+        """ This method is used to get the time from which the changed records, like the stock moves of a stock
+            export, are not processed by a channel.
+            @param channel: Name of the channel.
+            @param company: Record of company.
+            @return: Datetime or False when the channel has not processed any change yet.
+        """
+        watermark = self.search([("name", "=", channel), ("company_id", "=", company.id)], limit=1)
+        return watermark.last_write_date
+
+    def set_watermark_ept(self, channel, company, last_write_date):
+        """ This method is used to store the time until which the changed records are processed by a channel.
+            @param channel: Name of the channel.
+            @param company: Record of company.
+            @param last_write_date: Datetime until which the changes are processed.
+        """
+        watermark = self.search([("name", "=", channel), ("company_id", "=", company.id)], limit=1)
+        if watermark:
+            watermark.write({"last_write_date": last_write_date})
+        else:
+            self.create({"name": channel, "company_id": company.id, "last_write_date": last_write_date})
+        return True
@@ -56,7 +56,7 @@ var QueueLineListDashboardRenderer = ListRenderer.extend({
         this.do_action({
             name: $action.attr('title'),
             res_model: dashboardValues['model'],
-            domain: [['id', 'in', dashboardValues[context['action']][1]]],
+            domain: dashboardValues[context['action']][1],
             context: context,
             views: [[false, 'list'], [false, 'form']],
             type: 'ir.actions.act_window',
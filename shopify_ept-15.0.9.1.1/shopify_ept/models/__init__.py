@@ -37,5 +37,7 @@ from . import data_queue_mixin_ept
 from . import order_payment_ept
 from . import queue_line_dashboard
 from . import digest
+from . import connector_kpi_rollup_ept
 from . import export_stock_queue_ept
 from . import export_stock_queue_line_ept
+from . import shopify_exported_stock_ept
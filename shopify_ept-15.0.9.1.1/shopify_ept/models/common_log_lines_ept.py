@@ -30,7 +30,7 @@ class CommonLogLineEpt(models.Model):
             'shopify_product_data_queue_line_id': queue_line_id.id if queue_line_id else False,
             "default_code": sku
         })
-        log_line = self.create(vals)
+        log_line = self.create_or_buffer_log_line_ept(vals)
         return log_line
 
     def shopify_create_order_log_line(self, message, model_id, queue_line_id, log_book_id, order_ref=""):
@@ -39,19 +39,14 @@ class CommonLogLineEpt(models.Model):
             @return: log_line
             @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 11/11/2019.
         """
-        if order_ref:
-            domain = [("message", "=", message), ("model_id", "=", model_id), ("order_ref", "=", order_ref)]
-            log_line = self.search(domain)
-            if log_line:
-                log_line.update({"write_date": datetime.now(), "log_book_id": log_book_id.id if log_book_id else False,
-                                 "shopify_order_data_queue_line_id": queue_line_id and queue_line_id.id or False})
-                return log_line
-
         vals = self.shopify_prepare_log_line_vals(message, model_id, queue_line_id, log_book_id)
 
         vals.update({'shopify_order_data_queue_line_id': queue_line_id and queue_line_id.id or False,
                      "order_ref": order_ref})
-        log_line = self.create(vals)
+        unique_fields = ["message", "model_id", "order_ref"] if order_ref else None
+        log_line = self.create_or_buffer_log_line_ept(vals, unique_fields=unique_fields,
+                                                      update_fields=["log_book_id",
+                                                                     "shopify_order_data_queue_line_id"])
         return log_line
 
     def shopify_create_customer_log_line(self, message, model_id, queue_line_id, log_book_id):
@@ -61,7 +56,7 @@ class CommonLogLineEpt(models.Model):
         vals.update({
             'shopify_customer_data_queue_line_id': queue_line_id and queue_line_id.id or False,
         })
-        log_line = self.create(vals)
+        log_line = self.create_or_buffer_log_line_ept(vals)
         return log_line
 
     def shopify_prepare_log_line_vals(self, message, model_id, res_id, log_book_id):
@@ -123,5 +118,5 @@ class CommonLogLineEpt(models.Model):
         vals.update({
             'shopify_export_stock_queue_line_id': queue_line_id.id if queue_line_id else False
         })
-        log_line = self.create(vals)
+        log_line = self.create_or_buffer_log_line_ept(vals)
         return log_line
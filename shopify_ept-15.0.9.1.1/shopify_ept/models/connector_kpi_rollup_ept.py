@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for full copyright and licensing details.
+from odoo import models
+
+
+class ConnectorKpiRollupEpt(models.Model):
+    _inherit = "connector.kpi.rollup.ept"
+
+    def _get_kpi_rollup_sources_ept(self):
+        """ Add the Shopify orders in the daily KPIs, a delivery is shipped once updated in Shopify. """
+        sources = super(ConnectorKpiRollupEpt, self)._get_kpi_rollup_sources_ept()
+        sources.append({"instance_model": "shopify.instance.ept",
+                        "order_field": "shopify_instance_id",
+                        "refund_field": "shopify_instance_id",
+                        "segment": "''",
+                        "shipped_condition": "sp.updated_in_shopify = True"})
+        return sources
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 # See LICENSE file for full copyright and licensing details.
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
 
 
 class ShopifyCustomerDataQueueEpt(models.Model):
@@ -31,6 +31,11 @@ class ShopifyCustomerDataQueueEpt(models.Model):
     is_action_require = fields.Boolean(default=False)
     queue_process_count = fields.Integer(help="It is used for know, how many time queue is processed.")
 
+    def init(self):
+        """ Index used to purge the old records, see data.queue.mixin.ept. """
+        super(ShopifyCustomerDataQueueEpt, self).init()
+        tools.create_index(self._cr, "%s_create_date_index" % self._table, self._table, ["create_date"])
+
     @api.depends("synced_customer_queue_line_ids.state")
     def _compute_total_record_count(self):
         """
@@ -39,6 +39,14 @@ class Digest(models.Model):
             self.get_pending_shipment_on_date_count(domain)
         return True
 
+    def _get_kpi_rollup_instance_ept(self):
+        """
+        Read the order KPIs of the Shopify digest from the daily KPIs of its instance.
+        """
+        if self.shopify_instance_id:
+            return self.shopify_instance_id._name, self.shopify_instance_id.id
+        return super(Digest, self)._get_kpi_rollup_instance_ept()
+
     def _prepare_domain_based_on_connector(self):
         if self.shopify_instance_id:
             self._prepare_domain_shopify_digest()
@@ -1,6 +1,7 @@
 import logging
 import pytz
-from odoo import models, fields, api, _
+from odoo import models, fields, api, _, tools
+from .shopify_product_ept import SHOPIFY_INVENTORY_BULK_SIZE
 
 utc = pytz.utc
 
@@ -42,6 +43,11 @@ class ShopifyExportStockQueueEpt(models.Model):
     queue_process_count = fields.Integer(string="Queue Process Times",
                                          help="it is used know queue how many time processed")
 
+    def init(self):
+        """ Index used to purge the old records, see data.queue.mixin.ept. """
+        super(ShopifyExportStockQueueEpt, self).init()
+        tools.create_index(self._cr, "%s_create_date_index" % self._table, self._table, ["create_date"])
+
     @api.depends("export_stock_queue_line_ids.state")
     def _compute_queue_line_record(self):
         """This is used for count of total record of export_stock queue line base on it's state and
@@ -94,9 +100,12 @@ class ShopifyExportStockQueueEpt(models.Model):
         @author: Nilam Kubavat @Emipro Technologies Pvt.Ltd on date 31-Aug-2022.
         Task Id : 199065
         """
-        count = 50
+        # One bulk export queue is sent with a single inventorySetQuantities mutation.
+        queue_size = SHOPIFY_INVENTORY_BULK_SIZE if instance.is_shopify_bulk_export_stock else 50
+        count = queue_size
+        export_stock_queue = self.browse()
         for data in exprot_stock_data:
-            if count == 50:
+            if count == queue_size:
                 count = 0
                 export_stock_queue = self.shopify_create_export_stock_queue(instance)
                 message = "Export Stock Queue Created", export_stock_queue.name
@@ -106,6 +106,7 @@ class ShopifyOrderDataQueueLineEpt(models.Model):
         """
         common_log_book_obj = self.env["common.log.book.ept"]
         common_log_line_obj = self.env['common.log.lines.ept']
+        exported_stock_obj = self.env['shopify.exported.stock.ept']
         model_id = common_log_book_obj.log_lines.get_model_id("shopify.export.stock.queue.ept")
         queue_id = self.export_stock_queue_id if len(self.export_stock_queue_id) == 1 else False
         if queue_id:
@@ -119,6 +120,11 @@ class ShopifyOrderDataQueueLineEpt(models.Model):
             self.env.cr.execute(
                 """update shopify_product_data_queue_ept set is_process_queue = False where is_process_queue = True""")
             self._cr.commit()
+            if instance.is_shopify_bulk_export_stock:
+                self.process_export_stock_queue_data_in_bulk(instance, queue_id, model_id, log_book_id)
+                if not log_book_id.log_lines:
+                    log_book_id.unlink()
+                return True
             for queue_line in self:
                 log_line = False
                 shopify_product = queue_line.shopify_product_id
@@ -127,14 +133,7 @@ class ShopifyOrderDataQueueLineEpt(models.Model):
                     shopify.InventoryLevel.set(queue_line.location_id, queue_line.inventory_item_id,
                                                queue_line.quantity)
                 except ClientError as error:
-                    if hasattr(error,
-                               "response") and error.response.code == 429 and error.response.msg == "Too Many Requests":
-                        time.sleep(int(float(error.response.headers.get('Retry-After', 5))))
-                        shopify.InventoryLevel.set(queue_line.shopify_location_id,
-                                                   queue_line.inventory_item_id,
-                                                   queue_line.quantity)
-                        continue
-                    elif error.response.code == 422 and error.response.msg == "Unprocessable Entity":
+                    if error.response.code == 422 and error.response.msg == "Unprocessable Entity":
                         if json.loads(error.response.body.decode()).get("errors")[
                             0] == 'Inventory item does not have inventory tracking enabled':
                             queue_line.shopify_product_id.write({'inventory_management': "Dont track Inventory"})
@@ -168,9 +167,51 @@ class ShopifyOrderDataQueueLineEpt(models.Model):
                 if not log_line:
                     queue_id.is_process_queue = True
                     queue_line.write({"state": "done"})
+                    exported_stock_obj.set_exported_stock(instance, [
+                        (shopify_product.id, queue_line.location_id, queue_line.quantity)])
                 else:
                     queue_line.write({"state": "failed"})
                 self._cr.commit()
             if not log_book_id.log_lines:
                 log_book_id.unlink()
         return True
+
+    def process_export_stock_queue_data_in_bulk(self, instance, queue_id, model_id, log_book_id):
+        """
+        This method is used to export the stock of queue lines with one GraphQL inventorySetQuantities
+        mutation and map the rejected quantities back to the queue lines and log lines.
+        """
+        common_log_line_obj = self.env['common.log.lines.ept']
+        shopify_product_obj = self.env['shopify.product.product.ept']
+        queue_lines = list(self)
+        stock_data = [{"inventory_item_id": queue_line.inventory_item_id,
+                       "location_id": queue_line.location_id,
+                       "quantity": queue_line.quantity} for queue_line in queue_lines]
+        errors = shopify_product_obj.shopify_set_inventory_quantities_in_bulk(instance, stock_data)
+
+        done_lines = failed_lines = cancel_lines = self.browse()
+        for index, queue_line in enumerate(queue_lines):
+            error = errors.get(index)
+            if not error:
+                done_lines |= queue_line
+            elif shopify_product_obj.is_shopify_untracked_inventory_error(error):
+                queue_line.shopify_product_id.write({'inventory_management': "Dont track Inventory"})
+                cancel_lines |= queue_line
+            else:
+                message = "Error while Export stock for Product : '%s' for instance:" \
+                          "'%s'\nError: %s" % (queue_line.shopify_product_id.product_id.display_name, instance.name,
+                                               error.get("message"))
+                common_log_line_obj.shopify_create_export_stock_log_line(message, model_id, queue_line, log_book_id)
+                failed_lines |= queue_line
+
+        if not self._context.get('is_process_from_selected_product'):
+            self.shopify_product_id.write({'last_stock_update_date': datetime.now()})
+        if done_lines:
+            queue_id.is_process_queue = True
+            done_lines.write({"state": "done"})
+            self.env['shopify.exported.stock.ept'].set_exported_stock(instance, [
+                (line.shopify_product_id.id, line.location_id, line.quantity) for line in done_lines])
+        failed_lines.write({"state": "failed"})
+        cancel_lines.write({"state": "cancel"})
+        self._cr.commit()
+        return True
@@ -3,6 +3,7 @@
 
 import json
 import logging
+import time
 
 from calendar import monthrange
 from datetime import date, datetime, timedelta
@@ -12,6 +13,9 @@ from .. import shopify
 from ..shopify.pyactiveresource.connection import ForbiddenAccess
 
 _logger = logging.getLogger("Shopify Instance")
+# Version used for GraphQL calls, the REST resources stay on the version of the shop URL.
+SHOPIFY_GRAPHQL_VERSION = "2024-01"
+SHOPIFY_GRAPHQL_MAX_RETRIES = 5
 _secondsConverter = {
     'days': lambda interval: interval * 24 * 60 * 60,
     'hours': lambda interval: interval * 60 * 60,
@@ -174,6 +178,15 @@ class ShopifyInstanceEpt(models.Model):
     update_category_in_odoo_product = fields.Boolean(string="Update Category In Odoo Product ?",
                                                      default=False)
     shopify_stock_field = fields.Many2one('ir.model.fields', string='Stock Field')
+    is_shopify_bulk_export_stock = fields.Boolean("Export Stock in Bulk?", default=False,
+                                                  help="If checked, Stock is exported through the GraphQL "
+                                                       "inventorySetQuantities mutation, 250 quantities per request "
+                                                       "instead of one request per product and location.")
+    is_shopify_export_changed_stock_only = fields.Boolean("Export Changed Stock Only?", default=False,
+                                                          help="If checked, The export stock process skips the "
+                                                               "products whose quantity is the same as the last "
+                                                               "quantity exported to the Shopify location. Export "
+                                                               "stock of selected products always sends the quantity.")
     last_date_order_import = fields.Datetime(string="Last Date Of Unshipped Order Import",
                                              help="Last date of sync orders from Shopify to Odoo")
     shopify_section_id = fields.Many2one('crm.team', 'Sales Team')
@@ -181,6 +194,9 @@ class ShopifyInstanceEpt(models.Model):
                                              help="If checked,Then use default sequence of odoo while create sale "
                                                   "order.")
     # Account field
+    shopify_order_import_checkpoint = fields.Text(copy=False,
+                                                  help="Cursor of the next Shopify order page for the imports "
+                                                       "which did not finish, used to resume them.")
     shopify_store_time_zone = fields.Char("Store Time Zone",
                                           help='This field used to import order process')
     discount_product_id = fields.Many2one("product.product", "Discount",
@@ -372,14 +388,13 @@ class ShopifyInstanceEpt(models.Model):
                                    ) d
                                 LEFT   JOIN 
                                 (SELECT date(date_order)::date AS day, sum(amount_untaxed) as amount_untaxed
-                                   FROM   sale_order
+                                   FROM   %s
                                    WHERE  date(date_order) >= (select date_trunc('week', date(current_date)))
                                    AND    date(date_order) <= (select date_trunc('week', date(current_date)) 
                                    + interval '6 days')
-                                   AND shopify_instance_id=%s and state in ('sale','done')
                                    GROUP  BY 1
                                    ) t USING (day)
-                                ORDER  BY day""" % record.id)
+                                ORDER  BY day""" % record.get_kpi_rollup_orders_query())
             return self._cr.dictfetchall()
 
         def graph_of_current_month(record):
@@ -393,15 +408,14 @@ class ShopifyInstanceEpt(models.Model):
                         union all
                         SELECT date(date_order)::date AS date_day,
                         sum(amount_untaxed) as amount_untaxed
-                          FROM   sale_order
+                          FROM   %s
                         WHERE  date(date_order) >= (select date_trunc('month', date(current_date)))
                         AND date(date_order)::date <= (select date_trunc('month', date(current_date)) 
                         + '1 MONTH - 1 day')
-                        and shopify_instance_id = %s and state in ('sale','done')
                         group by 1
                         )foo 
                         GROUP  BY 1
-                        ORDER  BY 1""" % record.id)
+                        ORDER  BY 1""" % record.get_kpi_rollup_orders_query())
             return self._cr.dictfetchall()
 
         def graph_of_current_year(record):
@@ -414,23 +428,22 @@ class ShopifyInstanceEpt(models.Model):
                                 union all
                                 SELECT DATE_TRUNC('month',date(date_order)) as month,
                                 sum(amount_untaxed) as amount_untaxed
-                                  FROM   sale_order
+                                  FROM   %s
                                 WHERE  date(date_order) >= (select date_trunc('year', date(current_date))) AND 
                                 date(date_order)::date <= (select date_trunc('year', date(current_date)) 
                                 + '1 YEAR - 1 day')
-                                and shopify_instance_id = %s and state in ('sale','done')
                                 group by DATE_TRUNC('month',date(date_order))
                                 order by month
                                 )foo 
                                 GROUP  BY foo.month
-                                order by foo.month""" % record.id)
+                                order by foo.month""" % record.get_kpi_rollup_orders_query())
             return self._cr.dictfetchall()
 
         def graph_of_all_time(record):
             self._cr.execute("""select TRIM(TO_CHAR(DATE_TRUNC('month',date_order),'YYYY-MM')),sum(amount_untaxed)
-                                from sale_order where shopify_instance_id = %s and state in ('sale','done')
+                                from %s
                                 group by DATE_TRUNC('month',date_order) 
-                                order by DATE_TRUNC('month',date_order)""" % record.id)
+                                order by DATE_TRUNC('month',date_order)""" % record.get_kpi_rollup_orders_query())
             return self._cr.dictfetchall()
 
         # Prepare values for Graph
@@ -457,19 +470,18 @@ class ShopifyInstanceEpt(models.Model):
             current_total = 0.0
             previous_total = 0.0
             day_of_week = date.weekday(date.today())
-            self._cr.execute("""select sum(amount_untaxed) as current_week from sale_order
-                                where date(date_order) >= (select date_trunc('week', date(current_date))) and
-                                shopify_instance_id=%s and state in ('sale','done')""" % record.id)
+            self._cr.execute("""select sum(amount_untaxed) as current_week from %s
+                                where date(date_order) >= (select date_trunc('week', date(current_date)))""" %
+                             record.get_kpi_rollup_orders_query())
             current_week_data = self._cr.dictfetchone()
             if current_week_data:
                 current_total = current_week_data.get('current_week') if current_week_data.get('current_week') else 0
             # Previous week data
-            self._cr.execute("""select sum(amount_untaxed) as previous_week from sale_order
+            self._cr.execute("""select sum(amount_untaxed) as previous_week from %s
                             where date(date_order) between (select date_trunc('week', current_date) - interval '7 day') 
                             and (select date_trunc('week', (select date_trunc('week', current_date) - interval '7
                             day')) + interval '%s day')
-                            and shopify_instance_id=%s and state in ('sale','done')
-                            """ % (day_of_week, record.id))
+                            """ % (record.get_kpi_rollup_orders_query(), day_of_week))
             previous_week_data = self._cr.dictfetchone()
             if previous_week_data:
                 previous_total = previous_week_data.get('previous_week') if previous_week_data.get(
@@ -480,19 +492,18 @@ class ShopifyInstanceEpt(models.Model):
             current_total = 0.0
             previous_total = 0.0
             day_of_month = date.today().day - 1
-            self._cr.execute("""select sum(amount_untaxed) as current_month from sale_order
-                                where date(date_order) >= (select date_trunc('month', date(current_date)))
-                                and shopify_instance_id=%s and state in ('sale','done')""" % record.id)
+            self._cr.execute("""select sum(amount_untaxed) as current_month from %s
+                                where date(date_order) >= (select date_trunc('month', date(current_date)))""" %
+                             record.get_kpi_rollup_orders_query())
             current_data = self._cr.dictfetchone()
             if current_data:
                 current_total = current_data.get('current_month') if current_data.get('current_month') else 0
             # Previous week data
-            self._cr.execute("""select sum(amount_untaxed) as previous_month from sale_order where date(date_order)
+            self._cr.execute("""select sum(amount_untaxed) as previous_month from %s where date(date_order)
                             between (select date_trunc('month', current_date) - interval '1 month') and
                             (select date_trunc('month', (select date_trunc('month', current_date) - interval
                             '1 month')) + interval '%s days')
-                            and shopify_instance_id=%s and state in ('sale','done')
-                            """ % (day_of_month, record.id))
+                            """ % (record.get_kpi_rollup_orders_query(), day_of_month))
             previous_data = self._cr.dictfetchone()
             if previous_data:
                 previous_total = previous_data.get('previous_month') if previous_data.get('previous_month') else 0
@@ -504,18 +515,17 @@ class ShopifyInstanceEpt(models.Model):
             year_begin = date.today().replace(month=1, day=1)
             year_end = date.today()
             delta = (year_end - year_begin).days - 1
-            self._cr.execute("""select sum(amount_untaxed) as current_year from sale_order
-                                where date(date_order) >= (select date_trunc('year', date(current_date)))
-                                and shopify_instance_id=%s and state in ('sale','done')""" % record.id)
+            self._cr.execute("""select sum(amount_untaxed) as current_year from %s
+                                where date(date_order) >= (select date_trunc('year', date(current_date)))""" %
+                             record.get_kpi_rollup_orders_query())
             current_data = self._cr.dictfetchone()
             if current_data:
                 current_total = current_data.get('current_year') if current_data.get('current_year') else 0
             # Previous week data
-            self._cr.execute("""select sum(amount_untaxed) as previous_year from sale_order where date(date_order)
+            self._cr.execute("""select sum(amount_untaxed) as previous_year from %s where date(date_order)
                             between (select date_trunc('year', date(current_date) - interval '1 year')) and 
                             (select date_trunc('year', date(current_date) - interval '1 year') + interval '%s days') 
-                            and shopify_instance_id=%s and state in ('sale','done')
-                            """ % (delta, record.id))
+                            """ % (record.get_kpi_rollup_orders_query(), delta))
             previous_data = self._cr.dictfetchone()
             if previous_data:
                 previous_total = previous_data.get('previous_year') if previous_data.get('previous_year') else 0
@@ -544,48 +554,14 @@ class ShopifyInstanceEpt(models.Model):
         Task: 167063
         Added by: Preet Bhatti @Emipro Technologies
         Added on: 29/10/20
-        :return: total number of shopify sale orders ids and action for sale orders of current instance
+        :return: total number of shopify sale orders and action for sale orders of current instance
         """
-        order_query = """select id from sale_order where shopify_instance_id= %s and state in ('sale','done')""" % \
-                      self.id
-
-        def orders_of_current_week(order_query):
-            qry = order_query + """ and date(date_order) >= (select date_trunc('week', date(current_date))) order by
-            date(date_order)"""
-            self._cr.execute(qry)
-            return self._cr.dictfetchall()
-
-        def orders_of_current_month(order_query):
-            qry = order_query + """ and date(date_order) >=(select date_trunc('month', date(current_date))) order by
-            date(date_order)"""
-            self._cr.execute(qry)
-            return self._cr.dictfetchall()
-
-        def orders_of_current_year(order_query):
-            qry = order_query + """ and date(date_order) >= (select date_trunc('year', date(current_date))) order by
-            date(date_order)"""
-            self._cr.execute(qry)
-            return self._cr.dictfetchall()
-
-        def orders_of_all_time(record):
-            self._cr.execute(
-                """select id from sale_order where shopify_instance_id = %s and state in ('sale','done')""" % (
-                    record.id))
-            return self._cr.dictfetchall()
-
         order_data = {}
-        if self._context.get('sort') == "week":
-            result = orders_of_current_week(order_query)
-        elif self._context.get('sort') == "month":
-            result = orders_of_current_month(order_query)
-        elif self._context.get('sort') == "year":
-            result = orders_of_current_year(order_query)
-        else:
-            result = orders_of_all_time(self)
-        order_ids = [data.get('id') for data in result]
+        domain = [('shopify_instance_id', '=', self.id), ('state', 'in', ['sale', 'done'])]
+        domain += self.get_dashboard_period_domain('date_order')
         view = self.env.ref('shopify_ept.action_shopify_sales_order').sudo().read()[0]
-        action = self.prepare_action(view, [('id', 'in', order_ids)])
-        order_data.update({'order_count': len(order_ids), 'order_action': action})
+        action = self.prepare_action(view, domain)
+        order_data.update({'order_count': self.env['sale.order'].search_count(domain), 'order_action': action})
         return order_data
 
     def get_shipped_orders(self):
@@ -594,46 +570,23 @@ class ShopifyInstanceEpt(models.Model):
         Task: 167063
         Added by: Preet Bhatti @Emipro Technologies
         Added on: 29/10/20
-        :return: total number of shopify shipped orders ids and action for shipped orders of current instance
+        :return: total number of shopify shipped orders and action for shipped orders of current instance
         """
-        shipped_query = """select so.id from stock_picking sp
-                             inner join sale_order so on so.procurement_group_id=sp.group_id inner 
-                             join stock_location on stock_location.id=sp.location_dest_id and stock_location.usage='customer' 
-                             where sp.updated_in_shopify = True and sp.state != 'cancel' and 
-                             so.shopify_instance_id=%s""" % self.id
-
-        def shipped_order_of_current_week(shipped_query):
-            qry = shipped_query + " and date(so.date_order) >= (select date_trunc('week', date(current_date)))"
-            self._cr.execute(qry)
-            return self._cr.dictfetchall()
-
-        def shipped_order_of_current_month(shipped_query):
-            qry = shipped_query + " and date(so.date_order) >= (select date_trunc('month', date(current_date)))"
-            self._cr.execute(qry)
-            return self._cr.dictfetchall()
-
-        def shipped_order_of_current_year(shipped_query):
-            qry = shipped_query + " and date(so.date_order) >= (select date_trunc('year', date(current_date)))"
-            self._cr.execute(qry)
-            return self._cr.dictfetchall()
-
-        def shipped_order_of_all_time(shipped_query):
-            self._cr.execute(shipped_query)
-            return self._cr.dictfetchall()
-
         order_data = {}
-        if self._context.get('sort') == "week":
-            result = shipped_order_of_current_week(shipped_query)
-        elif self._context.get('sort') == "month":
-            result = shipped_order_of_current_month(shipped_query)
-        elif self._context.get('sort') == "year":
-            result = shipped_order_of_current_year(shipped_query)
-        else:
-            result = shipped_order_of_all_time(shipped_query)
-        order_ids = [data.get('id') for data in result]
+        query = """select count(distinct so.id) from sale_order so
+                   where so.shopify_instance_id = %%s and exists (%s)""" % \
+                self.env['sale.order'].get_shopify_shipped_delivery_query_ept("so.id")
+        params = [self.id]
+        period_start = self.get_dashboard_period_start()
+        if period_start:
+            query += " and so.date_order >= %s"
+            params.append(datetime.combine(period_start, datetime.min.time()))
+        self._cr.execute(query, params)
+        domain = [('shopify_instance_id', '=', self.id), ('is_shopify_shipped_ept', '=', True)]
+        domain += self.get_dashboard_period_domain('date_order')
         view = self.env.ref('shopify_ept.action_shopify_sales_order').sudo().read()[0]
-        action = self.prepare_action(view, [('id', 'in', order_ids)])
-        order_data.update({'order_count': len(order_ids), 'order_action': action})
+        action = self.prepare_action(view, domain)
+        order_data.update({'order_count': self._cr.fetchone()[0], 'order_action': action})
         return order_data
 
     def get_total_products(self):
@@ -679,45 +632,52 @@ class ShopifyInstanceEpt(models.Model):
         Task: 167349
         Added by: Preet Bhatti @Emipro Technologies
         Added on: 03/11/20
-        :return: total number of refund order ids and action for customers
+        :return: total number of refund orders and action for refund orders
         """
-        refund_query = """select id from account_move where shopify_instance_id=%s and
-                            move_type='out_refund'""" % self.id
-
-        def refund_of_current_week(refund_query):
-            qry = refund_query + " and date(invoice_date) >= (select date_trunc('week', date(current_date)))"
-            self._cr.execute(qry)
-            return self._cr.dictfetchall()
-
-        def refund_of_current_month(refund_query):
-            qry = refund_query + " and date(invoice_date) >= (select date_trunc('month', date(current_date)))"
-            self._cr.execute(qry)
-            return self._cr.dictfetchall()
-
-        def refund_of_current_year(refund_query):
-            qry = refund_query + " and date(invoice_date) >= (select date_trunc('year', date(current_date)))"
-            self._cr.execute(qry)
-            return self._cr.dictfetchall()
-
-        def refund_of_all_time(refund_query):
-            self._cr.execute(refund_query)
-            return self._cr.dictfetchall()
-
         refund_data = {}
-        if self._context.get('sort') == "week":
-            result = refund_of_current_week(refund_query)
-        elif self._context.get('sort') == "month":
-            result = refund_of_current_month(refund_query)
-        elif self._context.get('sort') == "year":
-            result = refund_of_current_year(refund_query)
-        else:
-            result = refund_of_all_time(refund_query)
-        refund_ids = [data.get('id') for data in result]
+        domain = [('shopify_instance_id', '=', self.id), ('move_type', '=', 'out_refund')]
+        domain += self.get_dashboard_period_domain('invoice_date', is_date=True)
         view = self.env.ref('shopify_ept.action_refund_shopify_invoices').sudo().read()[0]
-        action = self.prepare_action(view, [('id', 'in', refund_ids)])
-        refund_data.update({'refund_count': len(refund_ids), 'refund_action': action})
+        action = self.prepare_action(view, domain)
+        refund_data.update({'refund_count': self.env['account.move'].search_count(domain), 'refund_action': action})
         return refund_data
 
+    def get_dashboard_period_domain(self, field_name, is_date=False):
+        """
+        Use: To prepare the domain of the dashboard period selected in the kanban (week, month, year or all time)
+        :param field_name: Date or datetime field compared with the start of the period
+        :param is_date: True when the field is a date field
+        :return: domain
+        """
+        period_start = self.get_dashboard_period_start()
+        if not period_start:
+            return []
+        if is_date:
+            return [(field_name, '>=', fields.Date.to_string(period_start))]
+        return [(field_name, '>=', fields.Datetime.to_string(datetime.combine(period_start, datetime.min.time())))]
+
+    def get_dashboard_period_start(self):
+        """
+        Use: To get the first day of the dashboard period selected in the kanban
+        :return: date or False for all time
+        """
+        today = fields.Date.today()
+        if self._context.get('sort') == "week":
+            return today - timedelta(days=today.weekday())
+        if self._context.get('sort') == "month":
+            return today.replace(day=1)
+        if self._context.get('sort') == "year":
+            return today.replace(month=1, day=1)
+        return False
+
+    def get_kpi_rollup_orders_query(self):
+        """
+        Use: To get the daily KPIs of the instance shaped like its confirmed sale orders for the dashboard queries
+        :return: sub query with the columns date_order and amount_untaxed
+        """
+        rollup_query = self.env['connector.kpi.rollup.ept'].get_kpi_rollup_query_ept(self._name, self.id)
+        return "(select date as date_order, revenue as amount_untaxed from %s as rollup) as sale_order" % rollup_query
+
     def prepare_action(self, view, domain):
         """
         Use: To prepare action dictionary
@@ -856,6 +816,55 @@ class ShopifyInstanceEpt(models.Model):
         shopify.ShopifyResource.set_site(shop_url)
         return True
 
+    def shopify_execute_graphql(self, query, variables=None, version=SHOPIFY_GRAPHQL_VERSION):
+        """
+        This method is used to execute a GraphQL query or mutation in the connected Shopify store.
+        Throttled requests are retried once the cost bucket has restored enough points.
+        @param query: GraphQL query or mutation.
+        @param variables: Dictionary of the query variables.
+        @param version: API version used for the GraphQL endpoint.
+        @return: Decoded response of Shopify.
+        """
+        graphql = shopify.GraphQL(version=version)
+        result = {}
+        for attempt in range(SHOPIFY_GRAPHQL_MAX_RETRIES):
+            result = json.loads(graphql.execute(query, variables))
+            errors = result.get("errors")
+            if not isinstance(errors, list) or not any(
+                    isinstance(error, dict) and error.get("extensions", {}).get("code") == "THROTTLED"
+                    for error in errors):
+                return result
+            cost = result.get("extensions", {}).get("cost", {})
+            throttle_status = cost.get("throttleStatus", {})
+            restore_rate = throttle_status.get("restoreRate") or 50.0
+            missing_points = cost.get("requestedQueryCost", 0) - throttle_status.get("currentlyAvailable", 0)
+            _logger.info("Shopify GraphQL request throttled, retry %s.", attempt + 1)
+            time.sleep(max(missing_points / restore_rate, 1))
+        return result
+
+    def get_order_import_checkpoint(self, key):
+        """
+        This method is used to get the checkpoint of an interrupted order import.
+        @param key: Identifies the import, queue type and order status.
+        @return: Dictionary of from_date, to_date and next_page_url or False.
+        """
+        checkpoints = json.loads(self.shopify_order_import_checkpoint or "{}")
+        return checkpoints.get(key, False)
+
+    def set_order_import_checkpoint(self, key, checkpoint):
+        """
+        This method is used to store the checkpoint of an order import, it is removed when checkpoint is False.
+        @param key: Identifies the import, queue type and order status.
+        @param checkpoint: Dictionary of from_date, to_date and next_page_url.
+        """
+        checkpoints = json.loads(self.shopify_order_import_checkpoint or "{}")
+        if checkpoint:
+            checkpoints[key] = checkpoint
+        else:
+            checkpoints.pop(key, None)
+        self.write({"shopify_order_import_checkpoint": json.dumps(checkpoints) if checkpoints else False})
+        return True
+
     def prepare_shopify_shop_url(self, host, api_key, password):
         """ This method is used to prepare a shop URL.
             @return shop_url
@@ -6,11 +6,11 @@ import re
 import logging
 from datetime import datetime, timedelta
 import pytz
-from odoo import models, fields, api, _
+from odoo import models, fields, api, _, tools
 
 from odoo.exceptions import UserError
-from ..shopify.pyactiveresource.connection import ClientError
 from .. import shopify
+from ..shopify.collection import PaginatedCollection
 
 utc = pytz.utc
 
@@ -51,6 +51,9 @@ class ShopifyOrderDataQueueEpt(models.Model):
                                    ("scheduled_action", "By Scheduled Action")],
                                   help="Identify the process that generated a queue.", default="import")
     is_process_queue = fields.Boolean('Is Processing Queue', default=False)
+    claimed_until = fields.Datetime(copy=False, help="A cron worker is processing this queue until this time. "
+                                                     "Other workers skip it, it is claimed again after this time "
+                                                     "if the worker stopped.")
     running_status = fields.Char(default="Running...")
     queue_process_count = fields.Integer(string="Queue Process Times",
                                          help="it is used know queue how many time processed")
@@ -58,6 +61,11 @@ class ShopifyOrderDataQueueEpt(models.Model):
     queue_type = fields.Selection([("shipped", "Shipped Order Queue"), ("unshipped", "Unshipped Order Queue")],
                                   help="Identify to queue for which type of order import.")
 
+    def init(self):
+        """ Index used to purge the old records, see data.queue.mixin.ept. """
+        super(ShopifyOrderDataQueueEpt, self).init()
+        tools.create_index(self._cr, "%s_create_date_index" % self._table, self._table, ["create_date"])
+
     @api.depends('order_data_queue_line_ids.state')
     def _compute_queue_state(self):
         """
@@ -89,18 +97,16 @@ class ShopifyOrderDataQueueEpt(models.Model):
             order_queue.order_queue_line_fail_record = len(queue_lines.filtered(lambda x: x.state == "failed"))
             order_queue.order_queue_line_cancel_record = len(queue_lines.filtered(lambda x: x.state == "cancel"))
 
-    @api.model
-    def create(self, vals):
+    @api.model_create_multi
+    def create(self, vals_list):
         """This method used to create a sequence for Order Queue Data.
             @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 04/11/2019.
         """
-        sequence_id = self.env.ref('shopify_ept.seq_order_queue_data').ids
-        if sequence_id:
-            record_name = self.env['ir.sequence'].browse(sequence_id).next_by_id()
-        else:
-            record_name = '/'
-        vals.update({'name': record_name or ''})
-        return super(ShopifyOrderDataQueueEpt, self).create(vals)
+        sequence = self.env.ref('shopify_ept.seq_order_queue_data', raise_if_not_found=False)
+        for vals in vals_list:
+            record_name = sequence.next_by_id() if sequence else '/'
+            vals.update({'name': record_name or ''})
+        return super(ShopifyOrderDataQueueEpt, self).create(vals_list)
 
     def import_order_cron_action(self, ctx=False):
         """This method is used to import orders from the auto-import cron job.
@@ -161,7 +167,6 @@ class ShopifyOrderDataQueueEpt(models.Model):
         Task Id : 157350
         @change: Maulik Barad on Date 10-Sep-2020.
         """
-        order_data_queue_line_obj = self.env["shopify.order.data.queue.line.ept"]
         start = time.time()
         order_queues = []
         instance.connect_in_shopify()
@@ -169,16 +174,8 @@ class ShopifyOrderDataQueueEpt(models.Model):
             queue_type = 'unshipped'
             for order_status_id in instance.shopify_order_status_ids:
                 order_status = order_status_id.status
-                order_ids = self.shopify_order_request(instance, from_date, to_date, order_status)
-
-                if order_ids:
-                    order_queues = order_data_queue_line_obj.create_order_data_queue_line(order_ids,
-                                                                                          instance,
-                                                                                          queue_type,
-                                                                                          created_by)
-                    if len(order_ids) >= 250:
-                        order_queue_list = self.list_all_orders(order_ids, instance, created_by, queue_type)
-                        order_queues += order_queue_list
+                order_queues += self.shopify_import_order_pages(instance, from_date, to_date, order_status,
+                                                                queue_type, created_by)
                 instance.last_date_order_import = to_date - timedelta(days=2)
         else:
             order_queues = self.shopify_shipped_order_request(instance, from_date, to_date, created_by="import",
@@ -212,64 +209,83 @@ class ShopifyOrderDataQueueEpt(models.Model):
             @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 30 December 2020 .
             Task_id:169381 - Gift card order import changes
         """
-        order_data_queue_line_obj = self.env["shopify.order.data.queue.line.ept"]
-        order_queues = []
         queue_type = 'shipped'
-        order_ids = self.shopify_order_request(instance, from_date, to_date, order_type)
-        if order_ids:
-            order_queues = order_data_queue_line_obj.create_order_data_queue_line(order_ids,
-                                                                                  instance,
-                                                                                  queue_type,
-                                                                                  created_by)
-            if len(order_ids) >= 250:
-                order_queue_list = self.list_all_orders(order_ids, instance, created_by, queue_type)
-                order_queues += order_queue_list
+        return self.shopify_import_order_pages(instance, from_date, to_date, order_type, queue_type, created_by)
 
-        return order_queues
-
-    def list_all_orders(self, result, instance, created_by, queue_type):
+    def shopify_order_pages(self, instance, from_date, to_date, order_type, next_page_url=False):
+        """ This method is a generator which yields the orders of Shopify page by page through cursor based
+            pagination, only the current page is kept in memory.
+            :param order_type: Fulfillment status of the orders.
+            :param next_page_url: Cursor of the page from which an interrupted import is resumed.
         """
-        This method used to get the list of orders from Shopify to Odoo.
-        @param result: Response of order which received from Shopify store.
-        @param order_type: Here we receive 2 type of order type(unshipped, shipped).
-        @param created_by: To identify which process is created a queue record(webhook, Manually).
-        @param instance:
-        @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 06/11/2019.
-        Task_id : 157350
-        Modify on date 27/12/2019 Taken pagination changes
-        @change : Maulik Barad on Date 10-Sep-2020.
+        if next_page_url:
+            try:
+                first_page = shopify.Order().find(from_=next_page_url)
+            except Exception as error:
+                raise UserError(error)
+        else:
+            first_page = self.shopify_order_request(instance, from_date, to_date, order_type)
+
+        if not isinstance(first_page, PaginatedCollection):
+            yield first_page
+            return
+        pages = iter(shopify.PaginatedIterator(first_page))
+        while True:
+            try:
+                page = next(pages)
+            except StopIteration:
+                return
+            except Exception as error:
+                raise UserError(error)
+            yield page
+
+    def shopify_import_order_pages(self, instance, from_date, to_date, order_type, queue_type, created_by):
+        """ This method is used to create the order queues page by page. After every page, the cursor of the next
+            page is stored in the instance and committed, so an interrupted import resumes from there instead of
+            the first page. When resuming, the remaining pages of the interrupted window are imported first and
+            then only the orders updated after that window.
+            :param order_type: Fulfillment status of the orders.
+            @return: List of order queue ids.
         """
-        order_data_queue_line_obj = self.env["shopify.order.data.queue.line.ept"]
-        order_queue_list = []
-        catch = ""
+        order_queues = []
+        checkpoint_key = "%s_%s" % (queue_type, order_type)
+        window_from_date = fields.Datetime.to_string(from_date)
+        checkpoint = instance.get_order_import_checkpoint(checkpoint_key)
+        if checkpoint and checkpoint.get("from_date") == window_from_date and \
+                fields.Datetime.to_datetime(checkpoint.get("to_date")) <= to_date:
+            _logger.info("Resuming %s order import of instance %s from %s.", queue_type, instance.name,
+                         checkpoint.get("next_page_url"))
+            pages = self.shopify_order_pages(instance, from_date, to_date, order_type,
+                                             next_page_url=checkpoint.get("next_page_url"))
+            order_queues += self.create_order_queues_from_pages(pages, instance, queue_type, created_by,
+                                                                checkpoint_key, checkpoint)
+            from_date = fields.Datetime.to_datetime(checkpoint.get("to_date"))
 
-        while result:
-            page_info = ""
-            # link: link of next page.
-            link = shopify.ShopifyResource.connection.response.headers.get('Link')
-            if not link or not isinstance(link, str):
-                return order_queue_list
+        pages = self.shopify_order_pages(instance, from_date, to_date, order_type)
+        checkpoint = {"from_date": window_from_date, "to_date": fields.Datetime.to_string(to_date)}
+        order_queues += self.create_order_queues_from_pages(pages, instance, queue_type, created_by, checkpoint_key,
+                                                            checkpoint)
+        return order_queues
 
-            for page_link in link.split(','):
-                if page_link.find('next') > 0:
-                    page_info = page_link.split(';')[0].strip('<>').split('page_info=')[1]
-                    try:
-                        result = shopify.Order().find(limit=250, page_info=page_info)
-                    except ClientError as error:
-                        if hasattr(error,
-                                   "response") and error.response.code == 429 and error.response.msg == "Too Many Requests":
-                            time.sleep(int(float(error.response.headers.get('Retry-After', 5))))
-                            result = shopify.Order().find(limit=250, page_info=page_info)
-                    except Exception as error:
-                        raise UserError(error)
-                    if result:
-                        order_queues = order_data_queue_line_obj.create_order_data_queue_line(result, instance,
-                                                                                              queue_type,
-                                                                                              created_by)
-                        order_queue_list += order_queues
-            if catch == page_info:
-                break
-        return order_queue_list
+    def create_order_queues_from_pages(self, pages, instance, queue_type, created_by, checkpoint_key, checkpoint):
+        """ This method is used to create the order queue lines of every page and store the cursor of the next
+            page as checkpoint.
+            :param pages: Generator of order pages.
+            :param checkpoint: Dictionary of from_date and to_date of the window the pages belong to.
+            @return: List of order queue ids.
+        """
+        order_data_queue_line_obj = self.env["shopify.order.data.queue.line.ept"]
+        order_queues = []
+        for page in pages:
+            if page:
+                order_queues += order_data_queue_line_obj.create_order_data_queue_line(page, instance, queue_type,
+                                                                                       created_by)
+            next_page_url = getattr(page, "next_page_url", False)
+            instance.set_order_import_checkpoint(checkpoint_key,
+                                                 dict(checkpoint, next_page_url=next_page_url) if next_page_url
+                                                 else False)
+            self._cr.commit()
+        return order_queues
 
     def import_order_process_by_remote_ids(self, instance, order_ids):
         """
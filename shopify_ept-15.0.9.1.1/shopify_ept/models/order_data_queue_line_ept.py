@@ -34,6 +34,22 @@ class ShopifyOrderDataQueueLineEpt(models.Model):
                                                          help="Log lines created against which line.")
     name = fields.Char(help="Order Name")
 
+    def prepare_order_queue_line_vals(self, order_dict, instance, order_data, customer_name, customer_email,
+                                      order_queue_id):
+        """
+        Prepares the values of order data queue line from order data.
+        :param order_dict: The response of order in the dictionary.
+        :param order_data: The response of order in dump data.
+        :param order_queue_id: Record of order queue.
+        """
+        return {"shopify_order_id": order_dict.get("id", False),
+                "shopify_instance_id": instance.id,
+                "order_data": order_data,
+                "name": order_dict.get("name", ""),
+                "customer_name": customer_name,
+                "customer_email": customer_email,
+                "shopify_order_data_queue_id": order_queue_id.id}
+
     def create_order_queue_line(self, order_dict, instance, order_data, customer_name, customer_email, order_queue_id):
         """
         Creates order data queue line from order data.
@@ -42,32 +58,27 @@ class ShopifyOrderDataQueueLineEpt(models.Model):
         :param order_queue_id: Record of order queue.
         @author: Maulik Barad on Date 10-Sep-2020.
         """
-        order_queue_line_vals = {"shopify_order_id": order_dict.get("id", False),
-                                 "shopify_instance_id": instance.id,
-                                 "order_data": order_data,
-                                 "name": order_dict.get("name", ""),
-                                 "customer_name": customer_name,
-                                 "customer_email": customer_email,
-                                 "shopify_order_data_queue_id": order_queue_id.id}
-        return self.create(order_queue_line_vals)
+        return self.create(self.prepare_order_queue_line_vals(order_dict, instance, order_data, customer_name,
+                                                              customer_email, order_queue_id))
 
     def create_order_data_queue_line(self, orders_data, instance, queue_type, created_by="import"):
         """
         This method used to create order data queue lines. It creates new queue after 50 order queue lines.
+        Orders received by the update webhook are added in the running webhook queue one by one, all the others
+        are created in batch.
         @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 06/11/2019.
         Task Id : 157350
         """
+        if created_by != "webhook" or self._context.get('is_new_order'):
+            return self.create_order_data_queue_line_in_batch(orders_data, instance, queue_type, created_by)
+
         count = 0
         need_to_create_queue = True
         orders_data.reverse()
         order_queue_list = []
-        is_new_order = bool(self._context.get('is_new_order'))
         for order in orders_data:
-            if created_by == "webhook" and not is_new_order:
-                order_queue, need_to_create_queue = self.search_webhook_order_queue(created_by, instance, order,
-                                                                                    queue_type, need_to_create_queue)
-            elif not is_new_order:
-                order = order.to_dict()
+            order_queue, need_to_create_queue = self.search_webhook_order_queue(created_by, instance, order,
+                                                                                queue_type, need_to_create_queue)
 
             if need_to_create_queue:
                 order_queue = self.shopify_create_order_queue(instance, queue_type, created_by)
@@ -81,7 +92,7 @@ class ShopifyOrderDataQueueLineEpt(models.Model):
             data = json.dumps(order)
             customer_name, customer_email = self.get_customer_name_and_email(order)
             self.create_order_queue_line(order, instance, data, customer_name, customer_email, order_queue)
-            if created_by == "webhook" and len(order_queue.order_data_queue_line_ids) >= 50:
+            if len(order_queue.order_data_queue_line_ids) >= 50:
                 order_queue.order_data_queue_line_ids.process_import_order_queue_data(update_order=True)
 
             count += 1
@@ -94,6 +105,36 @@ class ShopifyOrderDataQueueLineEpt(models.Model):
 
         return order_queue_list
 
+    def create_order_data_queue_line_in_batch(self, orders_data, instance, queue_type, created_by="import"):
+        """
+        This method is used to create the order queues and queue lines of a whole page of orders, with one create
+        call for the queues and one for the lines, 50 lines per queue. The page is committed and notified once.
+        :param orders_data: Page of the orders response, or list of order dictionaries for a new order webhook.
+        @return: List of order queue ids.
+        """
+        is_new_order = bool(self._context.get('is_new_order'))
+        orders = [order if is_new_order else order.to_dict() for order in reversed(orders_data)]
+        if not orders:
+            return []
+        order_chunks = [orders[index:index + 50] for index in range(0, len(orders), 50)]
+        order_queues = self.env["shopify.order.data.queue.ept"].create(
+            [self.prepare_order_queue_vals(instance, queue_type, created_by) for _ in order_chunks])
+
+        order_queue_line_vals = []
+        for order_queue, order_chunk in zip(order_queues, order_chunks):
+            for order in order_chunk:
+                customer_name, customer_email = self.get_customer_name_and_email(order)
+                order_queue_line_vals.append(self.prepare_order_queue_line_vals(order, instance, json.dumps(order),
+                                                                                customer_name, customer_email,
+                                                                                order_queue))
+        self.create(order_queue_line_vals)
+
+        message = "Order Queue %s created." % ", ".join(order_queues.mapped("name"))
+        _logger.info(message)
+        self.generate_simple_notification(message)
+        self._cr.commit()
+        return order_queues.ids
+
     def search_webhook_order_queue(self, created_by, instance, order, queue_type, need_to_create_queue):
         """ This method is used to search the webhook order queue.
             @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 27 October 2020 .
@@ -140,17 +181,22 @@ class ShopifyOrderDataQueueLineEpt(models.Model):
 
         return customer_name, customer_email
 
-    def shopify_create_order_queue(self, instance, queue_type, created_by="import"):
+    def prepare_order_queue_vals(self, instance, queue_type, created_by="import"):
         """
-        This method is used to create a record of the order queue.
-        @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 11/11/2019.
+        This method is used to prepare the values of the order queue.
         """
-        order_queue_vals = {
+        return {
             "shopify_instance_id": instance and instance.id or False,
             "created_by": created_by,
             "queue_type": queue_type,
         }
 
+    def shopify_create_order_queue(self, instance, queue_type, created_by="import"):
+        """
+        This method is used to create a record of the order queue.
+        @author: Haresh Mori @Emipro Technologies Pvt. Ltd on date 11/11/2019.
+        """
+        order_queue_vals = self.prepare_order_queue_vals(instance, queue_type, created_by)
         return self.env["shopify.order.data.queue.ept"].create(order_queue_vals)
 
     def auto_import_order_queue_data(self):
@@ -158,32 +204,61 @@ class ShopifyOrderDataQueueLineEpt(models.Model):
         This method is used to find order queue which queue lines have state in draft and is_action_require is False.
         If cronjob has tried more than 3 times to process any queue then it marks that queue has need process
         to manually. It will be called from auto queue process cron.
+        Several crons can run it at the same time, every worker claims one queue at a time and the queues
+        claimed by the other workers are skipped.
         @author: Haresh Mori @Emipro Technologies Pvt.Ltd on date 07/10/2019.
         Task Id : 157350
         """
+        start = time.time()
+        order_queue_process_cron_time = self.env["shopify.instance.ept"].get_shopify_cron_execution_time(
+            "shopify_ept.process_shopify_order_queue")
+        # The claim outlives the cron run, so a queue is not taken over while its worker is still busy.
+        claim_seconds = 2 * order_queue_process_cron_time
+        processed_queue_ids = []
+
+        while time.time() - start < order_queue_process_cron_time - 60:
+            queue = self.claim_order_queue(claim_seconds, processed_queue_ids)
+            if not queue:
+                break
+            processed_queue_ids.append(queue.id)
+            self.filter_order_queue_lines_and_post_message(queue)
+            queue.write({"claimed_until": False})
+            self._cr.commit()
+        return True
+
+    def claim_order_queue(self, claim_seconds, exclude_queue_ids):
+        """
+        This method is used to claim the oldest order queue which has draft lines and is not claimed by another
+        worker. The row is locked with SKIP LOCKED, so concurrent workers never pick the same queue, and the claim
+        is committed right away.
+        :param claim_seconds: Time for which the queue is claimed.
+        :param exclude_queue_ids: Ids of the queues already processed by the current worker.
+        @return: Record of the claimed order queue.
+        """
         shopify_order_queue_obj = self.env["shopify.order.data.queue.ept"]
-        order_queue_ids = []
+        query = """select queue.id
+                from shopify_order_data_queue_ept as queue
+                where queue.is_action_require is not true
+                and (queue.claimed_until is null or queue.claimed_until < (now() at time zone 'UTC'))
+                and queue.id != all(%s::int[])
+                and exists (select 1 from shopify_order_data_queue_line_ept as queue_line
+                            where queue_line.shopify_order_data_queue_id = queue.id and queue_line.state = 'draft')
+                order by queue.id
+                limit 1
+                for update of queue skip locked"""
+        self._cr.execute(query, (exclude_queue_ids,))
+        result = self._cr.fetchone()
+        if not result:
+            self._cr.commit()
+            return shopify_order_queue_obj
 
-        self.env.cr.execute(
-            """update shopify_order_data_queue_ept set is_process_queue = False where is_process_queue = True""")
+        # A queue is only claimable when no worker runs it, so a running flag left by a crashed or killed
+        # worker is cleared here.
+        self._cr.execute("""update shopify_order_data_queue_ept
+                set claimed_until = (now() at time zone 'UTC') + %s * interval '1 second', is_process_queue = false
+                where id = %s""", (claim_seconds, result[0]))
         self._cr.commit()
-
-        query = """select queue.id
-                from shopify_order_data_queue_line_ept as queue_line
-                inner join shopify_order_data_queue_ept as queue on queue_line.shopify_order_data_queue_id = queue.id
-                where queue_line.state='draft' and queue.is_action_require = 'False'
-                ORDER BY queue_line.create_date ASC"""
-        self._cr.execute(query)
-        order_queue_list = self._cr.fetchall()
-        if not order_queue_list:
-            return True
-
-        for result in order_queue_list:
-            if result[0] not in order_queue_ids:
-                order_queue_ids.append(result[0])
-
-        queues = shopify_order_queue_obj.browse(order_queue_ids)
-        self.filter_order_queue_lines_and_post_message(queues)
+        return shopify_order_queue_obj.browse(result[0])
 
     def filter_order_queue_lines_and_post_message(self, queues):
         """
@@ -244,12 +319,13 @@ class ShopifyOrderDataQueueLineEpt(models.Model):
                 log_book_id = common_log_obj.shopify_create_common_log_book("import", instance, model_id)
 
             queue_id.is_process_queue = True
-            # Below two line used for When the update order webhook calls.
-            if update_order or queue_id.created_by == "webhook":
-                created_by = 'Webhook'
-                sale_order_obj.update_shopify_order(self, log_book_id, created_by)
-            else:
-                sale_order_obj.import_shopify_orders(self, log_book_id)
+            with common_log_obj.log_lines.buffer_log_lines_ept():
+                # Below two line used for When the update order webhook calls.
+                if update_order or queue_id.created_by == "webhook":
+                    created_by = 'Webhook'
+                    sale_order_obj.update_shopify_order(self, log_book_id, created_by)
+                else:
+                    sale_order_obj.import_shopify_orders(self, log_book_id)
             queue_id.write({'is_process_queue': False, 'shopify_order_common_log_book_id': log_book_id})
             if log_book_id and not log_book_id.log_lines:
                 log_book_id.unlink()
@@ -1,8 +1,30 @@
 # -*- coding: utf-8 -*-
 # See LICENSE file for full copyright and licensing details.
 
+import logging
+
 from odoo import models, fields
 
+_logger = logging.getLogger("Shopify Order")
+# Number of orders of which the risks are fetched in one GraphQL request.
+SHOPIFY_ORDER_RISK_BATCH_SIZE = 50
+SHOPIFY_ORDER_RISKS_QUERY = """
+query orderRisks($ids: [ID!]!) {
+  nodes(ids: $ids) {
+    ... on Order {
+      legacyResourceId
+      risks(first: 20) {
+        display
+        level
+        message
+      }
+    }
+  }
+}
+"""
+# GraphQL gives the risk level, the REST API gave the recommendation derived from it.
+SHOPIFY_RISK_LEVEL_RECOMMENDATION = {"HIGH": "cancel", "MEDIUM": "investigate", "LOW": "accept"}
+
 
 class ShopifyOrderRisk(models.Model):
     _name = "shopify.order.risk"
@@ -31,7 +53,7 @@ class ShopifyOrderRisk(models.Model):
         """
         flag = True
         for risk_id in risk_result:
-            risk = risk_id.to_dict()
+            risk = risk_id if isinstance(risk_id, dict) else risk_id.to_dict()
             if risk.get('recommendation') != 'accept':
                 flag = False
             vals = self.prepare_vals_for_risk_order(risk, order)
@@ -52,3 +74,37 @@ class ShopifyOrderRisk(models.Model):
                 'odoo_order_id': order.id
                 }
         return vals
+
+    def shopify_fetch_order_risks(self, instance, shopify_order_ids):
+        """ This method is used to fetch the risks of many orders with GraphQL requests, instead of a risk API call
+            per order. The risks are converted to the format of the risk API.
+            :param instance: Record of instance, it must be connected to Shopify.
+            :param shopify_order_ids: List of Shopify order ids.
+            @return: Dictionary of Shopify order id and list of risks. Orders of a failed request are not in it.
+        """
+        order_risks = {}
+        shopify_order_ids = [str(order_id) for order_id in shopify_order_ids if order_id]
+        for start in range(0, len(shopify_order_ids), SHOPIFY_ORDER_RISK_BATCH_SIZE):
+            batch = shopify_order_ids[start:start + SHOPIFY_ORDER_RISK_BATCH_SIZE]
+            variables = {"ids": ["gid://shopify/Order/%s" % order_id for order_id in batch]}
+            try:
+                result = instance.shopify_execute_graphql(SHOPIFY_ORDER_RISKS_QUERY, variables)
+            except Exception as error:
+                _logger.info("Risks of the Shopify orders %s are not fetched in bulk, Error: %s", batch, error)
+                continue
+            if result.get("errors"):
+                _logger.info("Risks of the Shopify orders %s are not fetched in bulk, Error: %s", batch,
+                             result.get("errors"))
+                continue
+            for order in (result.get("data") or {}).get("nodes") or []:
+                if not order or not order.get("legacyResourceId"):
+                    continue
+                order_id = order.get("legacyResourceId")
+                order_risks[order_id] = [{"order_id": order_id,
+                                          "display": risk.get("display"),
+                                          "message": risk.get("message"),
+                                          "recommendation": SHOPIFY_RISK_LEVEL_RECOMMENDATION.get(risk.get("level"),
+                                                                                                  "investigate"),
+                                          "cause_cancel": risk.get("level") == "HIGH",
+                                          "source": "Shopify"} for risk in order.get("risks") or []]
+        return order_risks
@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 # See LICENSE file for full copyright and licensing details.
 import json
-import time
 
 from datetime import datetime, timedelta
 from odoo import models, fields
@@ -34,13 +33,9 @@ class ShopifyPaymentGateway(models.Model):
                                            updated_at_max=to_date, fields=['gateway'], limit=250)
         except ClientError as error:
             if hasattr(error, "response"):
-                if error.response.code == 429 and error.response.msg == "Too Many Requests":
-                    time.sleep(int(float(error.response.headers.get('Retry-After', 5))))
-                    results = shopify.Order().find(status="any", updated_at_min=from_date,
-                                                   updated_at_max=to_date, fields=['gateway'], limit=250)
-                else:
-                    message = str(error.code) + "\n" + json.loads(error.response.body.decode()).get("errors")
-                    raise UserError(message)
+                message = str(error.code) + "\n" + json.loads(error.response.body.decode()).get("errors")
+                raise UserError(message)
+            raise UserError(error)
         except Exception as error:
             raise UserError(error)
 
@@ -58,12 +53,16 @@ class ShopifyPaymentGateway(models.Model):
         @param gateway_name: Payment gateway name.
         @author: Maulik Barad on Date 30-Sep-2020.
         """
+        gateways = self.env["sale.order"].get_shopify_order_import_cache("gateways")
+        if (instance.id, gateway_name) in gateways:
+            return gateways[(instance.id, gateway_name)]
         shopify_payment_gateway = self.search([('code', '=', gateway_name),
                                                ('shopify_instance_id', '=', instance.id)], limit=1)
         if not shopify_payment_gateway:
             shopify_payment_gateway = self.create({'name': gateway_name,
                                                    'code': gateway_name,
                                                    'shopify_instance_id': instance.id})
+        gateways[(instance.id, gateway_name)] = shopify_payment_gateway
         return shopify_payment_gateway
 
     def shopify_search_create_gateway_workflow(self, instance, order_data_queue_line, order_response, log_book_id,
@@ -84,10 +83,14 @@ class ShopifyPaymentGateway(models.Model):
 
         shopify_payment_gateway = self.search_or_create_payment_gateway(instance, gateway)
 
-        workflow_config = self.env['sale.auto.workflow.configuration.ept'].search(
-            [('shopify_instance_id', '=', instance.id),
-             ('payment_gateway_id', '=', shopify_payment_gateway.id),
-             ('financial_status', '=', order_response.get('financial_status'))])
+        workflows = self.env["sale.order"].get_shopify_order_import_cache("workflows")
+        workflow_key = (shopify_payment_gateway.id, order_response.get('financial_status'))
+        if workflow_key not in workflows:
+            workflows[workflow_key] = self.env['sale.auto.workflow.configuration.ept'].search(
+                [('shopify_instance_id', '=', instance.id),
+                 ('payment_gateway_id', '=', shopify_payment_gateway.id),
+                 ('financial_status', '=', order_response.get('financial_status'))])
+        workflow_config = workflows[workflow_key]
         if not workflow_config:
 
             message = "- Automatic order process workflow configuration not found for this order " \
@@ -1,16 +1,14 @@
 # -*- coding: utf-8 -*-
 # See LICENSE file for full copyright and licensing details.
 
-import time
 import json
 import logging
 import re
 from datetime import datetime, timedelta
 
-from odoo import models, fields, api, _
+from odoo import models, fields, api, _, tools
 from odoo.exceptions import UserError
 from .. import shopify
-from ..shopify.pyactiveresource.connection import ClientError
 
 _logger = logging.getLogger("Shopify Product Queue")
 
@@ -51,6 +49,11 @@ class ShopifyProductDataQueue(models.Model):
                                          help="it is used know queue how many time processed")
     skip_existing_product = fields.Boolean(string="Do Not Update Existing Products")
 
+    def init(self):
+        """ Index used to purge the old records, see data.queue.mixin.ept. """
+        super(ShopifyProductDataQueue, self).init()
+        tools.create_index(self._cr, "%s_create_date_index" % self._table, self._table, ["create_date"])
+
     @api.depends("product_data_queue_lines.state")
     def _compute_queue_line_record(self):
         """This is used for count of total record of product queue line base on it's state and
@@ -209,11 +212,6 @@ class ShopifyProductDataQueue(models.Model):
                     page_info = page_link.split(";")[0].strip("<>").split("page_info=")[1]
                     try:
                         result = shopify.Product().find(page_info=page_info, limit=250)
-                    except ClientError as error:
-                        if hasattr(error,
-                                   "response") and error.response.code == 429 and error.response.msg == "Too Many Requests":
-                            time.sleep(int(float(error.response.headers.get('Retry-After', 5))))
-                            result = shopify.Product().find(page_info=page_info, limit=250)
                     except Exception as error:
                         raise UserError(error)
                     if result:
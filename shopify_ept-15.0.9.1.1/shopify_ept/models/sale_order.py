@@ -13,7 +13,6 @@ from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 from ..shopify.pyactiveresource.util import xml_to_dict
 from .. import shopify
-from ..shopify.pyactiveresource.connection import ClientError
 
 utc = pytz.utc
 
@@ -68,6 +67,34 @@ class SaleOrder(models.Model):
         order_ids = list(set(order_ids))
         return [('id', 'in', order_ids)]
 
+    def _compute_is_shopify_shipped_ept(self):
+        """
+        Set is_shopify_shipped_ept when a delivery of the order to the customer is updated in Shopify.
+        """
+        for order in self:
+            order.is_shopify_shipped_ept = bool(order.picking_ids.filtered(
+                lambda x: x.updated_in_shopify and x.state != "cancel" and x.location_dest_id.usage == "customer"))
+
+    def _search_is_shopify_shipped_ept(self, operator, value):
+        query = self.get_shopify_shipped_delivery_query_ept()
+        in_operator = "inselect" if (operator == "=") == bool(value) else "not inselect"
+        return [("id", in_operator, (query, []))]
+
+    @staticmethod
+    def get_shopify_shipped_delivery_query_ept(order_column=False):
+        """
+        This method prepares the query of the orders having a delivery to the customer updated in Shopify, the
+        conditions hold on the same delivery.
+        :param order_column: Column of the order to match, for an exists sub query.
+        :return: Query selecting the ids of the orders.
+        """
+        query = """select sp.sale_id from stock_picking sp
+                   inner join stock_location sl on sl.id = sp.location_dest_id and sl.usage = 'customer'
+                   where sp.updated_in_shopify = true and sp.state != 'cancel' and sp.sale_id is not null"""
+        if order_column:
+            query += " and sp.sale_id = %s" % order_column
+        return query
+
     shopify_order_id = fields.Char("Shopify Order Ref", copy=False)
     shopify_order_number = fields.Char(copy=False)
     shopify_instance_id = fields.Many2one("shopify.instance.ept", "Shopify Instance", copy=False)
@@ -82,6 +109,8 @@ class SaleOrder(models.Model):
     is_risky_order = fields.Boolean("Risky Order?", default=False, copy=False)
     updated_in_shopify = fields.Boolean("Updated In Shopify ?", compute=_get_shopify_order_status,
                                         search='_search_shopify_order_ids')
+    is_shopify_shipped_ept = fields.Boolean("Shipped In Shopify ?", compute=_compute_is_shopify_shipped_ept,
+                                            search='_search_is_shopify_shipped_ept')
     closed_at_ept = fields.Datetime("Closed At", copy=False)
     canceled_in_shopify = fields.Boolean(default=False, copy=False)
     is_pos_order = fields.Boolean("POS Order ?", copy=False, default=False)
@@ -355,7 +384,16 @@ class SaleOrder(models.Model):
         commit_count = 0
         instance = log_book.shopify_instance_id
 
+        if "shopify_order_import_cache" not in self._context:
+            order_import_cache = self.prepare_shopify_order_import_cache(instance, order_data_lines)
+            return self.with_context(shopify_order_import_cache=order_import_cache).import_shopify_orders(
+                order_data_lines, log_book)
+
         instance.connect_in_shopify()
+        order_risks = self.get_shopify_order_import_cache("risks")
+        if not order_risks:
+            order_risks.update(order_risk_obj.shopify_fetch_order_risks(
+                instance, [json.loads(order_data_line.order_data).get("id") for order_data_line in order_data_lines]))
 
         for order_data_line in order_data_lines:
             if commit_count == 5:
@@ -414,7 +452,9 @@ class SaleOrder(models.Model):
             location_vals = self.set_shopify_location_and_warehouse(order_response, instance, pos_order)
             sale_order.write(location_vals)
 
-            risk_result = shopify.OrderRisk().find(order_id=order_response.get("id"))
+            risk_result = order_risks.get(str(order_response.get("id")))
+            if risk_result is None:
+                risk_result = shopify.OrderRisk().find(order_id=order_response.get("id"))
             if risk_result:
                 order_risk_obj.shopify_create_risk_in_order(risk_result, sale_order)
                 risk = sale_order.risk_ids.filtered(lambda x: x.recommendation != "accept")
@@ -472,6 +512,88 @@ class SaleOrder(models.Model):
 
         return order_ids
 
+    def prepare_shopify_order_import_cache(self, instance, order_data_lines):
+        """
+        This method is used to prepare the lookup cache of one order import run. Variants and taxes of all the
+        orders are searched in bulk, the sources, tags, pricelists, payment gateways and workflows are stored on
+        the first lookup. The cache is passed in the context as shopify_order_import_cache.
+        :param instance: Record of instance.
+        :param order_data_lines: Records of order data queue lines.
+        @return: Dictionary of the lookup caches.
+        """
+        account_tax_obj = self.env["account.tax"]
+        order_import_cache = {"variants_by_id": {}, "variants_by_sku": {}, "taxes": {}, "sources": {}, "tags": {},
+                              "pricelists": {}, "gateways": {}, "workflows": {}}
+        company = instance.shopify_warehouse_id.company_id
+        variant_ids = set()
+        skus = set()
+        tax_names = set()
+
+        for order_data_line in order_data_lines:
+            order_response = json.loads(order_data_line.order_data)
+            tax_included = order_response.get("taxes_included") or False
+            tax_lines = []
+            for line in order_response.get("line_items", []):
+                if line.get("variant_id"):
+                    variant_ids.add(str(line.get("variant_id")))
+                if line.get("sku"):
+                    skus.add(line.get("sku"))
+                tax_lines += line.get("tax_lines", [])
+                for duties in line.get("duties") or []:
+                    tax_lines += duties.get("tax_lines", [])
+            for line in order_response.get("shipping_lines", []):
+                tax_lines += line.get("tax_lines", [])
+            for tax in tax_lines:
+                tax_names.add(self.prepare_shopify_tax_name(tax, tax_included, company))
+
+        order_import_cache["variants_by_id"] = self.prefetch_shopify_variants(instance, "variant_id", variant_ids)
+        order_import_cache["variants_by_sku"] = self.prefetch_shopify_variants(instance, "default_code", skus)
+
+        if tax_names:
+            taxes = account_tax_obj.search([("type_tax_use", "=", "sale"), ("name", "in", list(tax_names)),
+                                            ("company_id", "=", company.id)])
+            for tax in taxes:
+                order_import_cache["taxes"].setdefault((tax.name, tax.amount, tax.price_include), tax)
+        return order_import_cache
+
+    def prefetch_shopify_variants(self, instance, field_name, values):
+        """
+        This method is used to search the exported Shopify variants of all the order lines at once.
+        Values without a variant are kept with an empty list, so the order lines do not search them again.
+        :param instance: Record of instance.
+        :param field_name: variant_id or default_code.
+        :param values: Set of variant ids or SKUs of the order lines.
+        @return: Dictionary of value and list of Shopify variant ids.
+        """
+        variants = {value: [] for value in values}
+        if not values:
+            return variants
+        variant_data = self.env["shopify.product.product.ept"].search_read(
+            [("shopify_instance_id", "=", instance.id), ("exported_in_shopify", "=", True),
+             (field_name, "in", list(values))], [field_name])
+        for variant in variant_data:
+            variants[variant[field_name]].append(variant["id"])
+        return variants
+
+    def clear_shopify_missing_variants(self):
+        """
+        This method is used to forget the variants which were not found in the running order import, after a
+        product is synced from Shopify the next lookups search them again.
+        """
+        for cache_name in ["variants_by_id", "variants_by_sku"]:
+            variants = self.get_shopify_order_import_cache(cache_name)
+            for value in [value for value, variant_ids in variants.items() if not variant_ids]:
+                del variants[value]
+        return True
+
+    def get_shopify_order_import_cache(self, cache_name):
+        """
+        This method is used to get one lookup cache of the running order import.
+        Out of an order import, it returns an empty dictionary which is not kept.
+        :param cache_name: Name of the cache like variants_by_id, taxes, sources.
+        """
+        return self._context.get("shopify_order_import_cache", {}).setdefault(cache_name, {})
+
     def import_shopify_cancel_order(self, instance, from_date, to_date):
         """ This method is used if Shopify orders imported in odoo and after Shopify store in some orders are canceled
             then this method cancel imported orders and created a log note.
@@ -482,8 +604,8 @@ class SaleOrder(models.Model):
         """
         shopify_order_data_queue_obj = self.env["shopify.order.data.queue.ept"]
         instance.connect_in_shopify()
-        order_ids = shopify_order_data_queue_obj.shopify_order_request(instance, from_date, to_date, order_type="any")
-        for order in order_ids:
+        order_pages = shopify_order_data_queue_obj.shopify_order_pages(instance, from_date, to_date, order_type="any")
+        for order in (order for page in order_pages for order in page):
             order_data = order.to_dict()
             if order_data.get('cancel_reason'):
                 message = ""
@@ -613,6 +735,7 @@ class SaleOrder(models.Model):
                     shopify_product_template_obj.shopify_sync_products(False, line_product_id,
                                                                        instance, log_book_id,
                                                                        order_data_queue_line)
+                    self.clear_shopify_missing_variants()
                     shopify_variant = self.search_shopify_variant(line, instance)
                     if not shopify_variant:
                         message = "Product [%s][%s] not found for Order %s" % (
@@ -631,15 +754,28 @@ class SaleOrder(models.Model):
         """
         shopify_variant = False
         shopify_product_obj = self.env["shopify.product.product.ept"]
+        variants_by_id = self.get_shopify_order_import_cache("variants_by_id")
+        variants_by_sku = self.get_shopify_order_import_cache("variants_by_sku")
         sku = line.get("sku") or False
-        if line.get("variant_id", None):
-            shopify_variant = shopify_product_obj.search(
-                [("variant_id", "=", line.get("variant_id")),
-                 ("shopify_instance_id", "=", instance.id), ('exported_in_shopify', '=', True)])
+        variant_id = str(line.get("variant_id")) if line.get("variant_id", None) else False
+        if variant_id:
+            if variant_id in variants_by_id:
+                shopify_variant = shopify_product_obj.browse(variants_by_id[variant_id])
+            else:
+                shopify_variant = shopify_product_obj.search(
+                    [("variant_id", "=", line.get("variant_id")),
+                     ("shopify_instance_id", "=", instance.id), ('exported_in_shopify', '=', True)])
+                if shopify_variant:
+                    variants_by_id[variant_id] = shopify_variant.ids
         if not shopify_variant and sku:
-            shopify_variant = shopify_product_obj.search(
-                [("default_code", "=", sku),
-                 ("shopify_instance_id", "=", instance.id), ('exported_in_shopify', '=', True)])
+            if sku in variants_by_sku:
+                shopify_variant = shopify_product_obj.browse(variants_by_sku[sku])
+            else:
+                shopify_variant = shopify_product_obj.search(
+                    [("default_code", "=", sku),
+                     ("shopify_instance_id", "=", instance.id), ('exported_in_shopify', '=', True)])
+                if shopify_variant:
+                    variants_by_sku[sku] = shopify_variant.ids
         return shopify_variant
 
     def shopify_create_order(self, instance, partner, shipping_address, invoice_address,
@@ -769,9 +905,13 @@ class SaleOrder(models.Model):
 
     def create_or_search_sale_tag(self, tag):
         crm_tag_obj = self.env['crm.tag']
+        tags = self.get_shopify_order_import_cache("tags")
+        if tag.lower() in tags:
+            return tags[tag.lower()]
         exists_tag = crm_tag_obj.search([('name', '=ilike', tag)], limit=1)
         if not exists_tag:
             exists_tag = crm_tag_obj.create({'name': tag})
+        tags[tag.lower()] = exists_tag.id
         return exists_tag.id
 
     def convert_order_date(self, order_response):
@@ -829,9 +969,14 @@ class SaleOrder(models.Model):
         Task_id: 187155
         """
         utm_source_obj = self.env['utm.source']
+        sources = self.get_shopify_order_import_cache("sources")
+        source_key = (source or "").lower()
+        if source_key in sources:
+            return sources[source_key]
         source_id = utm_source_obj.search([('name', '=ilike', source)], limit=1)
         if not source_id:
             source_id = utm_source_obj.create({'name': source})
+        sources[source_key] = source_id
         return source_id
 
     def shopify_set_pricelist(self, instance, order_response):
@@ -840,11 +985,23 @@ class SaleOrder(models.Model):
         order currency different then the erp currency so we need to set proper pricelist for that sale order
         otherwise set pricelist based on instance configurations
         """
-        currency_obj = self.env["res.currency"]
-        pricelist_obj = self.env["product.pricelist"]
+        pricelists = self.get_shopify_order_import_cache("pricelists")
         order_currency = order_response.get(
             "presentment_currency") if instance.order_visible_currency else order_response.get(
             "currency") or False
+        if order_currency not in pricelists:
+            pricelists[order_currency] = self.shopify_search_pricelist(instance, order_currency)
+        return pricelists[order_currency]
+
+    def shopify_search_pricelist(self, instance, order_currency):
+        """
+        This method is used to search or create the pricelist of the order currency.
+        :param instance: Record of instance.
+        :param order_currency: Currency code of the order.
+        @return: Record of pricelist.
+        """
+        currency_obj = self.env["res.currency"]
+        pricelist_obj = self.env["product.pricelist"]
         if order_currency:
             currency = currency_obj.search([("name", "=", order_currency)])
             if instance.shopify_pricelist_id.currency_id.id == currency.id:
@@ -877,15 +1034,25 @@ class SaleOrder(models.Model):
             Task Id : 157350
         """
         shopify_product_obj = self.env["shopify.product.product.ept"]
+        variants_by_id = self.get_shopify_order_import_cache("variants_by_id")
+        variants_by_sku = self.get_shopify_order_import_cache("variants_by_sku")
         variant_id = line.get("variant_id")
-        shopify_product = shopify_product_obj.search(
-            [("shopify_instance_id", "=", instance.id), ("variant_id", "=", variant_id),
-             ('exported_in_shopify', '=', True)], limit=1)
+        if variant_id and str(variant_id) in variants_by_id:
+            shopify_product = shopify_product_obj.browse(variants_by_id[str(variant_id)][:1])
+        else:
+            shopify_product = shopify_product_obj.search(
+                [("shopify_instance_id", "=", instance.id), ("variant_id", "=", variant_id),
+                 ('exported_in_shopify', '=', True)], limit=1)
         if not shopify_product:
-            shopify_product = shopify_product_obj.search([("shopify_instance_id", "=", instance.id),
-                                                          ("default_code", "=", line.get("sku")),
-                                                          ('exported_in_shopify', '=', True)], limit=1)
+            if line.get("sku") in variants_by_sku:
+                shopify_product = shopify_product_obj.browse(variants_by_sku[line.get("sku")][:1])
+            else:
+                shopify_product = shopify_product_obj.search([("shopify_instance_id", "=", instance.id),
+                                                              ("default_code", "=", line.get("sku")),
+                                                              ('exported_in_shopify', '=', True)], limit=1)
             shopify_product.write({"variant_id": variant_id})
+        if shopify_product and variant_id and not variants_by_id.get(str(variant_id)):
+            variants_by_id[str(variant_id)] = shopify_product.ids
         return shopify_product
 
     def shopify_create_sale_order_line(self, line, product, quantity, product_name, price,
@@ -1002,27 +1169,41 @@ class SaleOrder(models.Model):
         tax_id = []
         taxes = []
         company = instance.shopify_warehouse_id.company_id
+        taxes_cache = self.get_shopify_order_import_cache("taxes")
         for tax in tax_lines:
             rate = float(tax.get("rate", 0.0))
             price = float(tax.get('price', 0.0))
-            title = tax.get("title")
             rate = rate * 100
             if rate != 0.0 and price != 0.0:
-                if tax_included:
-                    name = "%s_(%s %s included)_%s" % (title, str(rate), "%", company.name)
-                else:
-                    name = "%s_(%s %s excluded)_%s" % (title, str(rate), "%", company.name)
-                tax_id = self.env["account.tax"].search([("price_include", "=", tax_included),
-                                                         ("type_tax_use", "=", "sale"), ("amount", "=", rate),
-                                                         ("name", "=", name), ("company_id", "=", company.id)], limit=1)
+                name = self.prepare_shopify_tax_name(tax, tax_included, company)
+                tax_id = taxes_cache.get((name, rate, tax_included))
+                if not tax_id:
+                    tax_id = self.env["account.tax"].search([("price_include", "=", tax_included),
+                                                             ("type_tax_use", "=", "sale"), ("amount", "=", rate),
+                                                             ("name", "=", name), ("company_id", "=", company.id)],
+                                                            limit=1)
                 if not tax_id:
                     tax_id = self.sudo().shopify_create_account_tax(instance, rate, tax_included, company, name)
                 if tax_id:
+                    taxes_cache[(name, rate, tax_included)] = tax_id
                     taxes.append(tax_id.id)
         if taxes:
             tax_id = [(6, 0, taxes)]
         return tax_id
 
+    @api.model
+    def prepare_shopify_tax_name(self, tax, tax_included, company):
+        """This method is used to prepare the name of the tax created for a tax line of the order response.
+            :param tax: Tax line of the order response.
+            :param tax_included: True if the taxes are included in the price.
+            :param company: Record of company.
+            @return: Name of the tax.
+        """
+        rate = float(tax.get("rate", 0.0)) * 100
+        if tax_included:
+            return "%s_(%s %s included)_%s" % (tax.get("title"), str(rate), "%", company.name)
+        return "%s_(%s %s excluded)_%s" % (tax.get("title"), str(rate), "%", company.name)
+
     @api.model
     def shopify_create_account_tax(self, instance, value, price_included, company, name):
         """This method used to create tax in Odoo when importing orders from Shopify to Odoo.
@@ -1404,10 +1585,6 @@ class SaleOrder(models.Model):
             fulfillment_result = new_fulfillment.save()
             if not fulfillment_result:
                 return False, fulfillment_result, new_fulfillment
-        except ClientError as error:
-            if hasattr(error, "response") and error.response.code == 429 and error.response.msg == "Too Many Requests":
-                time.sleep(int(float(error.response.headers.get('Retry-After', 5))))
-                fulfillment_result = new_fulfillment.save()
         except Exception as error:
             message = "%s" % str(error)
             _logger.info(message)
@@ -1917,24 +2094,22 @@ class SaleOrder(models.Model):
         invoiceable_lines = super(SaleOrder, self)._get_invoiceable_lines(final)
         return invoiceable_lines
 
-    def paid_invoice_ept(self, invoices):
+    def prepare_invoice_payments_ept(self, invoices):
         """
         Override the common connector library method here to create separate payment records.
         Override by Meera Sidapara on date 16/11/2021.
         """
         self.ensure_one()
-        account_payment_obj = self.env['account.payment']
         if self.is_shopify_multi_payment:
+            payment_data = []
             for invoice in invoices:
                 if invoice.amount_residual:
                     for payment in self.shopify_payment_ids:
                         vals = invoice.prepare_payment_dict(payment.workflow_id)
                         vals.update({'amount': payment.amount})
-                        payment_id = account_payment_obj.create(vals)
-                        payment_id.action_post()
-                        self.reconcile_payment_ept(payment_id, invoice)
-            return True
-        super(SaleOrder, self).paid_invoice_ept(invoices)
+                        payment_data.append((vals, invoice))
+            return payment_data
+        return super(SaleOrder, self).prepare_invoice_payments_ept(invoices)
 
     def create_schedule_activity_against_logbook(self, log_book_id, mismatch_record, note):
         """
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# See LICENSE file for full copyright and licensing details.
+
+from odoo import models, fields
+
+
+class ShopifyExportedStockEpt(models.Model):
+    _name = "shopify.exported.stock.ept"
+    _description = "Shopify Last Exported Stock"
+
+    shopify_instance_id = fields.Many2one("shopify.instance.ept", string="Instance", ondelete="cascade")
+    shopify_product_id = fields.Many2one("shopify.product.product.ept", string="Product", required=True,
+                                         ondelete="cascade", index=True)
+    shopify_location_id = fields.Char(required=True, help="Shopify location id in which the quantity is exported.")
+    quantity = fields.Integer(help="Quantity exported to the Shopify location last time.")
+    last_export_date = fields.Datetime()
+
+    _sql_constraints = [("shopify_product_location_unique", "unique(shopify_product_id, shopify_location_id)",
+                         "Exported stock must be unique per Shopify product and location.")]
+
+    def get_exported_stock(self, instance):
+        """
+        This method is used to get the quantities exported last time for an instance.
+        @param instance: Record of instance.
+        @return: Dictionary of (shopify product id, shopify location id) and quantity.
+        """
+        self._cr.execute("""select shopify_product_id, shopify_location_id, quantity
+                            from shopify_exported_stock_ept where shopify_instance_id = %s""", (instance.id,))
+        return {(product_id, location_id): quantity for product_id, location_id, quantity in self._cr.fetchall()}
+
+    def set_exported_stock(self, instance, exported_stock):
+        """
+        This method is used to store the quantities which are exported successfully.
+        @param instance: Record of instance.
+        @param exported_stock: List of (shopify product id, shopify location id, quantity) tuples, when a product
+        and location is listed more than once the last quantity is stored.
+        """
+        if not exported_stock:
+            return True
+        # A row can be updated only once by the insert, the last quantity exported for a product and location wins.
+        quantities = {(product_id, str(location_id)): int(quantity)
+                      for product_id, location_id, quantity in exported_stock}
+        values = [(instance.id, product_id, location_id, quantity, self.env.uid, self.env.uid)
+                  for (product_id, location_id), quantity in quantities.items()]
+        self._cr.execute("""insert into shopify_exported_stock_ept
+                            (shopify_instance_id, shopify_product_id, shopify_location_id, quantity,
+                             last_export_date, create_uid, write_uid, create_date, write_date)
+                            select v.instance_id, v.product_id, v.location_id, v.quantity,
+                                   now() at time zone 'UTC', v.create_uid, v.write_uid,
+                                   now() at time zone 'UTC', now() at time zone 'UTC'
+                            from (values %s) as v(instance_id, product_id, location_id, quantity, create_uid,
+                                                  write_uid)
+                            on conflict (shopify_product_id, shopify_location_id) do update
+                            set quantity = excluded.quantity, last_export_date = excluded.last_export_date,
+                                write_uid = excluded.write_uid, write_date = excluded.write_date"""
+                         % ",".join(["%s"] * len(values)), values)
+        self.invalidate_cache()
+        return True
@@ -1,13 +1,11 @@
 # -*- coding: utf-8 -*-
 # See LICENSE file for full copyright and licensing details.
 import logging
-import time
 
 from datetime import datetime
 from odoo import models, fields, _
 from odoo.exceptions import UserError
 from .. import shopify
-from ..shopify.pyactiveresource.connection import ClientError
 
 _logger = logging.getLogger('Shopify Payout')
 
@@ -163,11 +161,6 @@ class ShopifyPaymentReportEpt(models.Model):
                     page_info = page_link.split(";")[0].strip("<>").split("page_info=")[1]
                     try:
                         result = shopify.Transactions().find(page_info=page_info, limit=250)
-                    except ClientError as error:
-                        if hasattr(error, "response"):
-                            if error.response.code == 429 and error.response.msg == "Too Many Requests":
-                                time.sleep(int(float(error.response.headers.get('Retry-After', 5))))
-                                result = shopify.Transactions().find(page_info=page_info, limit=250)
                     except Exception as error:
                         raise UserError(error)
             if catch == page_info:
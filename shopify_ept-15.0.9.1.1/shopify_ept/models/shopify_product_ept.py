@@ -3,7 +3,6 @@
 
 import json
 import logging
-import time
 from datetime import datetime
 
 from odoo import models, fields, api
@@ -13,6 +12,19 @@ from ..shopify.pyactiveresource.connection import ClientError
 from ..shopify.pyactiveresource.connection import ResourceNotFound
 
 _logger = logging.getLogger("Shopify Product")
+# Shopify accepts at most 250 quantities per inventorySetQuantities mutation.
+SHOPIFY_INVENTORY_BULK_SIZE = 250
+SHOPIFY_INVENTORY_SET_QUANTITIES = """
+mutation inventorySetQuantities($input: InventorySetQuantitiesInput!) {
+  inventorySetQuantities(input: $input) {
+    userErrors {
+      code
+      field
+      message
+    }
+  }
+}
+"""
 
 
 class ShopifyProductProductEpt(models.Model):
@@ -387,12 +399,6 @@ class ShopifyProductProductEpt(models.Model):
                         try:
                             result = shopify.Product().find(page_info=page_info, limit=250)
                             data_dict += result
-                        except ClientError as error:
-                            if hasattr(error,
-                                       "response") and error.response.code == 429 and error.response.msg == "Too Many Requests":
-                                time.sleep(int(float(error.response.headers.get('Retry-After', 5))))
-                                result = shopify.Product().find(page_info=page_info, limit=250)
-                                data_dict += result
                         except Exception as error:
                             continue
                 if catch == page_info:
@@ -419,10 +425,6 @@ class ShopifyProductProductEpt(models.Model):
             return False
         try:
             new_product = shopify.Product().find(template.shopify_tmpl_id)
-        except ClientError as error:
-            if hasattr(error, "response") and error.response.code == 429 and error.response.msg == "Too Many Requests":
-                time.sleep(int(float(error.response.headers.get('Retry-After', 5))))
-                new_product = shopify.Product().find(template.shopify_tmpl_id)
         except Exception as error:
             message = "Template %s not found in shopify while updating Product.\nError: %s" % (
                 template.shopify_tmpl_id, str(error))
@@ -650,9 +652,8 @@ class ShopifyProductProductEpt(models.Model):
         try:
             shopify_images = shopify.Image().find(product_id=int(shopify_template.shopify_tmpl_id))
         except ClientError as error:
-            if hasattr(error, "response") and error.response.code == 429 and error.response.msg == "Too Many Requests":
-                time.sleep(int(float(error.response.headers.get('Retry-After', 5))))
-                shopify_images = shopify.Image().find(product_id=shopify_template.shopify_tmpl_id)
+            _logger.info("Product images not found in Shopify for product %s.\nError: %s",
+                         shopify_template.shopify_tmpl_id, str(error))
 
         return shopify_images
 
@@ -707,6 +708,10 @@ class ShopifyProductProductEpt(models.Model):
             shopify_products = shopify_template_ids.filtered(
                 lambda template: template.id in shopify_templates.ids).shopify_product_ids
 
+        bulk_stock_data = []
+        exported_stock = []
+        location_stock = self.check_stock_by_location(instance, shopify_products.product_id.ids, product_obj,
+                                                      location_ids)
         for location_id in location_ids:
             shopify_location_warehouse = location_id.export_stock_warehouse_ids or False
             if not shopify_location_warehouse:
@@ -714,9 +719,7 @@ class ShopifyProductProductEpt(models.Model):
                 log_line_array = self.shopify_create_log(message, model_id, False, log_line_array)
                 continue
 
-            odoo_product_ids = shopify_products.product_id.ids
-            product_stock = self.check_stock(instance, odoo_product_ids, product_obj,
-                                             location_id.export_stock_warehouse_ids)
+            product_stock = location_stock[location_id.id]
             commit_count = 0
             for shopify_product in shopify_products:
                 if commit_count == 50:
@@ -733,45 +736,48 @@ class ShopifyProductProductEpt(models.Model):
                         continue
 
                     quantity = self.compute_qty_for_export_stock(product_stock, shopify_product, odoo_product)
-                    try:
-                        shopify.InventoryLevel.set(location_id.shopify_location_id, shopify_product.inventory_item_id,
-                                                   int(quantity))
-                    except ClientError as error:
-                        if hasattr(error,
-                                   "response") and error.response.code == 429 and error.response.msg == "Too Many Requests":
-                            time.sleep(int(float(error.response.headers.get('Retry-After', 5))))
-                            shopify.InventoryLevel.set(location_id.shopify_location_id,
-                                                       shopify_product.inventory_item_id,
+                    if instance.is_shopify_bulk_export_stock:
+                        bulk_stock_data.append({'shopify_product': shopify_product,
+                                                'location_id': location_id.shopify_location_id,
+                                                'inventory_item_id': shopify_product.inventory_item_id,
+                                                'quantity': int(quantity)})
+                    else:
+                        try:
+                            shopify.InventoryLevel.set(location_id.shopify_location_id, shopify_product.inventory_item_id,
                                                        int(quantity))
-                            continue
-                        elif error.response.code == 422 and error.response.msg == "Unprocessable Entity":
-                            if json.loads(error.response.body.decode()).get("errors")[
-                                0] == 'Inventory item does not have inventory tracking enabled':
-                                shopify_product.write({'inventory_management': "Dont track Inventory"})
-                            continue
-                        message = "Error while Export stock for Product ID: %s & Product Name: '%s' for instance:" \
-                                  "'%s'\nError: %s\n%s" % (odoo_product.id, odoo_product.name, instance.name,
-                                                           str(error.response.code) + " " + error.response.msg,
-                                                           json.loads(error.response.body.decode()).get("errors")[0]
-                                                           )
-                        log_line_array = self.shopify_create_log(message, model_id, odoo_product, log_line_array)
-                    except ResourceNotFound as error:
-                        if hasattr(error, "response"):
+                            exported_stock.append((shopify_product.id, location_id.shopify_location_id, int(quantity)))
+                        except ClientError as error:
+                            if error.response.code == 422 and error.response.msg == "Unprocessable Entity":
+                                if json.loads(error.response.body.decode()).get("errors")[
+                                    0] == 'Inventory item does not have inventory tracking enabled':
+                                    shopify_product.write({'inventory_management': "Dont track Inventory"})
+                                continue
                             message = "Error while Export stock for Product ID: %s & Product Name: '%s' for instance:" \
-                                      "'%s'not found in Shopify store\nError: %s\n%s" % (
-                                          odoo_product.id, odoo_product.name, instance.name,
-                                          str(error.response.code) + " " + error.response.msg,
-                                          json.loads(error.response.body.decode()).get("errors")[0]
-                                      )
+                                      "'%s'\nError: %s\n%s" % (odoo_product.id, odoo_product.name, instance.name,
+                                                               str(error.response.code) + " " + error.response.msg,
+                                                               json.loads(error.response.body.decode()).get("errors")[0]
+                                                               )
+                            log_line_array = self.shopify_create_log(message, model_id, odoo_product, log_line_array)
+                        except ResourceNotFound as error:
+                            if hasattr(error, "response"):
+                                message = "Error while Export stock for Product ID: %s & Product Name: '%s' for instance:" \
+                                          "'%s'not found in Shopify store\nError: %s\n%s" % (
+                                              odoo_product.id, odoo_product.name, instance.name,
+                                              str(error.response.code) + " " + error.response.msg,
+                                              json.loads(error.response.body.decode()).get("errors")[0]
+                                          )
+                                log_line_array = self.shopify_create_log(message, model_id, odoo_product, log_line_array)
+                        except Exception as error:
+                            message = "Error while Export stock for Product ID: %s & Product Name: '%s' for instance: " \
+                                      "'%s'\nError: %s" % (odoo_product.id, odoo_product.name, instance.name, str(error))
                             log_line_array = self.shopify_create_log(message, model_id, odoo_product, log_line_array)
-                    except Exception as error:
-                        message = "Error while Export stock for Product ID: %s & Product Name: '%s' for instance: " \
-                                  "'%s'\nError: %s" % (odoo_product.id, odoo_product.name, instance.name, str(error))
-                        log_line_array = self.shopify_create_log(message, model_id, odoo_product, log_line_array)
 
                     if not self._context.get('is_process_from_selected_product'):
                         shopify_product.write({
                             'last_stock_update_date': last_export_date if not shopify_product.last_stock_update_date else datetime.now()})
+        if bulk_stock_data:
+            log_line_array = self.shopify_export_stock_in_bulk(instance, bulk_stock_data, model_id, log_line_array)
+        self.env["shopify.exported.stock.ept"].set_exported_stock(instance, exported_stock)
         log_book_id = False
         if len(log_line_array) > 0:
             log_book_id = self.create_log_book(log_line_array, "export", instance)
@@ -844,6 +850,12 @@ class ShopifyProductProductEpt(models.Model):
                     lambda template: template.id in shopify_templates.ids).shopify_product_ids
 
         export_stock_data = []
+        exported_stock = {}
+        if instance.is_shopify_export_changed_stock_only and not self._context.get('is_process_from_selected_product'):
+            # Quantities which are already in Shopify are not added in the queue again.
+            exported_stock = self.env["shopify.exported.stock.ept"].get_exported_stock(instance)
+        location_stock = self.check_stock_by_location(instance, shopify_products.product_id.ids, product_obj,
+                                                      location_ids)
         for location_id in location_ids:
             shopify_location_warehouse = location_id.export_stock_warehouse_ids or False
             if not shopify_location_warehouse:
@@ -851,9 +863,7 @@ class ShopifyProductProductEpt(models.Model):
                 log_line_array = self.shopify_create_log(message, model_id, False, log_line_array)
                 continue
 
-            odoo_product_ids = shopify_products.product_id.ids
-            product_stock = self.check_stock(instance, odoo_product_ids, product_obj,
-                                             location_id.export_stock_warehouse_ids)
+            product_stock = location_stock[location_id.id]
             commit_count = 0
             for shopify_product in shopify_products:
                 if commit_count == 50:
@@ -871,11 +881,12 @@ class ShopifyProductProductEpt(models.Model):
 
                     quantity = self.compute_qty_for_export_stock(product_stock, shopify_product, odoo_product)
 
-                    export_stock_data.append({'product_name': shopify_product.default_code,
-                                              'shopify_product_id': shopify_product,
-                                              'location_id': location_id.shopify_location_id,
-                                              'inventory_item_id': shopify_product.inventory_item_id,
-                                              'quantity': int(quantity)})
+                    if exported_stock.get((shopify_product.id, location_id.shopify_location_id)) != int(quantity):
+                        export_stock_data.append({'product_name': shopify_product.default_code,
+                                                  'shopify_product_id': shopify_product,
+                                                  'location_id': location_id.shopify_location_id,
+                                                  'inventory_item_id': shopify_product.inventory_item_id,
+                                                  'quantity': int(quantity)})
 
                     if not self._context.get('is_process_from_selected_product'):
                         shopify_product.write({
@@ -891,6 +902,100 @@ class ShopifyProductProductEpt(models.Model):
             return False
         return export_stock_queue
 
+    def shopify_set_inventory_quantities_in_bulk(self, instance, stock_data):
+        """ This method is used to set the available quantities in Shopify through the GraphQL
+            inventorySetQuantities mutation, SHOPIFY_INVENTORY_BULK_SIZE quantities per request.
+            :param instance: Record of instance.
+            :param stock_data: List of dictionaries with inventory_item_id, location_id and quantity.
+            @return: Dictionary of the stock_data index and the error of every rejected quantity.
+        """
+        errors = {}
+        for start in range(0, len(stock_data), SHOPIFY_INVENTORY_BULK_SIZE):
+            indexes = list(range(start, min(start + SHOPIFY_INVENTORY_BULK_SIZE, len(stock_data))))
+            errors.update(self.shopify_set_inventory_quantities_batch(instance, stock_data, indexes))
+        return errors
+
+    def shopify_set_inventory_quantities_batch(self, instance, stock_data, indexes):
+        """ This method is used to send one inventorySetQuantities mutation and map its user errors
+            back to the stock_data entries. The mutation is all or nothing, so the accepted quantities
+            are sent again without the rejected ones.
+            :param instance: Record of instance.
+            :param stock_data: List of dictionaries with inventory_item_id, location_id and quantity.
+            :param indexes: Indexes of stock_data sent in this mutation.
+            @return: Dictionary of the stock_data index and the error dictionary(code, message).
+        """
+        errors = {}
+        while indexes:
+            variables = {"input": {
+                "name": "available",
+                "reason": "correction",
+                "ignoreCompareQuantity": True,
+                "quantities": [{
+                    "inventoryItemId": "gid://shopify/InventoryItem/%s" % stock_data[index]["inventory_item_id"],
+                    "locationId": "gid://shopify/Location/%s" % stock_data[index]["location_id"],
+                    "quantity": int(stock_data[index]["quantity"]),
+                } for index in indexes]}}
+            try:
+                result = instance.shopify_execute_graphql(SHOPIFY_INVENTORY_SET_QUANTITIES, variables)
+            except Exception as error:
+                errors.update({index: {"code": False, "message": str(error)} for index in indexes})
+                return errors
+
+            if result.get("errors"):
+                message = result["errors"] if isinstance(result["errors"], str) else "\n".join(
+                    [error.get("message", "") for error in result["errors"]])
+                errors.update({index: {"code": False, "message": message} for index in indexes})
+                return errors
+
+            user_errors = (result.get("data") or {}).get("inventorySetQuantities", {}).get("userErrors") or []
+            if not user_errors:
+                return errors
+
+            rejected_indexes = set()
+            for user_error in user_errors:
+                field = user_error.get("field") or []
+                # Field of a quantity error looks like ["input", "quantities", "3", "locationId"].
+                if len(field) > 2 and field[1] == "quantities" and str(field[2]).isdigit() and \
+                        int(field[2]) < len(indexes):
+                    index = indexes[int(field[2])]
+                    rejected_indexes.add(index)
+                    errors[index] = {"code": user_error.get("code"), "message": user_error.get("message")}
+                else:
+                    errors.update({index: {"code": user_error.get("code"), "message": user_error.get("message")}
+                                   for index in indexes})
+                    return errors
+            indexes = [index for index in indexes if index not in rejected_indexes]
+        return errors
+
+    def is_shopify_untracked_inventory_error(self, error):
+        """ This method is used to check the error is raised because inventory tracking is disabled for
+            the inventory item in Shopify.
+            :param error: Error dictionary returned by shopify_set_inventory_quantities_in_bulk.
+        """
+        return "inventory tracking" in (error.get("message") or "").lower()
+
+    def shopify_export_stock_in_bulk(self, instance, bulk_stock_data, model_id, log_line_array):
+        """ This method is used to export the prepared stock data in bulk and prepare the log lines for
+            rejected quantities.
+            :param bulk_stock_data: List of dictionaries with shopify_product, inventory_item_id,
+            location_id and quantity.
+            @return: log_line_array
+        """
+        errors = self.shopify_set_inventory_quantities_in_bulk(instance, bulk_stock_data)
+        self.env["shopify.exported.stock.ept"].set_exported_stock(instance, [
+            (data["shopify_product"].id, data["location_id"], data["quantity"])
+            for index, data in enumerate(bulk_stock_data) if index not in errors])
+        for index, error in errors.items():
+            shopify_product = bulk_stock_data[index]["shopify_product"]
+            if self.is_shopify_untracked_inventory_error(error):
+                shopify_product.write({'inventory_management': "Dont track Inventory"})
+                continue
+            odoo_product = shopify_product.product_id
+            message = "Error while Export stock for Product ID: %s & Product Name: '%s' for instance:" \
+                      "'%s'\nError: %s" % (odoo_product.id, odoo_product.name, instance.name, error.get("message"))
+            log_line_array = self.shopify_create_log(message, model_id, odoo_product, log_line_array)
+        return log_line_array
+
     def compute_qty_for_export_stock(self, product_stock, shopify_product, odoo_product):
         """ This method is used to find qty base on the configuration of Shopify.
             :param product_stock: Dictionary of the odoo product with qty.
@@ -923,25 +1028,27 @@ class ShopifyProductProductEpt(models.Model):
                                        order='last_stock_update_date')
         return shopify_products
 
-    def check_stock(self, instance, product_ids, prod_obj, warehouse):
+    def check_stock_by_location(self, instance, product_ids, prod_obj, location_ids):
         """
-        This Method relocates check type of stock.
+        This Method relocates check type of stock for all the Shopify locations at once.
         :param instance: This arguments relocates instance of Shopify.
         :param product_ids: This arguments product listing id of odoo.
         :param prod_obj: This argument relocates product object of common connector.
-        :param warehouse:This arguments relocates warehouse of shopify export location.
-        :return: This Method return product listing stock.
+        :param location_ids: Records of shopify locations, the stock of their export warehouses is used.
+        :return: This Method return dictionary of location id and product listing stock.
         """
-        product_stock = {}
-
-        if product_ids:
-            if instance.shopify_stock_field.name == "free_qty":
-                product_stock = prod_obj.get_free_qty_ept(warehouse, product_ids)
+        location_stock = {location_id.id: {} for location_id in location_ids}
+        stock_field = instance.shopify_stock_field.name
+        location_ids = location_ids.filtered(lambda location: location.export_stock_warehouse_ids)
 
-            elif instance.shopify_stock_field.name == "virtual_available":
-                product_stock = prod_obj.get_forecasted_qty_ept(warehouse, product_ids)
+        if product_ids and location_ids and stock_field in ["free_qty", "virtual_available"]:
+            group_stock = prod_obj.get_stock_qty_by_warehouses_ept(
+                [location_id.export_stock_warehouse_ids for location_id in location_ids], product_ids)
+            for location_id, product_stock in zip(location_ids, group_stock):
+                location_stock[location_id.id] = {product_id: quantities[stock_field]
+                                                  for product_id, quantities in product_stock.items()}
 
-        return product_stock
+        return location_stock
 
     def import_shopify_stock(self, instance, validate_inventory):
         """
@@ -1081,11 +1188,6 @@ class ShopifyProductProductEpt(models.Model):
                     page_info = page_link.split(";")[0].strip("<>").split("page_info=")[1]
                     try:
                         result = shopify.InventoryLevel.find(page_info=page_info, limit=250)
-                    except ClientError as error:
-                        if hasattr(error,
-                                   "response") and error.response.code == 429 and error.response.msg == "Too Many Requests":
-                            time.sleep(int(float(error.response.headers.get('Retry-After', 5))))
-                            result = shopify.InventoryLevel.find(page_info=page_info, limit=250)
                     except Exception as error:
                         raise UserError(error)
             if catch == page_info:
@@ -3,12 +3,15 @@ from . pyactiveresource.activeresource import ActiveResource, ResourceMeta, form
 from . import yamlobjects
 from . import mixins as mixins
 from .. import shopify
+import random
 import threading
 import sys
+import time
 from six.moves import urllib
 import six
 
 from .collection import PaginatedCollection
+from .limits import CallLimitBucket, get_header
 from . pyactiveresource.collection import Collection
 
 # Store the response from the last request in the connection object
@@ -17,17 +20,54 @@ from . pyactiveresource.collection import Collection
 class ShopifyConnection(pyactiveresource.connection.Connection):
     response = None
 
+    # Retries of a throttled (429) or transiently failing (5xx) request before the error is raised.
+    max_retries = 5
+    backoff_base = 1.0
+    backoff_cap = 32.0
+    # 5xx codes which mean the request never reached the shop, safe to replay for any method.
+    retry_any_method_codes = (502, 503, 504)
+    idempotent_methods = ("GET", "HEAD", "PUT", "DELETE")
+
     def __init__(self, site, user=None, password=None, timeout=None, format=formats.JSONFormat):
         super(ShopifyConnection, self).__init__(site, user, password, timeout, format)
+        self.bucket = CallLimitBucket.for_site(self.site)
+
+    def _backoff(self, attempt):
+        """Exponential backoff with full jitter."""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
 
-    def _open(self, *args, **kwargs):
-        self.response = None
+    def _retry_after(self, response, attempt):
+        retry_after = get_header(getattr(response, "headers", None), "Retry-After")
         try:
-            self.response = super(ShopifyConnection, self)._open(*args, **kwargs)
-        except pyactiveresource.connection.ConnectionError as err:
-            self.response = err.response
-            raise
-        return self.response
+            return float(retry_after) + random.uniform(0, self.backoff_base)
+        except (TypeError, ValueError):
+            return self._backoff(attempt) + self.backoff_base
+
+    def _can_retry_server_error(self, method, code):
+        if code in self.retry_any_method_codes:
+            return True
+        return code and 500 <= code < 600 and method in self.idempotent_methods
+
+    def _open(self, method, path, headers=None, data=None):
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            self.response = None
+            try:
+                self.response = super(ShopifyConnection, self)._open(method, path, headers=headers, data=data)
+                self.bucket.update(self.response)
+                return self.response
+            except pyactiveresource.connection.ConnectionError as err:
+                self.response = err.response
+                self.bucket.update(err.response)
+                if err.code != 429 or attempt >= self.max_retries:
+                    raise
+                self.bucket.block(self._retry_after(err.response, attempt))
+            except pyactiveresource.connection.ServerError as err:
+                if attempt >= self.max_retries or not self._can_retry_server_error(method, err.code):
+                    raise
+                time.sleep(self._backoff(attempt))
+            attempt += 1
 
 
 # Inherit from pyactiveresource's metaclass in order to use ShopifyConnection
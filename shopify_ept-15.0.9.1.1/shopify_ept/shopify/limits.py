@@ -1,3 +1,6 @@
+import threading
+import time
+
 from .. import shopify
 
 
@@ -60,3 +63,103 @@ class Limits(object):
         How many API calls have I made?
         """
         return int(cls.api_credit_limit_param()[0])
+
+
+def get_header(headers, name):
+    """
+    Case-insensitive header lookup, the REST responses keep the casing sent by Shopify.
+    """
+    if not headers:
+        return None
+    if name in headers:
+        return headers[name]
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+class CallLimitBucket(object):
+    """
+    Client side mirror of the per shop leaky bucket used by the REST Admin API.
+
+    Every response carries X-Shopify-Shop-Api-Call-Limit ("used/max"), the bucket is re-synced
+    from it and leaks at max/20 calls per second (2/s for 40, 4/s for Plus stores with 80).
+    Callers reserve a slot through acquire() before each request, so requests are paced before
+    Shopify starts answering with 429 instead of after. One bucket is shared by every thread
+    talking to the same shop.
+    """
+
+    LEAK_WINDOW = 20.0
+    # Part of the bucket kept free for other apps and webhooks sharing the same shop credits.
+    HEADROOM = 0.1
+    DEFAULT_MAX_REQUESTS = 40
+
+    _buckets = {}
+    _registry_lock = threading.Lock()
+
+    @classmethod
+    def for_site(cls, site):
+        with cls._registry_lock:
+            bucket = cls._buckets.get(site)
+            if bucket is None:
+                bucket = cls._buckets[site] = cls()
+            return bucket
+
+    def __init__(self, max_requests=DEFAULT_MAX_REQUESTS):
+        self.lock = threading.Lock()
+        self.max_requests = max_requests
+        self.level = 0.0
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _leak_rate(self):
+        return self.max_requests / self.LEAK_WINDOW
+
+    def _leak(self, now):
+        self.level = max(0.0, self.level - (now - self.updated_at) * self._leak_rate())
+        self.updated_at = now
+
+    def acquire(self):
+        """
+        Block until one more call fits in the bucket and reserve it.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._leak(now)
+                wait = self.blocked_until - now
+                if wait <= 0:
+                    threshold = self.max_requests * (1 - self.HEADROOM)
+                    if self.level + 1 <= threshold:
+                        self.level += 1
+                        return
+                    wait = (self.level + 1 - threshold) / self._leak_rate()
+            time.sleep(wait)
+
+    def update(self, response):
+        """
+        Re-sync the bucket from the call limit header of a response, if present.
+        """
+        credits = get_header(getattr(response, "headers", None), Limits.CREDIT_LIMIT_HEADER_PARAM)
+        if not credits:
+            return
+        try:
+            used, limit = [int(value) for value in credits.split("/")]
+        except ValueError:
+            return
+        with self.lock:
+            self._leak(time.monotonic())
+            self.max_requests = limit or self.DEFAULT_MAX_REQUESTS
+            self.level = float(used)
+
+    def block(self, delay):
+        """
+        Hold every caller of this shop for delay seconds, used when Shopify answered with 429.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._leak(now)
+            self.level = float(self.max_requests)
+            self.blocked_until = max(self.blocked_until, now + delay)
@@ -3,12 +3,14 @@
 """A connection object to interface with REST services."""
 
 import base64
+import io
 import logging
 import socket
 import sys
 import six
 from six.moves import urllib
 from . import formats
+from . import pool
 
 
 class Error(Exception):
@@ -123,6 +125,10 @@ class Request(urllib.request.Request):
         self._method = method
 
 
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = urllib.request.HTTPRedirectHandler.max_redirections
+
+
 def _urllib_has_timeout():
   """Determines if our version of urllib.request.urlopen has a timeout argument."""
   # NOTE: This is a terrible hack, but there's no other indication that this
@@ -188,6 +194,11 @@ class Response(object):
 class Connection(object):
     """A connection object to interface with REST services."""
 
+    # Send requests over pooled keep-alive connections instead of a new
+    # urllib connection per request.
+    keep_alive = True
+    pool_size = 10
+
     def __init__(self, site, user=None, password=None, timeout=None,
                  format=formats.JSONFormat):
 
@@ -312,11 +323,39 @@ class Connection(object):
             urllib.error.HTTPError on server errors.
             urllib.error.URLError on IO errors.
         """
+        redirects = 0
+        while self._can_use_pool(request):
+            response = pool.get_pool(request.type, request.host, self.pool_size).urlopen(
+                request, timeout=self.timeout)
+            location = response.code in REDIRECT_CODES and response.headers.get('Location')
+            if not location:
+                return response
+            # Follow the redirect from the pooled response like urllib does, so
+            # the request itself is never sent twice.
+            if redirects == MAX_REDIRECTS:
+                raise urllib.error.HTTPError(
+                    request.full_url, response.code,
+                    urllib.request.HTTPRedirectHandler.inf_msg + response.msg,
+                    response.headers, io.BytesIO(response.body))
+            redirects += 1
+            request = urllib.request.HTTPRedirectHandler().redirect_request(
+                request, io.BytesIO(response.body), response.code, response.msg,
+                response.headers, urllib.parse.urljoin(request.full_url, location))
         if _urllib_has_timeout():
           return urllib.request.urlopen(request, timeout=self.timeout)
         else:
           return urllib.request.urlopen(request)
 
+    def _can_use_pool(self, request):
+        """Whether a request can go through the keep-alive pool.
+
+        Proxied requests keep using urllib, which honours the proxy settings.
+        """
+        if not self.keep_alive or request.type not in ('http', 'https'):
+            return False
+        return not (request.type in urllib.request.getproxies()
+                    and not urllib.request.proxy_bypass(request.host))
+
     def get(self, path, headers=None):
         """Perform an HTTP get request.
 
@@ -0,0 +1,153 @@
+"""Keep-alive HTTP connection pool used by Connection."""
+
+import gzip
+import threading
+from six.moves import http_client, queue, urllib
+
+
+# Errors raised when an idle keep-alive socket was closed by the server in the
+# meantime. The request never reached the server, so it is safe to send it again
+# on a fresh connection.
+STALE_CONNECTION_ERRORS = (http_client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+
+class PooledResponse(object):
+    """A fully read HTTP response whose socket went back to the pool.
+
+    Provides the attributes of the urllib response objects which
+    Connection._open and Response.from_httpresponse rely on.
+    """
+
+    def __init__(self, url, code, msg, headers, body):
+        self.url = url
+        self.code = code
+        self.msg = msg
+        self.headers = headers
+        self.body = body
+
+    def geturl(self):
+        return self.url
+
+    def getcode(self):
+        return self.code
+
+    def info(self):
+        return self.headers
+
+    def read(self):
+        return self.body
+
+    def close(self):
+        pass
+
+
+class HTTPConnectionPool(object):
+    """A bounded, thread-safe pool of keep-alive connections to one host."""
+
+    def __init__(self, scheme, host, maxsize=10):
+        """Initialize a new HTTPConnectionPool object.
+
+        Args:
+            scheme: 'http' or 'https'.
+            host: The host to connect to, optionally with ':port'.
+            maxsize: Number of idle connections kept open for reuse.
+        """
+        self.scheme = scheme
+        self.host = host
+        self.maxsize = maxsize
+        self._idle = queue.LifoQueue(maxsize)
+
+    def _new_connection(self, timeout):
+        if self.scheme == 'https':
+            return http_client.HTTPSConnection(self.host, timeout=timeout)
+        return http_client.HTTPConnection(self.host, timeout=timeout)
+
+    def _get_connection(self, timeout):
+        """Return a (connection, reused) tuple, reusing an idle connection when possible."""
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            return self._new_connection(timeout), False
+        connection.timeout = timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+        return connection, True
+
+    def _put_connection(self, connection):
+        try:
+            self._idle.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def urlopen(self, request, timeout=None):
+        """Send a urllib Request over a pooled connection.
+
+        Args:
+            request: A urllib Request object.
+            timeout: socket timeout.
+        Returns:
+            A PooledResponse object, gzip bodies are already decoded.
+        Raises:
+            urllib.error.URLError on IO errors.
+        """
+        headers = dict(request.header_items())
+        headers.setdefault('Accept-Encoding', 'gzip')
+        for attempt in range(2):
+            connection, reused = self._get_connection(timeout)
+            try:
+                connection.request(request.get_method(), request.selector,
+                                   body=request.data, headers=headers)
+                http_response = connection.getresponse()
+                body = http_response.read()
+            except STALE_CONNECTION_ERRORS as err:
+                connection.close()
+                if reused and not attempt:
+                    continue
+                raise urllib.error.URLError(err)
+            except (http_client.HTTPException, OSError) as err:
+                connection.close()
+                raise urllib.error.URLError(err)
+            if http_response.will_close:
+                connection.close()
+            else:
+                self._put_connection(connection)
+            return self._build_response(request, http_response, body)
+
+    def _build_response(self, request, http_response, body):
+        headers = http_response.msg
+        if (headers.get('Content-Encoding') or '').lower() == 'gzip':
+            body = gzip.decompress(body)
+            del headers['Content-Encoding']
+            if 'Content-Length' in headers:
+                headers.replace_header('Content-Length', str(len(body)))
+        return PooledResponse(request.full_url, http_response.status,
+                              http_response.reason, headers, body)
+
+    def close(self):
+        """Close every idle connection of the pool."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(scheme, host, maxsize=10):
+    """Return the process wide pool for a scheme and host, creating it if needed."""
+    key = (scheme, host)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = HTTPConnectionPool(scheme, host, maxsize)
+        return pool
+
+
+def close_all():
+    """Close the idle connections of every pool."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
@@ -17,6 +17,9 @@ class Error(Exception):
 
 def initialize():
     """Install TestHandler as the only active handler for http requests."""
+    from .. import connection
+    # The keep-alive pool bypasses urllib openers, route everything through urllib.
+    connection.Connection.keep_alive = False
     opener = urllib.request.build_opener(TestHandler)
     urllib.request.install_opener(opener)
 
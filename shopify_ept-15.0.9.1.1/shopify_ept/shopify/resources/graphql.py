@@ -5,9 +5,17 @@ import json
 
 
 class GraphQL:
-    def __init__(self):
-        self.endpoint = shopify.ShopifyResource.get_site() + "/graphql.json"
-        self.headers = shopify.ShopifyResource.get_headers()
+    def __init__(self, version=None):
+        site = shopify.ShopifyResource.get_site()
+        if version:
+            # Run GraphQL on its own API version, the REST resources keep the session version.
+            site = site.rsplit("/", 1)[0] + "/" + version
+        self.endpoint = site + "/graphql.json"
+        self.headers = shopify.ShopifyResource.get_headers().copy()
+        password = shopify.ShopifyResource.get_password()
+        if password and "X-Shopify-Access-Token" not in self.headers:
+            # Private app credentials: the password is the Admin API access token.
+            self.headers["X-Shopify-Access-Token"] = password
 
     def merge_headers(self, *headers):
         merged_headers = {}
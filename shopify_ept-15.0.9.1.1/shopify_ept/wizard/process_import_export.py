@@ -16,7 +16,6 @@ from odoo.tools.misc import split_every
 
 from odoo import models, fields, api, _
 from .. import shopify
-from ..shopify.pyactiveresource.connection import ClientError
 from odoo.addons.website.tools import get_video_embed_code
 
 _logger = logging.getLogger("Shopify Operations")
@@ -396,11 +395,6 @@ class ShopifyProcessImportExport(models.TransientModel):
                     page_info = page_link.split(';')[0].strip('<>').split('page_info=')[1]
                     try:
                         result = shopify.Customer().find(page_info=page_info, limit=250)
-                    except ClientError as error:
-                        if hasattr(error, "response"):
-                            if error.response.code == 429 and error.response.msg == "Too Many Requests":
-                                time.sleep(int(float(error.response.headers.get('Retry-After', 5))))
-                                result = shopify.Customer().find(page_info=page_info, limit=250)
                     except Exception as error:
                         raise UserError(error)
                     if result:
@@ -433,7 +427,6 @@ class ShopifyProcessImportExport(models.TransientModel):
         if not isinstance(ctx, dict):
             return True
         shopify_instance_obj = self.env['shopify.instance.ept']
-        product_obj = self.env['product.product']
         shopify_product_obj = self.env['shopify.product.product.ept']
 
         if self.shopify_instance_id:
@@ -452,8 +445,7 @@ class ShopifyProcessImportExport(models.TransientModel):
             last_update_date = instance.shopify_last_date_update_stock or datetime.now() - timedelta(30)
             _logger.info("Exporting Stock by Cron for instance - %s", instance.name)
 
-        products = product_obj.get_products_based_on_movement_date_ept(last_update_date,
-                                                                       instance.shopify_company_id)
+        products, watermark = self.get_shopify_products_for_export_stock(instance, last_update_date)
         if products:
             shopify_products = shopify_product_obj.export_stock_in_shopify(instance, products)
             if shopify_products:
@@ -461,16 +453,33 @@ class ShopifyProcessImportExport(models.TransientModel):
         else:
             instance.shopify_last_date_update_stock = datetime.now()
             _logger.info("No products found to export stock from %s.....", last_update_date)
+        if watermark:
+            self.env['stock.move.watermark.ept'].set_watermark_ept("shopify.instance.ept,%s" % instance.id,
+                                                                   instance.shopify_company_id, watermark)
 
         return True
 
+    def get_shopify_products_for_export_stock(self, instance, last_update_date):
+        """
+        This method is used to get the products moved since the last stock export. The cron uses the stock move
+        watermark of the instance, a date given in the Operations wizard uses the move dates.
+        @param instance: Record of instance.
+        @param last_update_date: Date from which the stock is exported.
+        @return: List of product ids and the watermark to store after the export or False.
+        """
+        product_obj = self.env['product.product']
+        if self.export_stock_from:
+            return product_obj.get_products_based_on_movement_date_ept(last_update_date,
+                                                                       instance.shopify_company_id), False
+        return product_obj.get_products_changed_since_watermark_ept("shopify.instance.ept,%s" % instance.id,
+                                                                    instance.shopify_company_id, last_update_date)
+
     @api.model
     def shopify_export_stock_queue(self, ctx=False):
         """
         This method used to export stock from odoo to shopify.
         """
         shopify_instance_obj = self.env['shopify.instance.ept']
-        product_obj = self.env['product.product']
         shopify_product_obj = self.env['shopify.product.product.ept']
 
         if self.shopify_instance_id:
@@ -490,8 +499,10 @@ class ShopifyProcessImportExport(models.TransientModel):
             last_update_date = instance.shopify_last_date_update_stock or datetime.now() - timedelta(30)
             _logger.info("Exporting Stock by Cron for instance - %s", instance.name)
 
-        products = product_obj.get_products_based_on_movement_date_ept(last_update_date,
-                                                                       instance.shopify_company_id)
+        products, watermark = self.get_shopify_products_for_export_stock(instance, last_update_date)
+        if watermark:
+            self.env['stock.move.watermark.ept'].set_watermark_ept("shopify.instance.ept,%s" % instance.id,
+                                                                   instance.shopify_company_id, watermark)
         if products:
             export_stock_queue = shopify_product_obj.export_stock_queue(instance, products)
             if export_stock_queue:
@@ -221,6 +221,13 @@ class ResConfigSettings(models.TransientModel):
                                                  string="Sync Product With", default="sku")
     shopify_pricelist_id = fields.Many2one("product.pricelist", string="Shopify Pricelist")
     shopify_stock_field = fields.Many2one("ir.model.fields", string="Stock Field")
+    shopify_bulk_export_stock = fields.Boolean("Export Stock in Bulk?",
+                                               help="If checked, Stock is exported through the GraphQL "
+                                                    "inventorySetQuantities mutation, 250 quantities per request.")
+    shopify_export_changed_stock_only = fields.Boolean("Export Changed Stock Only?",
+                                                       help="If checked, The export stock process skips the products "
+                                                            "whose quantity is the same as the last quantity exported "
+                                                            "to the Shopify location.")
     shopify_section_id = fields.Many2one("crm.team", "Shopify Sales Team")
     shopify_is_use_default_sequence = fields.Boolean("Use Odoo Default Sequence in Shopify Orders",
                                                      help="If checked,Then use default sequence of odoo while create "
@@ -326,6 +333,8 @@ class ResConfigSettings(models.TransientModel):
             self.shopify_sync_product_with = instance.shopify_sync_product_with
             self.shopify_pricelist_id = instance.shopify_pricelist_id and instance.shopify_pricelist_id.id or False
             self.shopify_stock_field = instance.shopify_stock_field and instance.shopify_stock_field.id or False
+            self.shopify_bulk_export_stock = instance.is_shopify_bulk_export_stock
+            self.shopify_export_changed_stock_only = instance.is_shopify_export_changed_stock_only
             self.shopify_section_id = instance.shopify_section_id.id or False
             self.shopify_order_prefix = instance.shopify_order_prefix
             self.shopify_is_use_default_sequence = instance.is_use_default_sequence
@@ -381,6 +390,8 @@ class ResConfigSettings(models.TransientModel):
             values["shopify_sync_product_with"] = self.shopify_sync_product_with
             values["shopify_pricelist_id"] = self.shopify_pricelist_id and self.shopify_pricelist_id.id or False
             values["shopify_stock_field"] = self.shopify_stock_field and self.shopify_stock_field.id or False
+            values["is_shopify_bulk_export_stock"] = self.shopify_bulk_export_stock
+            values["is_shopify_export_changed_stock_only"] = self.shopify_export_changed_stock_only
             values["shopify_section_id"] = self.shopify_section_id and self.shopify_section_id.id or False
             values["shopify_order_prefix"] = self.shopify_order_prefix
             values["is_use_default_sequence"] = self.shopify_is_use_default_sequence